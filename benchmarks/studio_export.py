@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of only_cleanup_script.py on generated studio exports, without an Odoo server or a database.
+Run them from the root of the repository.
+
+To time each stage of the cleanup on a generated export:
+
+python3 -m benchmarks.studio_export benchmark --models=20 --records=1000 --output="/tmp/results.json" --baseline="/tmp/previous_results.json"
+
+The generated export alone is written by the generate-export subcommand (same size arguments and --output directory).
+The stages prone to quadratic behaviour are checked to scale linearly by tests/test_scaling.py.
+
+"""
+
+import os
+import logging
+import shutil
+import argparse
+import sys
+import gzip
+import json
+import subprocess
+import random
+import statistics
+import platform
+import tempfile
+
+from pathlib import Path
+
+from only_cleanup_script import CleanModule, MetadataSnapshot, _logger, handler
+
+
+class StudioExportGenerator:
+    """
+    Writes a synthetic studio_customization export shaped like the real ones: custom models with
+    their fields, views and access rights, demo records of standard and custom models referring to
+    each other (with circular dependencies between files), website views using part of the
+    attachments, duplicated and unused binaries, SCSS customizations, the manifest of the exporter
+    and its warnings.txt listing the circular dependencies of the demo files, which the cleanup
+    merges with the ones it detects. A metadata snapshot of every model of the export replaces the
+    Odoo server. The same arguments always give the same files.
+
+    Args:
+        models (int): Number of custom models, each with a demo file.
+        records (int): Number of records per demo file.
+        attachments (int): Number of attachment binaries, a fifth of them duplicates and a quarter unused.
+        seed (int): Seed of the random ids and contents.
+    """
+
+    # Header and footer of the XML files of the exporter
+    XML_HEADER = "<?xml version='1.0' encoding='UTF-8'?>\n<odoo>\n"
+    XML_FOOTER = "</odoo>\n"
+
+    def __init__(self, models=10, records=100, attachments=20, seed=1):
+        self.models = models
+        self.records = records
+        self.attachments = attachments
+        self.seed = seed
+
+    def generate(self, directory):
+        """
+        Writes the export and its metadata snapshot in a directory.
+
+        Args:
+            directory (str): Directory receiving studio_customization/ and metadata.json.gz.
+
+        Returns:
+            tuple: Path of the export, path of the metadata snapshot.
+        """
+        self.random = random.Random(self.seed)
+        self.module_path = os.path.join(directory, 'studio_customization')
+        shutil.rmtree(self.module_path, ignore_errors=True)
+        for sub_directory in ['data', 'demo', 'ir_attachment']:
+            os.makedirs(os.path.join(self.module_path, sub_directory))
+
+        # Field names of the records of each model, for the metadata snapshot
+        self.model_fields = {}
+        self.manifest = {'data': [], 'demo': []}
+        self.custom_models = [f"x_model_{index}" for index in range(self.models)]
+
+        self.write_data_files()
+        self.write_demo_files()
+        self.write_attachment_files()
+
+        Path(self.module_path + '/warnings.txt').write_text(self.get_warnings(), encoding='utf-8')
+        Path(self.module_path + '/__manifest__.py').write_text(repr({
+            'name': 'Studio customizations',
+            'version': '1.0',
+            'category': 'Customizations',
+            'description': 'Generated by the benchmark',
+            'author': 'Benchmark',
+            'depends': ['sale', 'web_studio', 'website', 'knowledge'],
+            'data': self.manifest['data'],
+            'demo': self.manifest['demo'],
+            'license': 'LGPL-3',
+        }), encoding='utf-8')
+
+        snapshot_path = os.path.join(directory, 'metadata.json.gz')
+        self.write_metadata_snapshot(snapshot_path)
+        return self.module_path, snapshot_path
+
+    def get_token(self):
+        # Random hexadecimal suffix, like the ids studio generates
+        return f"{self.random.getrandbits(32):08x}"
+
+    def write_xml_file(self, relative_path, model_name, records):
+        """
+        Writes an XML file of the export and lists it in the manifest.
+
+        Args:
+            relative_path (str): Path relative to the export, 'data/...' or 'demo/...'.
+            model_name (str): Model of the records.
+            records (list): (xmlid, [(field name, attributes, text)]) of each record.
+        """
+        model_fields = self.model_fields.setdefault(model_name, set())
+        lines = [self.XML_HEADER]
+        for xmlid, fields in records:
+            lines.append(f'  <record id="{xmlid}" model="{model_name}" context="{{\'studio\': True}}">\n')
+            for field_name, attributes, text in fields:
+                model_fields.add(field_name)
+                attributes = ''.join(f' {name}="{value}"' for name, value in attributes)
+                if text is None:
+                    lines.append(f'    <field name="{field_name}"{attributes}/>\n')
+                else:
+                    lines.append(f'    <field name="{field_name}"{attributes}>{text}</field>\n')
+            lines.append('  </record>\n')
+        lines.append(self.XML_FOOTER)
+        Path(self.module_path + '/' + relative_path).write_text(''.join(lines), encoding='utf-8')
+        self.manifest[relative_path.split('/')[0]].append(relative_path)
+
+    def write_data_files(self):
+        # Custom models with their fields, form views, access rights and defaults
+        self.model_xmlids = {model_name: 'studio_customization.model_' + self.get_token() for model_name in self.custom_models}
+        self.write_xml_file('data/ir_model.xml', 'ir.model', [
+            (self.model_xmlids[model_name], [('name', [], model_name.replace('_', ' ').title()), ('model', [], model_name), ('color', [], '3')])
+            for model_name in self.custom_models
+        ])
+
+        field_records = []
+        self.field_xmlids = []
+        for model_name in self.custom_models:
+            for field_name, ttype in [('x_name', 'char'), ('x_studio_partner_id', 'many2one'), ('x_studio_total', 'float')]:
+                xmlid = 'field_' + self.get_token()
+                self.field_xmlids.append(xmlid)
+                field_records.append((xmlid, [
+                    ('model_id', [('ref', self.model_xmlids[model_name])], None), ('name', [], field_name), ('ttype', [], ttype),
+                    ('on_delete', [('eval', 'False')], None), ('uuid', [], self.get_token()),
+                ]))
+        self.write_xml_file('data/ir_model_fields.xml', 'ir.model.fields', field_records)
+
+        self.write_xml_file('data/ir_ui_view.xml', 'ir.ui.view', [
+            ('view_' + self.get_token(), [
+                ('model', [], model_name), ('type', [], 'form'), ('name', [], f"{model_name} form"),
+                ('arch', [('type', 'xml')],
+                 '\n      <form>\n        <sheet>\n          <field name="x_name"/>\n          <field name="x_studio_partner_id"/>\n'
+                 '          <field name="x_studio_total"/>\n          <a href="https://mycompany.odoo.com/web">Open</a>\n'
+                 '        </sheet>\n      </form>\n    '),
+            ]) for model_name in self.custom_models
+        ])
+        self.write_xml_file('data/ir_model_access.xml', 'ir.model.access', [
+            ('access_' + self.get_token(), [
+                ('model_id', [('ref', self.model_xmlids[model_name])], None), ('group_id', [('ref', 'base.group_user')], None),
+                ('name', [], f"access {model_name}"), ('perm_read', [], 'True'),
+            ]) for model_name in self.custom_models
+        ])
+        self.write_xml_file('data/ir_default.xml', 'ir.default', [
+            ('default_' + self.get_token(), [('field_id', [('ref', xmlid)], None), ('json_value', [], '"Default"')])
+            for xmlid in self.field_xmlids[::3]
+        ])
+        self.write_xml_file('data/product_pricelist.xml', 'product.pricelist', [
+            ('product_pricelist_1', [('name', [], 'Default')]), ('product_pricelist_2', [('name', [], 'VIP')]),
+        ])
+        self.write_xml_file('data/knowledge_article.xml', 'knowledge.article', [
+            (f"knowledge_article_{index}", [
+                ('name', [], f"Article {index}"),
+                ('body', [], f"&lt;p&gt;Contact john.doe{index}@odoo.com or see https://www.odoo.com/documentation/17.0/&lt;/p&gt;"),
+            ]) for index in range(max(1, self.records // 10))
+        ])
+
+    def write_demo_files(self):
+        records = self.records
+
+        # Partners and orders refer to each other, a circular dependency between their files
+        self.write_xml_file('demo/res_partner.xml', 'res.partner', [
+            (f"res_partner_{index}", [
+                ('name', [], f"Partner {index}"), ('email', [], f"partner{index}@odoo.com"), ('display_name', [], f"Partner {index}"),
+                ('supplier_rank', [], '1'), ('color', [], str(index % 10)), ('uuid', [], self.get_token()),
+                ('x_studio_last_order', [('ref', f"sale_order_{(index + 1) % records}")], None),
+            ]) for index in range(records)
+        ])
+        self.write_xml_file('demo/sale_order.xml', 'sale.order', [
+            (f"sale_order_{index}", [
+                ('partner_id', [('ref', f"res_partner_{index}")], None), ('date_order', [], '2024-01-01 10:00:00'),
+                ('pricelist_id', [('ref', 'product_pricelist_1')], None), ('amount_total', [], str(index * 10)),
+                ('access_token', [], self.get_token()),
+            ]) for index in range(records)
+        ])
+        self.write_xml_file('demo/product_template.xml', 'product.template', [
+            (f"product_template_{index}", [
+                ('name', [], f"Product {index}"), ('list_price', [], str(index + 1)), ('base_unit_count', [], '1'),
+                ('website_url', [], f"/shop/product-{index}"), ('uom_id', [('ref', 'uom.product_uom_unit')], None),
+            ]) for index in range(records)
+        ])
+        self.write_xml_file('demo/sale_order_line.xml', 'sale.order.line', [
+            (f"sale_order_line_{index}", [
+                ('order_id', [('ref', f"sale_order_{index}")], None), ('product_id', [('ref', f"product_template_{index}")], None),
+                ('name', [], f"Line {index}"), ('sequence', [], str(index)), ('technical_price_unit', [], '4'),
+                ('product_uom', [('ref', 'uom.product_uom_unit')], None),
+                ('display_type', [], 'line_section' if index % 10 == 0 else 'product'),
+            ]) for index in range(records)
+        ])
+
+        # Custom models by pairs whose files refer to each other, and all refer to the partners
+        for model_index, model_name in enumerate(self.custom_models):
+            partner_index = model_index - 1 if model_index % 2 else model_index + 1
+            partner_model = self.custom_models[partner_index] if partner_index < len(self.custom_models) else None
+            model_records = []
+            for index in range(records):
+                fields = [
+                    ('x_name', [], f"{model_name} {index}"), ('x_studio_partner_id', [('ref', f"res_partner_{index}")], None),
+                    ('x_studio_total', [], str(index)),
+                ]
+                if partner_model and index % 4 == model_index % 2:
+                    fields.append(('x_studio_related_ids', [('eval', f"[(6, 0, [ref('{partner_model}_{index}')])]")], None))
+                model_records.append((f"{model_name}_{index}", fields))
+            self.write_xml_file(f"demo/{model_name}.xml", model_name, model_records)
+
+    def write_attachment_files(self):
+        # Binaries, every fifth one has the content of the previous one
+        self.attachment_files = []
+        content = b''
+        for index in range(self.attachments):
+            if index % 5 != 4:
+                content = self.random.randbytes(4096 + self.random.randrange(4096))
+            file_name = f"{index + 1}-image_{index}.png"
+            Path(self.module_path + '/ir_attachment/' + file_name).write_bytes(content)
+            self.attachment_files.append((index, file_name))
+
+        self.write_xml_file('demo/ir_attachment_post.xml', 'ir.attachment', [
+            (f"ir_attachment_{index + 1}", [
+                ('name', [], f"image_{index}.png"), ('key', [], f"website.image_{index}"),
+                ('datas', [('type', 'base64'), ('file', 'studio_customization/ir_attachment/' + file_name)], None),
+                ('res_model', [], 'ir.ui.view'), ('url', [], f"https://mycompany.odoo.com/web/image/{index + 1}"),
+            ]) for index, file_name in self.attachment_files
+        ])
+
+        # Website pages using every attachment but a quarter of them
+        images = ''.join(f'<img src="/web/image/website.image_{index}"/>' for index, _ in self.attachment_files if index % 4 != 3)
+        self.write_xml_file('demo/ir_ui_view.xml', 'ir.ui.view', [
+            (f"website_page_view_{index}", [
+                ('key', [], f"website.page_{index}"), ('name', [], f"Page {index}"), ('type', [], 'qweb'),
+                ('arch', [('type', 'xml')], f'\n      <t t-call="website.layout"><div class="oe_structure">{images if index == 0 else ""}'
+                                            f'<a href="https://www.odoo.com/documentation/17.0/">Docs</a></div></t>\n    '),
+            ]) for index in range(max(1, self.records // 20))
+        ])
+
+        Path(self.module_path + '/ir_attachment/user_color.custom.web.assets.scss').write_text(
+            "$o-user-color-palette: map-merge($o-color-palette, o-map-omit((\n  'o-color-1': #1d3557,\n  'o-color-2': #e63946,\n)));\n",
+            encoding='utf-8'
+        )
+        Path(self.module_path + '/ir_attachment/user_values.custom.scss').write_text(
+            "$o-user-website-values: o-map-omit((\n  'font': 'Roboto',\n  'header-template': 'default',\n));\n", encoding='utf-8'
+        )
+
+    def get_warnings(self):
+        # Circular dependencies as the exporter reports them
+        chains = ['(demo) res.partner -> sale.order']
+        chains += [f"(demo) {self.custom_models[index]} -> {self.custom_models[index + 1]}" for index in range(0, self.models - 1, 2)]
+        return f"Found {len(chains)} circular dependencies\n" + ''.join(chain + '\n' for chain in chains)
+
+    def write_metadata_snapshot(self, path):
+        # Every field is stored but display_name and the totals, computed without inverse
+        computed_fields = {'display_name', 'x_studio_total', 'amount_total', 'website_url'}
+        fields = {
+            model_name: {
+                field_name: {
+                    'store': field_name not in computed_fields,
+                    'readonly': field_name in computed_fields,
+                    'depends': ['name'] if field_name in computed_fields else [],
+                } for field_name in sorted(field_names)
+            } for model_name, field_names in sorted(self.model_fields.items())
+        }
+        snapshot = {
+            'format_version': MetadataSnapshot.format_version,
+            'db_name': 'benchmark',
+            'server_version': 'benchmark',
+            'modules': {'website_sale': 'installed', 'web_studio': 'installed', 'knowledge': 'installed'},
+            'fields': fields,
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+
+
+def run_benchmark(module_path, snapshot_path, work_directory, repeat=3, pipeline='string', jobs=1):
+    """
+    Cleans an export `repeat` times against a metadata snapshot and collects the stage timings.
+
+    Args:
+        module_path (str): Path of the export.
+        snapshot_path (str): Metadata snapshot of the export.
+        work_directory (str): Directory receiving the cleaned modules.
+        repeat (int): Number of runs.
+        pipeline (str): --pipeline of the runs.
+        jobs (int): --jobs of the runs.
+
+    Returns:
+        dict: 'runs' (stage -> seconds of each run) and 'stages' (stage -> median, min and max seconds).
+    """
+    runs = []
+    level = handler.level
+    for run_index in range(repeat):
+        destination_path = os.path.join(work_directory, f"run_{run_index}")
+        shutil.rmtree(destination_path, ignore_errors=True)
+        os.makedirs(destination_path)
+
+        # Only the warnings of the runs are shown
+        handler.setLevel(logging.WARNING)
+        try:
+            clean_module = CleanModule(
+                'benchmark', 'benchmark', 'benchmark', module_path, destination_path, None,
+                pipeline=pipeline, jobs=jobs, metadata_snapshot=snapshot_path, reset_admin=False
+            )
+            clean_module.clean()
+        finally:
+            handler.setLevel(level)
+        runs.append({stage: round(seconds, 6) for stage, seconds in clean_module.stage_timings.items()})
+
+    stages = {}
+    for stage in runs[0]:
+        timings = [run.get(stage, 0) for run in runs]
+        stages[stage] = {'median': round(statistics.median(timings), 6), 'min': min(timings), 'max': max(timings)}
+    return {'runs': runs, 'stages': stages}
+
+
+def get_git_commit():
+    # Commit of the script, results of two commits are compared with --baseline
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def generate_export_main(argv):
+    # Subcommand writing a synthetic export and its metadata snapshot
+    parser = argparse.ArgumentParser(prog="python3 -m benchmarks.studio_export generate-export", description="Write a synthetic studio_customization export")
+
+    parser.add_argument('--output', required=True, help="Directory receiving studio_customization/ and metadata.json.gz")
+    parser.add_argument('--models', type=int, default=10, help="Number of custom models")
+    parser.add_argument('--records', type=int, default=100, help="Number of records per demo file")
+    parser.add_argument('--attachments', type=int, default=20, help="Number of attachment binaries")
+    parser.add_argument('--seed', type=int, default=1, help="Seed of the random ids and contents")
+
+    args = parser.parse_args(argv)
+
+    generator = StudioExportGenerator(models=args.models, records=args.records, attachments=args.attachments, seed=args.seed)
+    module_path, snapshot_path = generator.generate(args.output)
+    _logger.info(f"Export written to {module_path}, metadata snapshot to {snapshot_path}")
+
+
+def benchmark_main(argv):
+    # Subcommand timing each stage of the cleanup on a generated export
+    parser = argparse.ArgumentParser(prog="python3 -m benchmarks.studio_export benchmark", description="Time each stage of the cleanup on a synthetic export")
+
+    parser.add_argument('--output', required=True, help="Path of the JSON results")
+    parser.add_argument('--models', type=int, default=10, help="Number of custom models")
+    parser.add_argument('--records', type=int, default=100, help="Number of records per demo file")
+    parser.add_argument('--attachments', type=int, default=20, help="Number of attachment binaries")
+    parser.add_argument('--seed', type=int, default=1, help="Seed of the random ids and contents")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of runs, the results keep the median of each stage")
+    parser.add_argument('--pipeline', choices=['string', 'tree', 'stream'], default='string', help="--pipeline of the runs")
+    parser.add_argument('--jobs', type=int, default=1, help="--jobs of the runs")
+    parser.add_argument('--work_dir', help="Directory of the export and the cleaned modules, a temporary one by default")
+    parser.add_argument('--baseline', help="Results of an earlier benchmark (another commit) to compare with")
+
+    args = parser.parse_args(argv)
+
+    work_directory = args.work_dir or tempfile.mkdtemp(prefix='cleanup_benchmark_')
+    try:
+        generator = StudioExportGenerator(models=args.models, records=args.records, attachments=args.attachments, seed=args.seed)
+        module_path, snapshot_path = generator.generate(work_directory)
+        results = run_benchmark(module_path, snapshot_path, work_directory, repeat=args.repeat, pipeline=args.pipeline, jobs=args.jobs)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_directory, ignore_errors=True)
+
+    # Same parameters and same stage names, so that the results of two commits line up
+    parameters = {key: getattr(args, key) for key in ['models', 'records', 'attachments', 'seed', 'repeat', 'pipeline', 'jobs']}
+    results = {
+        'format_version': 1,
+        'commit': get_git_commit(),
+        'python': platform.python_version(),
+        'parameters': parameters,
+        **results,
+    }
+    Path(args.output).write_text(json.dumps(results, indent=2), encoding='utf-8')
+    _logger.info(f"Benchmark results written to {args.output}")
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8')) if args.baseline else None
+    if baseline and baseline['parameters'] != parameters:
+        _logger.warning(f"Baseline parameters {baseline['parameters']} differ from {parameters}")
+    for stage, timing in results['stages'].items():
+        line = f"{stage}: {timing['median']:.4f}s"
+        baseline_timing = baseline['stages'].get(stage) if baseline else None
+        if baseline_timing:
+            line += f" (baseline {baseline_timing['median']:.4f}s, x{timing['median'] / baseline_timing['median']:.2f})" if baseline_timing['median'] else ""
+        _logger.info(line)
+
+
+def main():
+    subcommands = {
+        'generate-export': generate_export_main,
+        'benchmark': benchmark_main,
+    }
+    if len(sys.argv) < 2 or sys.argv[1] not in subcommands:
+        sys.exit(f"usage: python3 -m benchmarks.studio_export {{{','.join(subcommands)}}} ...")
+    return subcommands[sys.argv[1]](sys.argv[2:])
+
+if __name__ == "__main__":
+    main()
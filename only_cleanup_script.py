@@ -7,6 +7,18 @@ step 4 - run below command to run cleanup script with arguments
 
 python3 only_cleanup_script.py   --module_name="members_name" --category="category_name"  --studio_path="/path/to/studio_customization"   --destination_path="/home/odoo/Download" --db_name="restore_db_name" --port=port_number
 
+To run without an Odoo server, dump the metadata once while the server of step 3 runs:
+
+python3 only_cleanup_script.py dump-metadata --db_name="restore_db_name" --port=port_number --output="/path/to/metadata.json.gz"
+
+then skip step 3 on the next runs and replace --port by --metadata-snapshot="/path/to/metadata.json.gz" in step 4.
+With psql access to the restored database, --metadata_source=postgres also replaces --port and step 3.
+The run resets the login and password of the admin user of the restored database with psql, --skip_admin_reset keeps them.
+
+When a few files of the export change between runs, add --incremental: the run keeps a build journal next to
+the cleaned module and only transforms the changed files and reruns the global passes depending on them.
+
+The benchmarks of the cleanup on generated exports, without an Odoo server or a database, are in benchmarks/studio_export.py.
 
 """
 
@@ -16,11 +28,31 @@ import logging
 import shutil
 import argparse
 import sys
+import time
+import gzip
+import json
+import hashlib
+import threading
+import subprocess
+import csv
+import io
+import fnmatch
+import heapq
+import itertools
+import mmap
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, attachments are copied without reflinks there
+    fcntl = None
 
 from pathlib import Path
 import re
 from ast import literal_eval
 from lxml import etree
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait as wait_futures
 
 # Setup logger
 # Create a Logger instance directly
@@ -35,19 +67,1277 @@ BASE_URL = "http://localhost:"
 LOGIN = "admin"
 PASSWORD = "admin" 
 
+# Start of a <field> tag whose first attribute is its name, or a <record> opening or closing tag
+FIELD_NAME_TOKEN_RE = re.compile(r'<field name="([^"]*)"|<record\b([^>]*)>|</record>')
+
+# Opening <record> tag with its attributes
+RECORD_TAG_RE = re.compile(r'<record\b([^>]*)>')
+
+# Model attribute in the attributes of a <record> tag
+RECORD_MODEL_RE = re.compile(r'(?:^|\s)model="([^"]*)"')
+
+# Largest circular dependency whose load order is searched exhaustively, bigger ones are ordered greedily
+CYCLE_ORDER_EXACT_LIMIT = 12
+
+# Version of what the cleanup writes, bumped by a change of the script changing its output. An
+# incremental run rebuilds everything when the version of the build journal differs
+CLEANUP_VERSION = 2
+
+# ====================================================
+#              XML rewrite engine
+# ====================================================
+
+
+class XmlRewriteEngine:
+    """
+    Applies an ordered list of precompiled substitution rules to a text, each rule running over
+    the output of the previous one, and counts the substitutions of each rule.
+
+    The rules stay separate passes because most of them feed each other: the greedy env_ref
+    rule swallows text the prefix rules would rewrite, 'base_module.' has to be removed before
+    res_users_ reads the rest of the word, and every removal joins the text around it into
+    possible matches of the later rules. Fusing them into one alternation changes the output.
+
+    Args:
+        rules (list): Rule dictionaries as built by `CleanModule.get_xml_content_rules`.
+        counts (dict): Counter of fired substitutions per rule name, shared between engines.
+    """
+
+    def __init__(self, rules, counts=None):
+        self.rules = rules
+        self.counts = {} if counts is None else counts
+        for rule in rules:
+            self.counts.setdefault(rule['name'], 0)
+
+    def rewrite(self, text):
+        """
+        Rewrites the text with all the rules.
+
+        Args:
+            text (str): Text to rewrite.
+
+        Returns:
+            str: The rewritten text.
+        """
+        for rule in self.rules:
+            text, count = rule['pattern'].subn(rule['replacement'], text)
+            self.counts[rule['name']] += count
+        return text
+
+# ====================================================
+#              JSON-RPC client
+# ====================================================
+
+
+class OdooJsonRpcClient:
+    """
+    Authenticated JSON-RPC client shared by the whole cleanup run.
+
+    Logs in once, keeps its connections alive in a pool and only logs in again when the server
+    reports the session as expired. Connection errors and timeouts are retried with a short
+    backoff. Every call is timed so the cost of the server round-trips can be reported.
+    Calls can be made from several threads.
+
+    Args:
+        base_url (str): Server url, e.g. 'http://localhost:8069'.
+        db_name (str): Database to log in to.
+        login (str): User login.
+        password (str): User password.
+        timeout (float): Seconds to wait for the server to connect and to answer.
+        retries (int): Number of retries of a call failing on a connection error or a timeout.
+        pool_size (int): Maximum number of kept-alive connections.
+    """
+
+    # Server errors meaning the login has to be done again, a wrong password (AccessDenied) is raised
+    session_expired_errors = ('odoo.http.SessionExpiredException',)
+
+    def __init__(self, base_url, db_name, login, password, timeout=60, retries=3, pool_size=4):
+        self.base_url = base_url
+        self.db_name = db_name
+        self.login = login
+        self.password = password
+        self.timeout = timeout
+        self.retries = retries
+        self.uid = None
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        self.stats = {'calls': 0, 'logins': 0, 'retries': 0, 'total_latency': 0.0, 'max_latency': 0.0}
+
+        # Ids of the JSON-RPC requests, unique across threads
+        self.request_ids = itertools.count(1)
+
+        # Guards the login and the statistics when calls come from several threads
+        self.lock = threading.Lock()
+        self.login_lock = threading.Lock()
+
+    def post(self, path, params):
+        # Send one JSON-RPC request, retrying connection errors and timeouts
+        payload = {"jsonrpc": "2.0", "method": "call", "params": params, "id": next(self.request_ids)}
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise Exception(f"JSON-RPC call to {path} failed after {attempt + 1} attempts: {e}")
+                with self.lock:
+                    self.stats['retries'] += 1
+                time.sleep(0.5 * 2 ** attempt)
+            finally:
+                latency = time.perf_counter() - start
+                with self.lock:
+                    self.stats['calls'] += 1
+                    self.stats['total_latency'] += latency
+                    self.stats['max_latency'] = max(self.stats['max_latency'], latency)
+
+    def authenticate(self):
+        # Authenticates the user via Odoo's /web/session/authenticate endpoint, the session cookie is kept by the pool
+        result = self.post("/web/session/authenticate", {"db": self.db_name, "login": self.login, "password": self.password}).get("result")
+        if not result or not result.get("uid"):
+            raise Exception("Login failed in cleanup script.")
+        with self.lock:
+            self.uid = result['uid']
+            self.stats['logins'] += 1
+        return self.uid
+
+    def authenticate_once(self, logins):
+        """
+        Logs in unless another thread already logged in since the login count was read. Threads
+        finding the session expired at the same time then log in only once.
+
+        Args:
+            logins (int): Number of logins read before the call that needs a login.
+
+        Returns:
+            int: The uid of the user.
+        """
+        with self.login_lock:
+            with self.lock:
+                if self.stats['logins'] != logins:
+                    return self.uid
+            return self.authenticate()
+
+    def execute_kw(self, model_name, method, args, kwargs=None):
+        """
+        Calls a model method through the object service, logging in first if needed.
+
+        Args:
+            model_name (str): Technical name of the model (e.g., 'ir.module.module').
+            method (str): Name of the method to call.
+            args (list): Positional arguments of the method.
+            kwargs (dict): Keyword arguments of the method.
+
+        Returns:
+            The result of the method.
+        """
+        for attempt in range(self.retries + 1):
+            # Log in first if needed
+            with self.lock:
+                uid, logins = self.uid, self.stats['logins']
+            if uid is None:
+                uid = self.authenticate_once(logins)
+
+            response = self.post("/jsonrpc", {
+                "service": "object",
+                "method": "execute_kw",
+                "args": [self.db_name, uid, self.password, model_name, method, args, kwargs or {}],
+            })
+            error = response.get("error")
+            if not error:
+                return response.get("result")
+
+            # Log in again if the session expired, any other error is raised
+            if attempt == self.retries or error.get("data", {}).get("name") not in self.session_expired_errors:
+                raise Exception(f"Error calling {model_name}.{method}: {error.get('data', {}).get('message') or error.get('message')}")
+            self.authenticate_once(logins)
+
+    def get_server_version(self):
+        # The common service answers without login
+        response = self.post("/jsonrpc", {"service": "common", "method": "version", "args": []})
+        if not response.get("result"):
+            raise Exception("Error in getting the server version")
+        return response["result"]["server_version"]
+
+    def get_stats(self):
+        """
+        Returns the round-trip statistics of the client.
+
+        Returns:
+            dict: Calls, logins, retries, total and max latency in seconds, average latency and
+                the number of requests sent on an already open connection.
+        """
+        stats = dict(self.stats)
+        stats['avg_latency'] = stats['total_latency'] / stats['calls'] if stats['calls'] else 0.0
+
+        # The connection pools count their opened connections and the requests sent on them
+        pools = self.adapter.poolmanager.pools
+        pools = [pools[key] for key in pools.keys()]
+        stats['connections'] = sum(pool.num_connections for pool in pools)
+        stats['reused_connections'] = max(sum(pool.num_requests for pool in pools) - stats['connections'], 0)
+        return stats
+
+# ====================================================
+#              Field metadata cache
+# ====================================================
+
+
+class FieldMetadataCache:
+    """
+    Persistent cache of the removable field names per model, shared by the runs on the same database.
+
+    Entries are gzip compressed JSON files named after the database and a key of the server
+    version and the installed modules fingerprint. Opening the cache of a database removes its
+    entries for another version or module set, and saving keeps the directory under `max_bytes`
+    by evicting the least recently used entries.
+
+    Args:
+        directory (str): Directory of the cache files, created if needed.
+        db_name (str): Name of the database.
+        server_version (str): Version of the Odoo server.
+        modules_fingerprint (str): Hash of the installed modules and their versions.
+        max_bytes (int): Size cap of the directory.
+    """
+
+    # Bumped when the content of the entries changes
+    format_version = 2
+
+    def __init__(self, directory, db_name, server_version, modules_fingerprint, max_bytes=64 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        db_key = hashlib.sha1(db_name.encode('utf-8')).hexdigest()[:12]
+        entry_key = hashlib.sha1(f"{self.format_version}|{server_version}|{modules_fingerprint}".encode('utf-8')).hexdigest()[:16]
+        self.path = self.directory / f"{db_key}-{entry_key}.json.gz"
+
+        # Stale entries of the database: the server or the installed modules changed
+        for path in self.directory.glob(f"{db_key}-*.json.gz"):
+            if path != self.path:
+                path.unlink()
+
+    def load(self):
+        """
+        Reads the entry of the database.
+
+        Returns:
+            dict: Model -> frozenset of removable field names, empty on a cache miss.
+        """
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                models = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, EOFError, ValueError) as e:
+            _logger.warning(f"Ignoring unreadable metadata cache ({self.path}): {e}")
+            return {}
+
+        # Mark the entry as recently used
+        os.utime(self.path)
+        return {model_name: frozenset(field_names) for model_name, field_names in models.items()}
+
+    def save(self, removable_fields_dict):
+        """
+        Writes the entry of the database and evicts the least recently used entries above the size cap.
+
+        Args:
+            removable_fields_dict (dict): Model -> set of removable field names.
+        """
+        temp_path = self.path.with_suffix('.tmp')
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            json.dump({model_name: sorted(field_names) for model_name, field_names in sorted(removable_fields_dict.items())}, f, separators=(',', ':'))
+        os.replace(temp_path, self.path)
+
+        entries = sorted(self.directory.glob('*-*.json.gz'), key=lambda path: path.stat().st_mtime)
+        total_size = sum(path.stat().st_size for path in entries)
+        for path in entries:
+            if total_size <= self.max_bytes:
+                break
+            if path != self.path:
+                total_size -= path.stat().st_size
+                path.unlink()
+
+# ====================================================
+#              Metadata providers
+# ====================================================
+
+
+def is_removable_field(field_info):
+    # The field is computed (not stored, with dependencies) and readonly, same criterion for every metadata source
+    return bool(field_info['depends']) and bool(field_info['readonly']) and not field_info['store']
+
+
+def get_ir_model_fields_depends(row):
+    """
+    Returns the dependencies `fields_get` reports for a field, from its ir.model.fields row.
+
+    ir.model.fields only saves the dependencies of custom fields. A related field depends on its
+    related path, a stored base field without them has none. The dependencies of a base field
+    computed by a method are only known to the server.
+
+    Args:
+        row (dict): 'depends', 'related', 'state' and 'store' of the field.
+
+    Returns:
+        list: The dependencies, None when only the server knows them.
+    """
+    if row['depends']:
+        return row['depends'].split(',')
+    if row['related']:
+        return [row['related']]
+    if row['state'] != 'manual' and not row['store']:
+        return None
+    return []
+
+
+# fields_get dependencies of the base fields the ORM computes by a method on most models, known when the
+# model has the fields they depend on. display_name depends on the record name, see `get_base_computed_field_depends`
+BASE_COMPUTED_FIELDS_DEPENDS = {
+    '__last_update': ['create_date', 'write_date'],
+    'context_today': [],
+}
+
+
+def get_base_computed_field_depends(field_name, model_field_names):
+    """
+    Returns the dependencies `fields_get` reports for a base field computed by a method, which
+    ir.model.fields does not save, for the fields the ORM adds to the models.
+
+    Args:
+        field_name (str): Name of the field.
+        model_field_names (set): Names of every field of its model.
+
+    Returns:
+        list: The dependencies, None for another field or a model without the fields they need.
+    """
+    if field_name == 'display_name':
+        # The record name: 'name', or 'x_name' for a Studio model
+        for rec_name in ['name', 'x_name']:
+            if rec_name in model_field_names:
+                return [rec_name]
+        return None
+    depends = BASE_COMPUTED_FIELDS_DEPENDS.get(field_name)
+    if depends is None or not model_field_names.issuperset(depends):
+        return None
+    return list(depends)
+
+
+class MetadataSnapshot:
+    """
+    Offline copy of the metadata the cleanup asks the Odoo server for: the `fields_get`
+    attributes of every model and the state of every module. Stored as gzip compressed JSON.
+
+    Args:
+        path (str): Path of the snapshot file written by `dump`.
+    """
+
+    # Bumped when the content of the file changes
+    format_version = 1
+
+    def __init__(self, path):
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            raise Exception(f"Error while reading metadata snapshot ({path}): {e}")
+        if snapshot.get('format_version') != self.format_version:
+            raise Exception(f"Unsupported metadata snapshot format ({path}), dump it again")
+
+        self.path = path
+        self.db_name = snapshot['db_name']
+        self.server_version = snapshot['server_version']
+        self.fields = snapshot['fields']
+        self.modules = snapshot['modules']
+
+    def get_fields_info(self, model_name):
+        # Same structure as the fields_get result of the model
+        if model_name not in self.fields:
+            raise Exception(f"Model {model_name} is not in the metadata snapshot ({self.path})")
+        return self.fields[model_name]
+
+    def get_module_state(self, module_name):
+        return self.modules.get(module_name, 'uninstalled')
+
+    def get_fingerprint(self):
+        # Hash of the snapshot file, a new dump changes it
+        return hashlib.sha1(Path(self.path).read_bytes()).hexdigest()
+
+    @classmethod
+    def dump(cls, rpc_client, path, workers=4):
+        """
+        Fetches the metadata of every model and module from the server and writes the snapshot.
+
+        Args:
+            rpc_client (OdooJsonRpcClient): Client of the server.
+            path (str): Path of the snapshot file.
+            workers (int): Number of concurrent fields_get calls.
+        """
+        models = rpc_client.execute_kw("ir.model", "search_read", [[]], {"fields": ["model"]})
+        modules = rpc_client.execute_kw("ir.module.module", "search_read", [[]], {"fields": ["name", "state"]})
+
+        def get_fields_info(model_name):
+            return rpc_client.execute_kw(model_name, "fields_get", [], {"attributes": ["store", "readonly", "depends"]})
+
+        model_names = sorted(model['model'] for model in models)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='metadata') as executor:
+            fields = dict(zip(model_names, executor.map(get_fields_info, model_names)))
+
+        snapshot = {
+            'format_version': cls.format_version,
+            'db_name': rpc_client.db_name,
+            'server_version': rpc_client.get_server_version(),
+            'modules': {module['name']: module['state'] for module in modules},
+            'fields': fields,
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        _logger.info(f"Metadata snapshot of {len(fields)} models and {len(modules)} modules written to {path}")
+
+class PostgresMetadataProvider:
+    """
+    Reads the metadata the cleanup asks the Odoo server for straight from the restored database
+    with `psql`, one COPY of ir_model_fields and one of ir_module_module for the whole run.
+
+    The fields are removable on the same criterion as with `fields_get`, their dependencies are
+    rebuilt by `get_ir_model_fields_depends`. The dependencies of a base field computed by a method
+    are only known to the server: without them the field is kept, where the server source removes
+    it if it has dependencies.
+
+    Args:
+        db_name (str): Name of the restored database.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+
+        self.fields = {}
+        for model_name, field_name, store, readonly, depends, related, state in self.copy_rows(
+            "SELECT model, name, store, readonly, depends, related, state FROM ir_model_fields"
+        ):
+            store = store == 't'
+            depends = get_ir_model_fields_depends({'depends': depends, 'related': related, 'state': state, 'store': store})
+            self.fields.setdefault(model_name, {})[field_name] = {
+                'store': store,
+                'readonly': readonly == 't',
+                'depends': depends or [],
+            }
+
+        self.modules = dict(self.copy_rows("SELECT name, state FROM ir_module_module"))
+
+    def copy_rows(self, query):
+        # Run the query through a COPY to CSV and parse its rows
+        try:
+            result = subprocess.run(
+                ['psql', '-X', '-q', '-d', self.db_name, '-c', f"COPY ({query}) TO STDOUT WITH (FORMAT csv)"],
+                capture_output=True, text=True, check=True,
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise Exception(f"Error while reading metadata from database ({self.db_name}): {getattr(e, 'stderr', None) or e}")
+        # Quoted values may hold line breaks, the reader splits the rows itself
+        return list(csv.reader(io.StringIO(result.stdout, newline='')))
+
+    def get_fields_info(self, model_name):
+        # Same structure as the fields_get result of the model
+        if model_name not in self.fields:
+            raise Exception(f"Model {model_name} is not in the database ({self.db_name})")
+        return self.fields[model_name]
+
+    def get_module_state(self, module_name):
+        return self.modules.get(module_name, 'uninstalled')
+
+    def get_fingerprint(self):
+        # Hash of everything read from the database
+        return hashlib.sha1(json.dumps([self.fields, self.modules], sort_keys=True).encode('utf-8')).hexdigest()
+
+# ====================================================
+#              Build journal
+# ====================================================
+
+
+class BuildJournal:
+    """
+    Journal of the last incremental run, kept in a hidden directory next to the cleaned module.
+
+    It records the hash of every file of the export, the fingerprints of the rule set, of the
+    field metadata and of the inputs shared by all the files, the records of each transformed
+    XML file and the files each global pass reads and writes. `stage/` keeps the transformed
+    content of the XML files the global passes edit in place, so a pass can be rerun on them
+    without transforming them again.
+
+    Args:
+        directory (str): Directory of the journal, created on save.
+    """
+
+    # Bumped when the content of the journal changes
+    format_version = 1
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.path = self.directory / 'journal.json'
+        self.stage_directory = self.directory / 'stage'
+
+    def load(self):
+        """
+        Reads the journal of the last run.
+
+        Returns:
+            dict: The journal, or None if there is none usable.
+        """
+        try:
+            journal = json.loads(self.path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            _logger.warning(f"Ignoring unreadable build journal ({self.path}): {e}")
+            return None
+        if journal.get('format_version') != self.format_version:
+            return None
+        return journal
+
+    def save(self, journal):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps(dict(journal, format_version=self.format_version), separators=(',', ':')), encoding='utf-8')
+        os.replace(temp_path, self.path)
+
+    def invalidate(self):
+        # The outputs are about to change, a run stopped halfway must not look up to date
+        if self.path.exists():
+            self.path.unlink()
+
+    def scan_sources(self, directory, previous_sources):
+        """
+        Hashes every file of the export. A file with the size and modification time recorded by
+        the last run keeps its recorded hash without being read.
+
+        Args:
+            directory (str): Path of the exported module.
+            previous_sources (dict): Sources of the last run's journal.
+
+        Returns:
+            dict: Path relative to the export -> [size, modification time in ns, sha1], in walk order.
+        """
+        sources = {}
+        for root, dirs, files in os.walk(directory):
+            current_dir = root.split(directory)[1] + '/'
+            for file_name in files:
+                relative_path = current_dir[1:] + file_name
+                stat = os.stat(root + '/' + file_name)
+                previous = previous_sources.get(relative_path)
+                if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime_ns:
+                    sources[relative_path] = previous
+                else:
+                    digest = hashlib.sha1(Path(root + '/' + file_name).read_bytes()).hexdigest()
+                    sources[relative_path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return sources
+
+    def stage(self, relative_path, content):
+        # Keep the transformed content of an output the global passes edit in place
+        stage_path = self.stage_directory / relative_path
+        stage_path.parent.mkdir(parents=True, exist_ok=True)
+        stage_path.write_text(content, encoding='utf-8')
+
+    def unstage(self, relative_path):
+        (self.stage_directory / relative_path).unlink(missing_ok=True)
+
+    def read_stage(self, relative_path):
+        # Transformed content of a staged output, None if it was never staged
+        try:
+            return (self.stage_directory / relative_path).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+# ====================================================
+#              Attachment copier
+# ====================================================
+
+# ioctl cloning a whole file on Linux filesystems with copy-on-write support (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+class AttachmentCopier:
+    """
+    Copies the binary files of the export in a thread pool. Each file is cloned with a
+    copy-on-write reflink when the filesystem supports it, hard linked when allowed, and copied
+    byte for byte otherwise. Copies keep the modification time of their source, a destination
+    file with the size and modification time of its source, or else the same hash, is left as is.
+
+    Args:
+        workers (int): Number of copying threads.
+        hardlink (bool): Hard link the files when they cannot be reflinked. The cleaned module then
+            shares the files with the export, editing one edits the other.
+    """
+
+    def __init__(self, workers=8, hardlink=False):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='copy')
+        self.hardlink = hardlink
+        self.futures = []
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+
+        # Cleared on the first filesystem refusing a reflink or a hard link
+        self.reflink_supported = fcntl is not None
+        self.hardlink_supported = hardlink
+
+        self.stats = {'files': 0, 'bytes': 0, 'reflinked': 0, 'hardlinked': 0, 'copied': 0, 'unchanged': 0}
+
+    def copy(self, source_path, destination_path):
+        # Queue the copy, errors are raised by `wait`
+        self.futures.append(self.executor.submit(self.copy_file, source_path, destination_path))
+
+    def wait(self):
+        """
+        Waits for the queued copies.
+
+        Returns:
+            dict: Number of files and bytes, per method, the elapsed seconds and the rates.
+        """
+        for future in self.futures:
+            future.result()
+        self.futures = []
+        self.executor.shutdown()
+
+        stats = dict(self.stats)
+        stats['time'] = time.perf_counter() - self.start
+        stats['files_per_second'] = stats['files'] / stats['time'] if stats['time'] else 0.0
+        stats['mb_per_second'] = stats['bytes'] / 1024 / 1024 / stats['time'] if stats['time'] else 0.0
+        return stats
+
+    def hash_files(self, paths):
+        """
+        Hashes the content of files in the copying threads.
+
+        Args:
+            paths (list): Paths of the files.
+
+        Returns:
+            list: SHA-256 digests, in the order of the paths.
+        """
+        return list(self.executor.map(self.get_content_hash, paths))
+
+    def get_content_hash(self, path):
+        # Hash through a memory map, hashlib releases the GIL on large buffers so the threads hash in parallel
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                    digest.update(content)
+        return digest.digest()
+
+    def copy_file(self, source_path, destination_path):
+        size = os.path.getsize(source_path)
+        if self.is_unchanged(source_path, destination_path, size):
+            method = 'unchanged'
+        elif self.reflink_supported and self.reflink(source_path, destination_path):
+            method = 'reflinked'
+        elif self.hardlink_supported and self.link(source_path, destination_path):
+            method = 'hardlinked'
+        else:
+            try:
+                shutil.copy2(source_path, destination_path)
+            except OSError as e:
+                raise Exception(f"Unable to copy {source_path} to {destination_path}: {e}")
+            method = 'copied'
+
+        with self.lock:
+            self.stats['files'] += 1
+            self.stats['bytes'] += size
+            self.stats[method] += 1
+
+    def is_unchanged(self, source_path, destination_path, size):
+        # Same size and same content, the content is only read when the sizes match but not the modification times
+        try:
+            destination_stat = os.stat(destination_path)
+        except FileNotFoundError:
+            return False
+        if destination_stat.st_size != size:
+            return False
+        source_stat = os.stat(source_path)
+        if destination_stat.st_mtime_ns == source_stat.st_mtime_ns or os.path.samestat(source_stat, destination_stat):
+            return True
+        return self.get_file_hash(source_path) == self.get_file_hash(destination_path)
+
+    def get_file_hash(self, path):
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.digest()
+
+    def reflink(self, source_path, destination_path):
+        # Clone the source with FICLONE, False if the filesystem cannot
+        try:
+            with open(source_path, 'rb') as source, open(destination_path, 'wb') as destination:
+                fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+        except OSError:
+            # Not supported by the filesystem or across filesystems, no need to try the next files
+            self.reflink_supported = False
+            return False
+        shutil.copystat(source_path, destination_path)
+        return True
+
+    def link(self, source_path, destination_path):
+        # Hard link the source, False if the filesystem cannot
+        try:
+            if os.path.lexists(destination_path):
+                os.remove(destination_path)
+            os.link(source_path, destination_path)
+        except OSError:
+            self.hardlink_supported = False
+            return False
+        return True
+
+# ====================================================
+#              Module tree
+# ====================================================
+
+class ModuleTree:
+    """
+    In-memory view of the cleaned module for the global passes. Each file is read and parsed at
+    most once, the passes share its parsed tree or its text, and `flush` writes every changed file
+    and deletes the removed ones once they all ran. The walk hands over the outputs the passes edit
+    instead of writing them.
+
+    Args:
+        held_paths (set): Paths of the outputs the walk hands over.
+    """
+
+    def __init__(self, held_paths=()):
+        self.held_paths = {os.path.normpath(path) for path in held_paths}
+
+        # Path -> {'text', 'root', 'changed'}, None once removed. A file not loaded yet has neither a
+        # text nor a root. The text holds the content when set, a pass writing the root clears it
+        self.files = {}
+
+        self.stats = {'read': 0, 'parsed': 0, 'written': 0, 'deleted': 0}
+
+    def holds(self, file_path):
+        return os.path.normpath(file_path) in self.held_paths
+
+    def get_file(self, file_path):
+        # Entry of a file, None if it does not exist
+        key = os.path.normpath(file_path)
+        if key not in self.files:
+            if not os.path.exists(key):
+                return None
+            self.files[key] = {'text': None, 'root': None, 'changed': False}
+        return self.files[key]
+
+    def exists(self, file_path):
+        return self.get_file(file_path) is not None
+
+    def get_etree_content(self, file_path):
+        entry = self.get_file(file_path)
+        if entry is None:
+            raise Exception(f"Error while getting etree content of file ({file_path}): file not found")
+        if entry['root'] is None:
+            try:
+                if entry['text'] is None:
+                    self.stats['read'] += 1
+                    entry['root'] = etree.parse(os.path.normpath(file_path)).getroot()
+                else:
+                    entry['root'] = etree.fromstring(entry['text'].encode('utf-8'))
+            except Exception as e:
+                raise Exception(f"Error while getting etree content of file ({file_path}): {e}")
+            self.stats['parsed'] += 1
+        return entry['root']
+
+    def write_etree_content(self, file_path, etree_content):
+        self.files[os.path.normpath(file_path)] = {'text': None, 'root': etree_content, 'changed': True}
+
+    def read_text(self, file_path):
+        entry = self.get_file(file_path)
+        if entry is None:
+            raise Exception(f"Unable to read file ({file_path}): file not found")
+        if entry['text'] is None:
+            if entry['root'] is not None:
+                entry['text'] = self.serialize(entry['root'])
+            else:
+                self.stats['read'] += 1
+                entry['text'] = Path(os.path.normpath(file_path)).read_text(encoding='utf-8')
+        return entry['text']
+
+    def write_text(self, file_path, content):
+        self.files[os.path.normpath(file_path)] = {'text': content, 'root': None, 'changed': True}
+
+    def remove(self, file_path):
+        self.files[os.path.normpath(file_path)] = None
+
+    def rename(self, old_file_path, new_file_path):
+        self.read_text(old_file_path)
+        entry = self.files[os.path.normpath(old_file_path)]
+        entry['changed'] = True
+        self.files[os.path.normpath(new_file_path)] = entry
+        self.remove(old_file_path)
+
+    def serialize(self, etree_content):
+        # Same output as CleanModule.write_etree_content
+        return etree.tostring(etree_content, pretty_print=True, encoding="UTF-8", xml_declaration=True).decode("utf-8")
+
+    def flush(self):
+        """
+        Writes the changed files and deletes the removed ones.
+
+        Returns:
+            dict: Number of files read, parsed, written and deleted.
+        """
+        for key, entry in self.files.items():
+            if entry is None:
+                if os.path.lexists(key):
+                    try:
+                        os.remove(key)
+                    except Exception as e:
+                        _logger.warning(f"Failed to remove file {key}: {e}")
+                        continue
+                    self.stats['deleted'] += 1
+            elif entry['changed']:
+                content = entry['text'] if entry['text'] is not None else self.serialize(entry['root'])
+                try:
+                    Path(key).parent.mkdir(parents=True, exist_ok=True)
+                    Path(key).write_text(content, encoding='utf-8')
+                except Exception as e:
+                    raise Exception(f"Unable to write file ({key}): {e}")
+                self.stats['written'] += 1
+        self.files = {}
+        return dict(self.stats)
+
+# ====================================================
+#              Symbol index
+# ====================================================
+
+class XmlIdIndex:
+    """
+    Symbol table of the records of XML files: the file, model and key fields of each xmlid, the
+    xmlids its fields refer to through 'ref' attributes and ref() calls in 'eval' attributes, and
+    the records referring to it. Each file of the export is scanned once, on its first lookup,
+    without keeping its tree. Parsed trees can be added as they are.
+
+    Args:
+        module_path (str): Path of the export, the files of `get_file_records` are relative to it.
+    """
+
+    # Fields whose text and ref are kept, the lookups of CleanModule only need these
+    KEY_FIELDS = frozenset(['model', 'model_id', 'name', 'group_id', 'field_id', 'type', 'inherit_id'])
+
+    # ref('xmlid') calls inside an 'eval' attribute
+    REF_CALL_PATTERN = re.compile(r"ref\(['\"]([\w\.]+)['\"]\)")
+
+    def __init__(self, module_path=None):
+        self.module_path = module_path
+
+        # xmlid -> record entry, records per file in document order, xmlid -> ids of the records referring to it
+        self.records = {}
+        self.file_records = {}
+        self.incoming = {}
+
+        self.stats = {'files': 0, 'records': 0}
+
+    def get(self, xmlid):
+        # Entry of a record of a file already scanned or added, None if unknown
+        return self.records.get(xmlid)
+
+    def get_incoming(self, xmlid):
+        return self.incoming.get(xmlid, ())
+
+    def get_file_records(self, relative_path):
+        """
+        Records of a file of the export, scanned on the first call.
+
+        Args:
+            relative_path (str): Path of the file relative to the export.
+
+        Returns:
+            list: Entries of the records in document order, with 'id', 'file', 'model', 'fields'
+                (key field name -> {'text', 'ref'} of its first direct <field> child), 'refs' and
+                'ref_fields' (tuple of the xmlids each referring <field> refers to).
+        """
+        if relative_path not in self.file_records:
+            self.file_records[relative_path] = []
+            path = os.path.join(self.module_path or '', relative_path)
+            if self.module_path and os.path.exists(path):
+                try:
+                    for _, record in etree.iterparse(path, events=('end',), tag='record'):
+                        self.add_record(relative_path, record)
+
+                        # Drop the records already indexed
+                        record.clear(keep_tail=True)
+                        while record.getprevious() is not None:
+                            del record.getparent()[0]
+                except Exception as e:
+                    raise Exception(f"Error while indexing the records of file ({path}): {e}")
+                self.stats['files'] += 1
+        return self.file_records[relative_path]
+
+    def add_tree(self, relative_path, root):
+        # Index the records of an already parsed file once
+        if relative_path not in self.file_records:
+            self.file_records[relative_path] = []
+            for record in root.iter('record'):
+                self.add_record(relative_path, record)
+            self.stats['files'] += 1
+
+    def add_record(self, relative_path, record):
+        xmlid = record.get('id')
+        fields = {}
+        refs = []
+        ref_fields = []
+        for field in record.iter('field'):
+            field_refs = []
+            ref = field.get('ref')
+            if ref:
+                field_refs.append(ref)
+            eval_attr = field.get('eval')
+            if eval_attr and 'ref(' in eval_attr:
+                field_refs.extend(self.REF_CALL_PATTERN.findall(eval_attr))
+            if field_refs:
+                refs.extend(field_refs)
+                ref_fields.append(tuple(field_refs))
+            name = field.get('name')
+            if name in self.KEY_FIELDS and name not in fields and field.getparent() is record:
+                fields[name] = {'text': field.text, 'ref': ref}
+
+        entry = {'id': xmlid, 'file': relative_path, 'model': record.get('model'), 'fields': fields, 'refs': refs, 'ref_fields': ref_fields}
+        self.file_records[relative_path].append(entry)
+        self.stats['records'] += 1
+        if xmlid:
+            self.records.setdefault(xmlid, entry)
+            for ref in set(refs):
+                self.incoming.setdefault(ref, []).append(xmlid)
+
+# ====================================================
+#              XML streaming
+# ====================================================
+
+class XmlStreamWriter:
+    """
+    Writes the cleaned content of an XML file for `CleanModule.stream_xml_file` from the events
+    of an iterparse, one top level element at a time.
+
+    The root and a <data> element under it are containers, their children are streamed. A child
+    is cleaned once its tail is parsed (the 'waiting' child), and written once the next kept child
+    is, because removing an element rewrites the whitespace in front of it. The previous kept child
+    (the 'last' one) stays in the tree for that, emptied, and is dropped once its tail is written.
+
+    Args:
+        clean_module (CleanModule): Runs the cleanup steps on each child.
+        output (file): Text file receiving the cleaned content.
+        file_name (str): Name of the file.
+        old_to_new_id_map (dict): Mapping of old record ids to new ones.
+        default_pricelist_id (str): Id of the default pricelist whose references are removed.
+        unwanted_fields (set): Field names removed from every file.
+        removable_fields_dict (dict): Cache of removable field names per model.
+        found_record (bool): The file has a <record>, its sequence fields are removed.
+        found_numeric_sequence (bool): A record has a numeric sequence, the root gets auto_sequence="1".
+    """
+
+    def __init__(self, clean_module, output, file_name, old_to_new_id_map, default_pricelist_id, unwanted_fields, removable_fields_dict,
+                 found_record, found_numeric_sequence):
+        self.clean_module = clean_module
+        self.output = output
+        self.file_name = file_name
+        self.old_to_new_id_map = old_to_new_id_map
+        self.default_pricelist_id = default_pricelist_id
+        self.unwanted_fields = unwanted_fields
+        self.removable_fields_dict = removable_fields_dict
+        self.found_record = found_record
+        self.found_numeric_sequence = found_numeric_sequence
+
+        # Open containers, innermost last, as dictionaries with:
+        # - 'element': the container element;
+        # - 'opened': its start tag and text are written;
+        # - 'visited': its own text and attributes are cleaned;
+        # - 'last': the last kept child, written but for its tail;
+        # - 'waiting': the last parsed child, cleaned and written once its tail is parsed.
+        self.containers = []
+
+        # Ids of the records in document order and their reference names
+        self.record_ids = []
+        self.ref_names = set()
+
+    def feed(self, event, element):
+        """
+        Handles one event of the iterparse of the file.
+
+        Args:
+            event (str): 'start', 'end', 'comment' or 'pi'.
+            element (etree.Element): Element of the event.
+        """
+        parent = element.getparent()
+
+        # The prolog and the epilog are copied as text
+        if not self.containers:
+            if event == 'start' and parent is None:
+                self.open_container(element)
+            return
+
+        container = self.containers[-1]
+        if event == 'end' and element is container['element']:
+            self.close_container(container)
+            return
+
+        # Elements inside a child are cleaned with the child
+        if parent is not container['element']:
+            return
+
+        self.visit_container(container)
+        if event == 'end':
+            container['waiting'] = element
+            return
+        self.clean_waiting_child(container)
+        if event in ('comment', 'pi'):
+            container['waiting'] = element
+
+        # The children of a <data> element under the root are streamed as well
+        elif len(self.containers) == 1 and element.tag == 'data':
+            self.write_pending(container)
+            if container['last'] is not None:
+                container['element'].remove(container['last'])
+            container['last'] = element
+            self.open_container(element)
+
+    def open_container(self, element):
+        self.containers.append({'element': element, 'opened': False, 'visited': False, 'last': None, 'waiting': None})
+
+    def close_container(self, container):
+        # Write the end of a container, a closed <data> element is then the waiting child of the root
+        element = container['element']
+        self.visit_container(container)
+        self.clean_waiting_child(container)
+        if container['opened'] or element.text:
+            self.write_pending(container)
+            self.write(f'</{element.tag}>')
+        else:
+            self.write(self.serialize_empty(element))
+        self.containers.pop()
+        if self.containers:
+            self.containers[-1]['waiting'] = element
+
+    def write(self, text):
+        # Special case handling for certain XML files
+        if self.file_name == 'ir_default.xml':
+            text = re.sub(r"<odoo>", '<odoo noupdate="1">', text)
+        self.output.write(text)
+
+    def serialize_text(self, text):
+        # Escaped like the serializer of the tree pipeline, indentation needs no escaping
+        if text.isspace() and '\r' not in text:
+            return text
+        holder = etree.Element('text')
+        holder.text = text
+        return etree.tostring(holder, encoding='unicode')[len('<text>'):-len('</text>')]
+
+    def serialize_empty(self, element):
+        # Start tag of the element with its attributes, auto_sequence first on the root like `clean_xml_tree`
+        attributes = dict(element.attrib)
+        if element.getparent() is None and self.found_numeric_sequence and element.tag == 'odoo':
+            attributes = dict(auto_sequence='1', **attributes)
+        return etree.tostring(etree.Element(element.tag, attributes), encoding='unicode')
+
+    def write_pending(self, container):
+        # Text in front of the next child: the start tag and the text of the container, or the tail of the last child
+        if not container['opened']:
+            self.write(self.serialize_empty(container['element'])[:-2] + '>')
+            container['opened'] = True
+            text = container['element'].text
+        else:
+            text = container['last'].tail
+        if text:
+            self.write(self.serialize_text(text))
+
+    def keep_child(self, container, child):
+        # The child is written, only its tail is still needed
+        if container['last'] is not None:
+            container['element'].remove(container['last'])
+        container['last'] = child
+        child.clear(keep_tail=True)
+
+    def visit_container(self, container):
+        # The text of a container is parsed at its first child, clean it before any child may be removed
+        if not container['visited']:
+            self.clean_module.clean_xml_subtree(
+                container['element'], None, self.old_to_new_id_map, self.default_pricelist_id, self.unwanted_fields, {}, descend=False
+            )
+            container['visited'] = True
+
+    def clean_waiting_child(self, container):
+        # Clean and write the last parsed child, its tail is parsed now
+        child = container['waiting']
+        if child is None:
+            return
+        container['waiting'] = None
+        clean_module = self.clean_module
+
+        # A closed <data> element only has its tail left
+        if child is container['last']:
+            if child.tail:
+                child.tail = clean_module.rewrite_xml_text(child.tail, self.old_to_new_id_map)
+            child.clear(keep_tail=True)
+            return
+
+        field_elements = {}
+        clean_module.clean_xml_subtree(
+            child, None, self.old_to_new_id_map, self.default_pricelist_id, self.unwanted_fields, field_elements
+        )
+        if child.getparent() is None:
+            return
+
+        # Remove sequence field, as auto_sequence = "1" is set on <odoo>
+        if self.found_record:
+            clean_module.remove_field_elements(field_elements, {'sequence'})
+
+        records = child.xpath('descendant-or-self::record') if isinstance(child.tag, str) else []
+        self.ref_names.update(
+            field.get('ref') for record in records for field in record if field.get('ref') and '.' not in field.get('ref')
+        )
+
+        # Remove computed fields without inverse methods and the fields based on model-specific rules of each record
+        clean_module.remove_field_elements(
+            field_elements,
+            record_field_names=lambda record: clean_module.get_removable_field_names(self.removable_fields_dict, record.get('model')),
+            dropped_counts=clean_module.dropped_field_counts,
+        )
+        clean_module.remove_field_elements(
+            field_elements, record_field_names=lambda record: clean_module.get_model_based_field_names(record.get('model'))
+        )
+        self.record_ids.extend(record.get('id') for record in records)
+
+        self.write_pending(container)
+        self.write(etree.tostring(child, encoding='unicode', with_tail=False))
+        self.keep_child(container, child)
+
+# ====================================================
+#              XML worker processes
+# ====================================================
+
+# (CleanModule, xml_context) of the current worker process, set by init_xml_worker
+XML_WORKER = None
+
+
+def init_xml_worker(config, metadata_provider, xml_context):
+    # Build the CleanModule of a worker process once, the rules are not picklable
+    global XML_WORKER
+    clean_module = CleanModule(**config)
+    clean_module.metadata_provider = metadata_provider
+    XML_WORKER = (clean_module, xml_context)
+
+
+def transform_xml_file_in_worker(source_path, file_name, output_path):
+    # Transform one file and report the counters and the metadata it added in this worker
+    clean_module, xml_context = XML_WORKER
+    removable_fields_dict = xml_context['removable_fields_dict']
+    rule_counts = dict(clean_module.xml_rule_counts)
+    dropped_field_counts = dict(clean_module.dropped_field_counts)
+    stage_timings = dict(clean_module.stage_timings)
+    known_models = set(removable_fields_dict)
+
+    result = clean_module.transform_xml_file(source_path, file_name, xml_context, output_path)
+    result['rule_counts'] = {name: count - rule_counts[name] for name, count in clean_module.xml_rule_counts.items()}
+    result['dropped_field_counts'] = {
+        model_name: count - dropped_field_counts.get(model_name, 0) for model_name, count in clean_module.dropped_field_counts.items()
+    }
+    result['removable_fields'] = {
+        model_name: field_names for model_name, field_names in removable_fields_dict.items() if model_name not in known_models
+    }
+    result['stage_timings'] = {
+        stage: seconds - stage_timings.get(stage, 0) for stage, seconds in clean_module.stage_timings.items()
+    }
+    return result
+
 # ====================================================
 #              CleanUp logic             
 # ====================================================
 
 
 class CleanModule:
-    def __init__(self, ind_name, ind_category, db_name, module_path, destination_base_path, port):
+    def __init__(self, ind_name, ind_category, db_name, module_path, destination_base_path, port, pipeline='string', rpc_timeout=60, rpc_retries=3,
+                 metadata_fetch='lazy', metadata_chunk_size=50, metadata_cache_dir=None, metadata_cache_size_mb=64,
+                 metadata_workers=4, metadata_snapshot=None, metadata_source='server', jobs=1, incremental=False,
+                 copy_workers=8, hardlink_attachments=False, reset_admin=True):
         self.ind_name = ind_name
         self.ind_category = ind_category
         self.db_name = db_name
         self.module_path = module_path
         self.port = port
         self.destination_base_path = destination_base_path
+
+        # Resets the login and password of the admin user in the restored database before the run,
+        # so that the JSON-RPC calls can log in
+        self.reset_admin = reset_admin
+
+        # Logs in on the first JSON-RPC call and is reused for the whole run
+        self.rpc_client = OdooJsonRpcClient(
+            f"{BASE_URL}{self.port}", self.db_name, LOGIN, PASSWORD, timeout=rpc_timeout, retries=rpc_retries, pool_size=max(metadata_workers, 4)
+        )
+
+        # Answers the metadata questions from a snapshot file or straight from the database ('postgres'
+        # source) instead of the server. Everything is already local then, so the models are read
+        # lazily and the persistent cache is not used
+        if metadata_snapshot:
+            self.metadata_provider = MetadataSnapshot(metadata_snapshot)
+        elif metadata_source == 'postgres':
+            self.metadata_provider = PostgresMetadataProvider(self.db_name)
+        else:
+            self.metadata_provider = None
+        if self.metadata_provider:
+            metadata_fetch = 'lazy'
+            metadata_cache_dir = None
+        self.metadata_source = 'snapshot' if metadata_snapshot else metadata_source
+
+        # 'lazy' calls fields_get on the first record of each model, 'bulk' reads the fields of all the
+        # models of the export from ir.model.fields before the walk, `metadata_chunk_size` models per call,
+        # 'prefetch' calls fields_get for all the models of the export in `metadata_workers` threads during the walk
+        self.metadata_fetch = metadata_fetch
+        self.metadata_chunk_size = metadata_chunk_size
+        self.metadata_workers = metadata_workers
+
+        # Prefetched fields_get results not used yet per model, and the time spent waiting for them
+        self.pending_metadata = {}
+        self.metadata_wait_stats = {'waits': 0, 'wait_time': 0.0}
+
+        # In-memory view of the cleaned module the global passes work on, set by `clean()`
+        self.module_tree = None
+
+        # (old to new id map, regex) of `replace_old_id_to_new_id`
+        self.id_rewrite_pattern = None
+
+        # Directory of the persistent field metadata cache, disabled when empty
+        self.metadata_cache_dir = metadata_cache_dir
+        self.metadata_cache_size_mb = metadata_cache_size_mb
+
+        # Number of worker processes transforming the XML files, 1 transforms them in the walk
+        self.jobs = jobs
+
+        # Keep a build journal next to the cleaned module and only redo what changed since the last run
+        self.incremental = incremental
+
+        # Threads copying the binary files, which may be hard linked to the export when they cannot be reflinked
+        self.copy_workers = copy_workers
+        self.hardlink_attachments = hardlink_attachments
+
+        # 'string' runs the regex passes on the file text, 'tree' parses each XML file once and runs every step on the tree,
+        # 'stream' runs the tree steps on one record at a time and writes it right away
+        self.pipeline = pipeline
+
+        # Substitution rules of edit_xml_content, compiled once, with the number of times each rule fired
+        self.xml_rule_counts = {}
+        self.xml_content_rules = self.get_xml_content_rules()
+        self.xml_content_rewriter = XmlRewriteEngine(self.xml_content_rules, self.xml_rule_counts)
+        self.xml_text_rewriter = XmlRewriteEngine([rule for rule in self.xml_content_rules if not rule['tree_handler']], self.xml_rule_counts)
+        self.xml_element_steps = self.get_xml_element_steps()
+
+        # Unwanted field names per model, looked up by the model of each record
+        self.model_field_index = {model: frozenset(field_names) for model, field_names in self.get_model_field_map().items()}
+
+        # Number of computed fields dropped from the records of each model
+        self.dropped_field_counts = {}
+
+        # Seconds spent in each stage of clean(), the 'xml:' stages are summed over the files (and the workers)
+        self.stage_timings = {}
         self.automated = {
             'author': 'Odoo S.A.',
             'category': '',
@@ -105,21 +1395,257 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
 """,
 }
 
-    def get_dependency_chains(self, directory):
+    def find_strongly_connected_components(self, nodes, successors):
+        """
+        Finds the strongly connected components of a directed graph with Tarjan's algorithm, iterative
+        so that long reference paths do not hit the recursion limit. Each node and edge is visited once.
+
+        Args:
+            nodes (list): Nodes of the graph, the components come out in a stable order for the same list.
+            successors (dict): Node -> iterable of the nodes it points to.
+
+        Returns:
+            list: Components as lists of nodes, a component comes after every component it points to.
+        """
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+
+        for root in nodes:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            # Nodes being visited with the iterator of their remaining successors
+            visits = [(root, iter(successors.get(root, ())))]
+
+            while visits:
+                node, children = visits[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        visits.append((child, iter(successors.get(child, ()))))
+                        break
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    visits.pop()
+                    if visits:
+                        parent = visits[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                    # The node is the root of a component, pop it with its members
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+
+        return components
+
+    def get_cycle_breaking_order(self, file_names, references):
+        """
+        Orders the files of a circular dependency so that the fewest fields refer to a file loaded after
+        theirs, each of these fields is written again at install by record_creation_post.xml. The search
+        is exhaustive up to CYCLE_ORDER_EXACT_LIMIT files (over the sets of files loaded first) and greedy
+        above, loading first the file referred to the most by the remaining files compared to how much it
+        refers to them.
+
+        Args:
+            file_names (list): Files of the circular dependency, equally good orders keep this order.
+            references (dict): File -> {referenced file: number of its fields referring to that file}.
+
+        Returns:
+            list: Files in the order to load them.
+        """
+        count = len(file_names)
+        weights = [[references[file_name].get(target, 0) for target in file_names] for file_name in file_names]
+
+        if count <= CYCLE_ORDER_EXACT_LIMIT:
+            # Set of the files loaded first (bit mask) -> (deferred fields, order), supersets come after their subsets
+            full_mask = (1 << count) - 1
+            best = {0: (0, [])}
+            for mask in range(full_mask):
+                if mask not in best:
+                    continue
+                cost, order = best[mask]
+                for index in range(count):
+                    if mask >> index & 1:
+                        continue
+                    # The next file defers its fields referring to the files still to load
+                    later_mask = full_mask ^ mask ^ (1 << index)
+                    candidate = (cost + sum(weights[index][target] for target in range(count) if later_mask >> target & 1), order + [index])
+                    next_mask = mask | (1 << index)
+                    if next_mask not in best or candidate < best[next_mask]:
+                        best[next_mask] = candidate
+            return [file_names[index] for index in best[full_mask][1]]
+
+        # Fields referring to the remaining files and fields of the remaining files referring to each file
+        outgoing = [sum(row) for row in weights]
+        incoming = [sum(weights[source][index] for source in range(count)) for index in range(count)]
+        remaining = list(range(count))
+        order = []
+        while remaining:
+            index = max(remaining, key=lambda candidate: (incoming[candidate] - outgoing[candidate], -candidate))
+            remaining.remove(index)
+            order.append(file_names[index])
+            for other in remaining:
+                outgoing[other] -= weights[other][index]
+                incoming[other] -= weights[index][other]
+        return order
+
+    def get_warning_dependency_chains(self, directory):
+        """
+        Reads the circular dependencies the exporter reported in the warnings.txt of the export, as lines
+        like "(demo) res.partner -> sale.order" after a "Found N circular dependencies" line.
+
+        Args:
+            directory (str): Path of the export.
+
+        Returns:
+            list: Chains as {'type': 'data' or 'demo', 'chain': [model names]}, empty without the file
+                or the count line.
+        """
         warning_txt_path = Path(directory + '/warnings.txt')
-        if warning_txt_path.exists():
-            with open(warning_txt_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+        if not warning_txt_path.exists():
+            return []
+        content = warning_txt_path.read_text(encoding='utf-8')
+
+        count_match = re.search(r"Found (\d+) circular dependencies", content)
+        if not count_match:
+            return []
+
+        # Capture lines starting with either (data) or (demo)
+        chains = re.findall(r"\((data|demo)\) (.+)", content)
+        return [{"type": dir, "chain": chain.strip().split(" -> ")} for dir, chain in chains]
+
+    def find_dependency_chains(self, directory, xmlid_index, old_to_new_id_map):
+        """
+        Finds the circular dependencies between the data files and between the demo files of the export.
+
+        Odoo loads the files of a directory one after the other, so a cycle of references between records
+        of several files cannot load whatever the order. The references of the records ('ref' attributes
+        and ref() calls in 'eval' attributes) are grouped per file, and the strongly connected components
+        of that graph are the cycles. The ids are compared as the cleaned module has them: renamed by
+        `old_to_new_id_map`, then rewritten by the text rules (the studio_customization. and base_module.
+        prefixes removed). In a component, each field referring to a file loaded later is deferred:
+        `process_dependencies` moves it to record_creation_post.xml. The demo files are ordered by
+        `order_manifest_demo_files`, so their order in a component is the one deferring the fewest fields.
+        The data files keep the order of the export manifest.
+
+        The cycles reported in warnings.txt by the exporter are kept as well, unless their two files are
+        already in one component.
+
+        Args:
+            directory (str): Path of the export.
+            xmlid_index (XmlIdIndex): Records of the export.
+            old_to_new_id_map (dict): Mapping of old record ids to new ones.
+
+        Returns:
+            list: Chains as {'type': 'data' or 'demo', 'chain': [referring file, referenced file]}, file
+                names without extension.
+        """
+        manifest_path = Path(directory + '/__manifest__.py')
+        manifest = literal_eval(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+        warning_chains = self.get_warning_dependency_chains(directory)
+
+        # Own engine so the ids are not counted in the rule counters
+        text_rewriter = XmlRewriteEngine([rule for rule in self.xml_content_rules if not rule['tree_handler']])
+        normalized_ids = {}
 
-            count_match = re.search(r"Found (\d+) circular dependencies", content)
-            if not count_match:
-                return []
+        def normalize(xmlid):
+            if xmlid not in normalized_ids:
+                normalized_ids[xmlid] = text_rewriter.rewrite(old_to_new_id_map.get(xmlid, xmlid))
+            return normalized_ids[xmlid]
+
+        dependency_chains = []
+        for dir in ['data', 'demo']:
+            dir_path = directory + '/' + dir
+            if not os.path.isdir(dir_path):
+                continue
+
+            # Files in the load order of the export manifest, the files it does not list come last
+            load_order = {path: position for position, path in enumerate(manifest.get(dir, []))}
+            file_names = sorted(
+                (file_name for file_name in os.listdir(dir_path) if self.get_source_kind('/' + dir + '/', file_name) == 'xml'),
+                key=lambda file_name: (load_order.get(dir + '/' + file_name, len(load_order)), file_name)
+            )
+
+            # File defining each record, the first one wins like for Odoo
+            defining_files = {}
+            for file_name in file_names:
+                for record in xmlid_index.get_file_records(dir + '/' + file_name):
+                    if record['id']:
+                        defining_files.setdefault(normalize(record['id']), file_name)
+
+            # Other files referred to by each field, and number of fields of a file referring to another file
+            field_targets = {file_name: [] for file_name in file_names}
+            references = {file_name: {} for file_name in file_names}
+            for file_name in file_names:
+                file_references = references[file_name]
+                for record in xmlid_index.get_file_records(dir + '/' + file_name):
+                    for field_refs in record['ref_fields']:
+                        targets = {defining_files.get(normalize(ref)) for ref in field_refs}
+                        targets.discard(None)
+                        targets.discard(file_name)
+                        if targets:
+                            field_targets[file_name].append(targets)
+                            for target in targets:
+                                file_references[target] = file_references.get(target, 0) + 1
+
+            def count_deferred(order):
+                # A field is deferred once, whatever the number of files loaded later it refers to
+                positions = {file_name: position for position, file_name in enumerate(order)}
+                return sum(
+                    1 for file_name in order for targets in field_targets[file_name]
+                    if any(positions.get(target, -1) > positions[file_name] for target in targets)
+                )
+
+            file_positions = {file_name: position for position, file_name in enumerate(file_names)}
+            file_components = {}
+            manifest_deferred = chosen_deferred = 0
+            for component_index, component in enumerate(self.find_strongly_connected_components(file_names, references)):
+                if len(component) < 2:
+                    continue
+                file_components.update((file_name, component_index) for file_name in component)
+                manifest_order = sorted(component, key=file_positions.get)
+                order = self.get_cycle_breaking_order(manifest_order, references) if dir == 'demo' else manifest_order
+                manifest_deferred += count_deferred(manifest_order)
+                chosen_deferred += count_deferred(order)
+
+                for position, file_name in enumerate(order):
+                    for target in order[position + 1:]:
+                        if target in references[file_name]:
+                            dependency_chains.append({'type': dir, 'chain': [file_name[:-len('.xml')], target[:-len('.xml')]]})
+                            _logger.info(f"Circular dependency: ({dir}) {file_name} -> {target}, {references[file_name][target]} fields")
+
+            # The cycles of warnings.txt the order of a component does not already break
+            for depend in warning_chains:
+                if depend['type'] != dir:
+                    continue
+                files = [file.replace('.', '_') for file in depend['chain']]
+                for file, target in zip(files, files[1:]):
+                    component = file_components.get(file + '.xml')
+                    chain = {'type': dir, 'chain': [file, target]}
+                    if (component is None or component != file_components.get(target + '.xml')) and chain not in dependency_chains:
+                        dependency_chains.append(chain)
+                        _logger.info(f"Circular dependency from warnings.txt: ({dir}) {file}.xml -> {target}.xml")
 
-            # Capture lines starting with either (data) or (demo)
-            chains = re.findall(r"\((data|demo)\) (.+)", content)
+            if manifest_deferred:
+                _logger.info(
+                    f"Cycle breaking ({dir}): {chosen_deferred} deferred writes, {manifest_deferred} in the order of the export manifest"
+                )
 
-            result = [{"type": dir, "chain": chain.split(" -> ")} for dir, chain in chains]
-            return result
+        return dependency_chains
 
     def process_dependencies(self, directory, dependency_chains, dependencies_collection):
         """
@@ -140,23 +1666,34 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         Returns:
             list: Updated collection of dependency metadata entries for circular references.
         """
+        # References between the records of the chain files, indexed from the trees of the module tree
+        chain_index = XmlIdIndex()
+
         for depend in dependency_chains:
             dependency_info = {}
 
             dir = depend.get('type')
             files =[file.replace('.', '_') + '.xml' for file in depend.get('chain')]
 
-            old_record_ids = []
+            old_record_ids = set()
             for file in reversed(files):
                 file_path = Path(directory + '/' + dir + '/' + file)
-                if file_path.exists():
-                    etree_file_content = self.get_etree_content(file_path)
+                if self.module_tree.exists(file_path):
+                    etree_file_content = self.module_tree.get_etree_content(file_path)
+                    chain_index.add_tree(dir + '/' + file, etree_file_content)
 
                     records = etree_file_content.xpath("//record")
-                    record_ids = [record.get("id") for record in records]
+                    record_ids = {record.get("id") for record in records}
+
+                    # Only the records referring to a record of the previous file can lose a field
+                    referring_ids = {
+                        referring_id for old_record_id in old_record_ids for referring_id in chain_index.get_incoming(old_record_id)
+                    }
 
                     for record in records:
                         record_id = record.get('id')
+                        if record_id is not None and record_id not in referring_ids:
+                            continue
                         model = record.get('model')
 
                         for field in record.xpath(".//field"):
@@ -180,7 +1717,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                                 removed = True
 
                             elif eval_attr:
-                                refs_found = re.findall(r"ref\(['\"]([\w\.]+)['\"]\)", eval_attr)
+                                refs_found = XmlIdIndex.REF_CALL_PATTERN.findall(eval_attr)
                                 if any(ref in old_record_ids for ref in refs_found):
                                     dependency_info['field_name'] = field.get("name")
                                     dependency_info['eval'] = field.get("eval")
@@ -190,7 +1727,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                             if removed:
                                 dependencies_collection.append(dependency_info)
 
-                    self.write_etree_content(file_path, etree_file_content)
+                    self.module_tree.write_etree_content(file_path, etree_file_content)
 
                     old_record_ids = record_ids
 
@@ -254,8 +1791,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
 </odoo>
 """
 
-            with open(destination_module_path + "/data/record_creation_post.xml", 'w') as f:
-                f.write(content)
+            self.module_tree.write_text(destination_module_path + "/data/record_creation_post.xml", content)
 
         if demo_file:
             content = f"""<?xml version='1.0' encoding='UTF-8'?>
@@ -263,39 +1799,467 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
 {demo_file}
 </odoo>
 """
-            with open(destination_module_path + "/demo/record_creation_post.xml", 'w') as f:
-                f.write(content)
+            self.module_tree.write_text(destination_module_path + "/demo/record_creation_post.xml", content)
 
         return bool(data_file), bool(demo_file)
 
+    def get_source_kind(self, current_dir, file_name):
+        """
+        Tells what `clean()` does with a file of the export.
+
+        Args:
+            current_dir (str): Directory of the file relative to the export.
+            file_name (str): Name of the file.
+
+        Returns:
+            str: 'xml' (transformed), 'manifest' (rewritten), 'copy' (copied), 'scss' (turned into a
+                theme customization) or None (left out).
+        """
+        ext = file_name.rsplit('.')[1] if '.' in file_name else ''
+        if ext == 'xml':
+            return 'xml'
+        elif ext in ['py', 'txt']:
+            return 'manifest' if file_name == '__manifest__.py' else None
+
+        # Files without an extension or as specific assets
+        elif not ext or (current_dir.endswith('/ir_attachment/') and ext != "scss"):
+            return 'copy'
+        elif current_dir.endswith('/ir_attachment/') and ext == "scss":
+            return 'scss'
+        return None
+
+    def write_manifest_file(self, source_path, destination_module_path, Ind_name):
+        # Rewrite the manifest of the export for the industry module, the final touches are done by arrange_manifest_files
+        manifest = literal_eval(Path(source_path).read_text(encoding="utf-8"))
+        with open(destination_module_path + '/__manifest__.py', 'w', encoding="utf-8") as f:
+            f.write('{\n')
+            for k, v in manifest.items():
+                if k == 'name':
+                    f.write(f"    '{k}': '{Ind_name}',\n")
+                elif k == 'description':
+                    continue
+                elif k not in self.automated:
+                    if isinstance(v, list):
+                        f.write(f"    '{k}': [\n")
+                        for item in v:
+
+                            # Skip unwanted dependencies
+                            unwanted_depends = [
+                                'base_module',
+                                '__import__',
+                                'account_invoice_extract',
+                                'account_online_synchronization',
+                                'account_peppol',
+                                'auth_totp_mail',
+                                'base_install_request',
+                                'crm_iap_enrich',
+                                'crm_iap_mine',
+                                'partner_autocomplete',
+                                'pos_epson_printer',
+                                'sale_async_emails',
+                                'snailmail_account',
+                                'web_grid',
+                                'web_studio',
+                                'social_push_notifications',
+                                'appointment_sms',
+                                'website_knowledge',
+                                'base_vat',
+                                'product_barcodelookup',
+                                'snailmail_account_followup',
+                                'base_geolocalize',
+                                'gamification',
+                                'l10n_be_pos_sale',
+                                'pos_sms',
+                                'pos_settle_due',
+                                'website_partner',
+                                'website_project',
+                                'project_sms',
+                                ]
+                            if k == 'depends' and (item in unwanted_depends or item.startswith('theme_')):
+                                continue
+                            f.write(f"        '{item}',\n")
+                        if k == 'data':
+                            f.write("        'data/mail_message.xml',\n")
+                            f.write("        'data/knowledge_article_favorite.xml',\n")
+                            f.write("        'data/knowledge_tour.xml',\n")
+                        f.write("    ],\n")
+                    else:
+                        f.write(f"    '{k}': '{v}',\n")
+                else:
+                    f.write(f"    '{k}': '{self.automated[k]}',\n")
+            f.write('}\n')
+
+    def get_post_passes(self, destination_module_path, scss_content_list, manifest_demo_file_list, dependency_chains, duplicate_attachment_files):
+        """
+        Builds the ordered global passes run on the cleaned module once every file is written.
+
+        Each pass is a dictionary with:
+        - 'name': name of the pass in the logs and the build journal.
+        - 'run': callable running the pass.
+        - 'reads', 'writes': patterns (fnmatch) of the paths relative to the module the pass reads
+          and edits, creates or deletes. A pass reading the demo file list of the manifest reads
+          'demo/*.xml', one adding to it writes '__manifest__.py'.
+
+        Args:
+            destination_module_path (str): Path of the cleaned module.
+            scss_content_list (list): SCSS customizations collected in the walk.
+            manifest_demo_file_list (list): Demo file metadata for the manifest.
+            dependency_chains (list): Circular dependency chains of `find_dependency_chains`.
+            duplicate_attachment_files (dict): Duplicate attachment files to their kept file, filled
+                before the walk.
+
+        Returns:
+            list: Ordered list of pass dictionaries.
+        """
+        post_passes = [
+            # Generate SCSS function from collected theme data
+            {'name': 'write_scss_function', 'run': lambda: self.write_scss_function(destination_module_path, scss_content_list),
+             'reads': ['*ir_attachment/*.scss'], 'writes': ['demo/website_theme_apply.xml']},
+
+            # Remove fields explicitly marked with ondelete=False
+            {'name': 'remove_ondelete_false_field', 'run': lambda: self.remove_ondelete_false_field(destination_module_path),
+             'reads': [], 'writes': ['data/ir_model_fields.xml']},
+        ]
+
+        # Clean up specific non-user created records
+        remove_file_names = ['ir_attachment_pre.xml', 'knowledge_cover.xml', 'mail_template.xml']
+        for remove_file_name in remove_file_names:
+            post_passes.append(
+                {'name': f'remove_record_not_created_by_user:{remove_file_name}',
+                 'run': lambda remove_file_name=remove_file_name: self.remove_record_not_created_by_user(destination_module_path, remove_file_name),
+                 'reads': [], 'writes': ['data/' + remove_file_name]}
+            )
+
+        # Files edited by the removal of the circular dependencies
+        chain_files = sorted({
+            depend['type'] + '/' + file.replace('.', '_') + '.xml' for depend in dependency_chains or [] for file in depend['chain']
+        })
+
+        post_passes += [
+            # Clean up default pricelists from data files
+            {'name': 'remove_default_pricelist', 'run': lambda: self.remove_default_pricelist(destination_module_path),
+             'reads': [], 'writes': ['data/product_pricelist.xml']},
+
+            # Organize records in a standard format, unused attachment files are deleted
+            {'name': 'remove_unused_ir_attachment_post', 'run': lambda: self.remove_unused_ir_attachment_post(destination_module_path),
+             'reads': ['demo/ir_ui_view.xml'], 'writes': ['demo/ir_attachment_post.xml', '*ir_attachment/*']},
+
+            # Point the attachments at a single file per content, the duplicates are not copied
+            {'name': 'dedupe_ir_attachment_post',
+             'run': lambda: self.dedupe_ir_attachment_post(destination_module_path, duplicate_attachment_files),
+             'reads': ['demo/ir_ui_view.xml', '*ir_attachment/*'], 'writes': ['demo/ir_attachment_post.xml', '*ir_attachment/*']},
+            {'name': 'order_ir_attachment_post', 'run': lambda: self.order_ir_attachment_post(destination_module_path),
+             'reads': [], 'writes': ['demo/ir_attachment_post.xml']},
+
+            # Retain only welcome article in the knowledge article
+            {'name': 'clean_knowledge_article', 'run': lambda: self.clean_knowledge_article(destination_module_path),
+             'reads': [], 'writes': ['data/knowledge_article.xml']},
+
+            # Add demo payment provider if relevant module is present
+            {'name': 'add_demo_payment_provider', 'run': lambda: self.add_demo_payment_provider(destination_module_path, manifest_demo_file_list),
+             'reads': [], 'writes': ['demo/payment_provider_demo.xml', '__manifest__.py']},
+
+            # Add immediate install function for the theme module in demo XML files
+            {'name': 'add_theme_immediate_install_function', 'run': lambda: self.add_theme_immediate_install_function(destination_module_path),
+             'reads': ['demo/website.xml'], 'writes': ['demo/website_theme_apply.xml']},
+
+            {'name': 'clean_sale_order_line_record', 'run': lambda: self.clean_sale_order_line_record(destination_module_path),
+             'reads': [], 'writes': ['demo/sale_order_line.xml']},
+
+            # Update manifest file
+            {'name': 'arrange_manifest_files',
+             'run': lambda: self.arrange_manifest_files(destination_module_path, manifest_demo_file_list, dependency_chains),
+             'reads': ['demo/*.xml'],
+             'writes': [
+                 '__manifest__.py', 'demo/ir_ui_view.xml', 'demo/website_view.xml',
+                 'data/ir_attachment_pre.xml', 'data/knowledge_cover.xml', 'data/mail_template.xml', 'data/product_pricelist.xml',
+                 'data/record_creation_post.xml', 'demo/record_creation_post.xml',
+             ] + chain_files},
+        ]
+        return post_passes
+
+    def expand_pass_paths(self, patterns, output_paths):
+        # Concrete paths of pass patterns, wildcards only cover the outputs of the export files
+        paths = set()
+        for pattern in patterns:
+            if any(char in pattern for char in '*?['):
+                paths.update(fnmatch.filter(output_paths, pattern))
+            else:
+                paths.add(pattern)
+        return paths
+
+    def get_rerun_passes(self, post_passes, changed_paths, output_paths):
+        """
+        Selects the global passes an incremental run has to rerun.
+
+        A pass reruns when a file it reads or writes changed, the files it writes then count as
+        changed for the passes after it. The files written by a rerun pass are restored to their
+        transformed content first, so every other pass writing them reruns as well. Those passes
+        see the same input as in the last run, so their output does not count as changed.
+
+        Args:
+            post_passes (list): Passes of `get_post_passes`, in run order.
+            changed_paths (set): Paths relative to the module of the outputs whose source changed.
+            output_paths (set): Paths relative to the module of the outputs of the export files.
+
+        Returns:
+            tuple: (set of the names of the passes to rerun, set of the paths to restore)
+        """
+        changed_paths = set(changed_paths)
+        rerun_names = set()
+        for post_pass in post_passes:
+            if any(fnmatch.fnmatch(path, pattern) for path in changed_paths for pattern in post_pass['reads'] + post_pass['writes']):
+                rerun_names.add(post_pass['name'])
+                changed_paths |= self.expand_pass_paths(post_pass['writes'], output_paths)
+
+        restore_paths = set()
+        while True:
+            for post_pass in post_passes:
+                if post_pass['name'] in rerun_names:
+                    restore_paths |= self.expand_pass_paths(post_pass['writes'], output_paths)
+            restored_writers = {
+                post_pass['name'] for post_pass in post_passes
+                if self.expand_pass_paths(post_pass['writes'], output_paths) & restore_paths
+            }
+            if restored_writers <= rerun_names:
+                return rerun_names, restore_paths
+            rerun_names |= restored_writers
+
+    def get_build_fingerprints(self, unwanted_fields, old_to_new_id_map, default_pricelist_id, dependency_chains, post_passes):
+        """
+        Fingerprints of what every file of the export depends on, recorded in the build journal.
+        An incremental run rebuilds everything when one of them changed.
+
+        The script itself is fingerprinted by CLEANUP_VERSION and the definitions of its rules and
+        passes, so editing a comment does not force a full rebuild.
+
+        Args:
+            unwanted_fields (list): Field names removed from every XML file.
+            old_to_new_id_map (dict): Renamed record ids.
+            default_pricelist_id (str): Id of the default pricelist.
+            dependency_chains (list): Circular dependency chains of `find_dependency_chains`.
+            post_passes (list): Passes of `get_post_passes`.
+
+        Returns:
+            dict: 'rules' (cleanup version, substitution rules, passes and options), 'metadata' (field
+                metadata and module states) and 'context' (inputs read from a few files of the export).
+        """
+        def get_hash(value):
+            return hashlib.sha1(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+        rules = [
+            [rule['name'], rule['pattern'].pattern, rule['replacement'] if isinstance(rule['replacement'], str) else rule['replacement'].__qualname__]
+            for rule in self.xml_content_rules
+        ]
+        passes = [[post_pass['name'], post_pass['reads'], post_pass['writes']] for post_pass in post_passes]
+        return {
+            'rules': get_hash([
+                CLEANUP_VERSION, rules, passes, self.get_model_field_map(), unwanted_fields,
+                self.pipeline, self.ind_name, self.ind_category,
+            ]),
+            'metadata': self.get_metadata_fingerprint(),
+            'context': get_hash([old_to_new_id_map, default_pricelist_id, dependency_chains]),
+        }
+
+    def add_stage_time(self, stage, start):
+        # Add the time since `start` to a stage, the end is the start of the next stage
+        end = time.perf_counter()
+        self.stage_timings[stage] = self.stage_timings.get(stage, 0) + end - start
+        return end
+
     def clean(self):
         # Format the industry name and category by replacing underscores/hyphens with spaces and capitalizing
         Ind_name = re.sub(r'[_-]', ' ', self.ind_name).title()
         Ind_category = re.sub(r'[_-]', ' ', self.ind_category).title()
         self.automated['category'] = Ind_category
 
-        os.system(f"psql {self.db_name} -c \"UPDATE res_users SET login='{LOGIN}', password='{PASSWORD}' WHERE id=2;\"")
+        if self.reset_admin:
+            os.system(f"psql {self.db_name} -c \"UPDATE res_users SET login='{LOGIN}', password='{PASSWORD}' WHERE id=2;\"")
+        clean_start = time.perf_counter()
 
         # Construct the destination path for the cleaned module
         destination_module_path = self.destination_base_path + '/' + self.ind_name
         directory = self.module_path
 
-        # Fetch field metadata of fields
-        fields_info_dict = {}
-
         scss_content_list = []
         manifest_demo_file_list = []
 
-        # Getting circular dependency chain from warnings.txt file
-        dependency_chains = []
-        dependency_chains = self.get_dependency_chains(directory)
-        
+        # Records of the export, each file is scanned on its first lookup
+        stage_start = time.perf_counter()
+        xmlid_index = XmlIdIndex(directory)
+
         # store old_id --> new_id (for thode records whose ids are generated in rendom hexadecimal)
-        old_to_new_id_map = self.prepare_old_to_new_id_map()
+        old_to_new_id_map = self.prepare_old_to_new_id_map(xmlid_index)
 
 
         # get default pricelist id for remove ref
-        default_pricelist_id = self.get_default_pricelist_id(self.module_path)
+        default_pricelist_id = self.get_default_pricelist_id(xmlid_index)
+
+        # Predefined unwanted fields removed from every XML file
+        unwanted_fields = ['color', 'inherited_permission', 'access_token', 'document_token', 'peppol_verification_state', 'uuid']
+
+        stage_start = self.add_stage_time('prepare', stage_start)
+
+        # Compare the export with the build journal of the last incremental run
+        build_journal = BuildJournal(self.destination_base_path + '/.' + self.ind_name + '.build')
+        journal = None
+        changed_sources = set()
+        if self.incremental:
+            journal = build_journal.load()
+            sources = build_journal.scan_sources(directory, journal['sources'] if journal else {})
+
+        # Circular dependencies between the records of the data or demo files, the journal has them when no file changed
+        if journal and journal.get('cleanup_version') == CLEANUP_VERSION and sources == journal['sources']:
+            dependency_chains = journal['dependency_chains']
+        else:
+            dependency_chains = self.find_dependency_chains(directory, xmlid_index, old_to_new_id_map)
+        stage_start = self.add_stage_time('dependency_chains', stage_start)
+
+        # The global passes run once every file is written
+        duplicate_attachment_files = {}
+        post_passes = self.get_post_passes(
+            destination_module_path, scss_content_list, manifest_demo_file_list, dependency_chains, duplicate_attachment_files
+        )
+
+        if self.incremental:
+            fingerprints = self.get_build_fingerprints(unwanted_fields, old_to_new_id_map, default_pricelist_id, dependency_chains, post_passes)
+            if journal and journal['fingerprints'] != fingerprints:
+                changed = [name for name, fingerprint in fingerprints.items() if journal['fingerprints'][name] != fingerprint]
+                _logger.info(f"Build journal: {', '.join(changed)} changed, rebuilding everything")
+                journal = None
+            elif journal and not os.path.isdir(destination_module_path):
+                journal = None
+            if journal:
+                changed_sources = {path for path in sources.keys() | journal['sources'].keys() if sources.get(path) != journal['sources'].get(path)}
+                if not changed_sources:
+                    _logger.info("Build journal: nothing changed since the last run")
+                    print("clean up successful")
+                    return
+        build_journal.invalidate()
+        stage_start = self.add_stage_time('journal', stage_start)
+
+        # Removable (computed, readonly, not stored) field names per model, fetched once per model
+        removable_fields_dict = {}
+        if journal:
+            removable_fields_dict.update({model_name: frozenset(field_names) for model_name, field_names in journal['removable_fields'].items()})
+        metadata_cache = self.open_metadata_cache()
+        if metadata_cache:
+            removable_fields_dict.update(metadata_cache.load())
+            cached_models = len(removable_fields_dict)
+        metadata_prefetch = None
+        if self.metadata_fetch == 'bulk':
+            self.prefetch_removable_fields(removable_fields_dict, sorted(self.iter_export_models(directory)))
+        elif self.metadata_fetch == 'prefetch':
+            metadata_prefetch = self.start_metadata_prefetch(removable_fields_dict, directory)
+        stage_start = self.add_stage_time('metadata', stage_start)
+
+        # Everything the transformation of one XML file needs besides the file itself
+        xml_context = {
+            'old_to_new_id_map': old_to_new_id_map,
+            'default_pricelist_id': default_pricelist_id,
+            'unwanted_fields': unwanted_fields,
+            'removable_fields_dict': removable_fields_dict,
+        }
+
+        # Results of the XML files per path relative to the export, reused from the journal for the unchanged files
+        xml_results = {}
+
+        rerun_names = {post_pass['name'] for post_pass in post_passes}
+        restore_paths = set()
+        staged_paths = set()
+        if journal:
+            # The outputs of the export files, a source path is also the path of its output
+            output_paths = set()
+            for path in sources.keys() | journal['sources'].keys():
+                current_dir, _, file_name = ('/' + path).rpartition('/')
+                kind = self.get_source_kind(current_dir + '/', file_name)
+                if kind in ('xml', 'copy'):
+                    output_paths.add(path)
+                elif kind == 'manifest':
+                    output_paths.add('__manifest__.py')
+                    if path in changed_sources:
+                        changed_sources.add('__manifest__.py')
+            rerun_names, restore_paths = self.get_rerun_passes(post_passes, changed_sources, output_paths)
+
+            # Drop the outputs of the removed files, and the files created by a pass about to rerun
+            for path in ((journal['sources'].keys() - sources.keys()) & output_paths) | (restore_paths - output_paths):
+                Path(destination_module_path + '/' + path).unlink(missing_ok=True)
+                build_journal.unstage(path)
+
+            for path, result in journal['xml_results'].items():
+                if path in sources and path not in changed_sources:
+                    result = dict(result)
+                    if path in restore_paths:
+                        result['content'] = build_journal.read_stage(path)
+                        if result['content'] is None:
+                            continue
+                    xml_results[path] = result
+            reused_paths = set(xml_results)
+            _logger.info(
+                f"Build journal: {len(changed_sources)} files changed, {len(restore_paths)} outputs restored, "
+                f"passes rerun: {', '.join(post_pass['name'] for post_pass in post_passes if post_pass['name'] in rerun_names) or 'none'}"
+            )
+
+        elif self.incremental and build_journal.directory.exists():
+            # Start over from an empty module, the passes are not meant to run twice on an output
+            if os.path.isdir(destination_module_path):
+                _logger.warning(f"Build journal: full rebuild, deleting the cleaned module {destination_module_path}")
+            shutil.rmtree(destination_module_path, ignore_errors=True)
+            shutil.rmtree(build_journal.stage_directory, ignore_errors=True)
+
+        # Outputs the passes edit in place, their transformed content is staged for the next incremental runs
+        pass_output_paths = set()
+        for post_pass in post_passes:
+            pass_output_paths |= {path for path in self.expand_pass_paths(post_pass['writes'], set()) if path.endswith('.xml')}
+        if self.incremental:
+            staged_paths = pass_output_paths
+
+        stage_start = self.add_stage_time('journal', stage_start)
+
+        # The walk hands these outputs over to the passes, which write them once at the end
+        self.module_tree = ModuleTree(destination_module_path + '/' + path for path in pass_output_paths)
+
+        # The binary files of the attachments no view uses are never copied, and only one file per content
+        # is. Both files are transformed ahead of the walk, which then only merges them
+        reference_contents = {}
+        for path in ('demo/ir_attachment_post.xml', 'demo/ir_ui_view.xml'):
+            output_path = destination_module_path + '/' + path
+            if not os.path.exists(directory + '/' + path):
+                break
+            reused = path in xml_results
+            if not reused:
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                xml_results[path] = self.transform_xml_file(directory + '/' + path, os.path.basename(path), xml_context, output_path)
+
+            # The output of a reused file may already be edited by the passes, the stage holds its transformed content
+            content = xml_results[path].get('content')
+            if content is None and reused:
+                content = build_journal.read_stage(path)
+            reference_contents[path] = content if content is not None else Path(output_path).read_text(encoding='utf-8')
+        used_attachment_files = set()
+        unused_attachment_files = set()
+        if 'demo/ir_attachment_post.xml' in reference_contents:
+            root_ir_attachment_post = etree.fromstring(reference_contents['demo/ir_attachment_post.xml'].encode('utf-8'))
+
+            # Without views remove_unused_ir_attachment_post keeps every record, all their files are deduplicated
+            unused_records = []
+            if 'demo/ir_ui_view.xml' in reference_contents:
+                unused_records = self.get_unused_ir_attachment_post_records(root_ir_attachment_post, reference_contents['demo/ir_ui_view.xml'])
+            used_attachment_files, unused_attachment_files = self.get_ir_attachment_post_files(root_ir_attachment_post, unused_records)
+        skipped_attachments = {'unused': {'files': 0, 'bytes': 0}, 'duplicate': {'files': 0, 'bytes': 0}}
+
+        # Binary files are copied in background threads during the walk
+        attachment_copier = AttachmentCopier(self.copy_workers, self.hardlink_attachments)
+
+        # Only one file per content is copied, dedupe_ir_attachment_post points the records at it
+        duplicate_attachment_files.update(self.get_duplicate_attachment_files(directory, used_attachment_files, attachment_copier))
+
+        stage_start = self.add_stage_time('attachment_reachability', stage_start)
+
+        # With --jobs, the worker processes get the metadata of every model of the export up front
+        xml_tasks = []
+        if self.jobs > 1:
+            self.resolve_export_models(removable_fields_dict, directory)
 
         # Traverse the module directory recursively
         for root, dirs, files in os.walk(directory):
@@ -305,337 +2269,768 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
             for d in dirs:
                 os.makedirs(destination_module_path + current_dir + d, exist_ok=True)
             for file_name in files:
-                ext = file_name.rsplit('.')[1] if '.' in file_name else ''
+                kind = self.get_source_kind(current_dir, file_name)
+                path = current_dir[1:] + file_name
 
-                # Process XML files
-                if ext == 'xml':
-                    content = Path(root + '/' + file_name).read_text(encoding="utf-8")
+                # An incremental run only writes the outputs whose source changed or which are restored
+                refresh = not journal or path in changed_sources or path in restore_paths
 
-                    # replace old_id to new_id in xml file 
-                    content = self.replace_old_id_to_new_id(content, old_to_new_id_map)
+                # Process XML files, in the worker pool after the walk with --jobs
+                if kind == 'xml':
+                    if self.jobs > 1:
+                        xml_tasks.append((root + '/' + file_name, current_dir, file_name))
+                        continue
+                    if path not in xml_results:
+                        xml_results[path] = self.transform_xml_file(
+                            root + '/' + file_name, file_name, xml_context, destination_module_path + current_dir + file_name
+                        )
+                    self.merge_xml_result(xml_results[path], current_dir, file_name, destination_module_path, manifest_demo_file_list)
 
-                    # remove field with default pricelist reference
-                    content = self.remove_default_pricelist_ref(default_pricelist_id, content)
-                    
-                    # Apply module-specific modifications to XML content
-                    content = self.edit_xml_content(content)
+                # Handle manifest file separately
+                elif kind == 'manifest':
+                    if refresh or '__manifest__.py' in restore_paths:
+                        manifest_start = time.perf_counter()
+                        self.write_manifest_file(root + '/' + file_name, destination_module_path, Ind_name)
+                        self.add_stage_time('manifest', manifest_start)
 
-                    # Remove predefined unwanted fields from the XML
-                    unwanted_fields = ['color', 'inherited_permission', 'access_token', 'document_token', 'peppol_verification_state', 'uuid']
-                    content = self.remove_unwanted_fields(content, unwanted_fields)
+                # Copy other files without an extension or as specific assets
+                elif kind == 'copy':
+                    attachment_file = self.ind_name + current_dir + file_name
+                    if attachment_file in unused_attachment_files or attachment_file in duplicate_attachment_files:
+                        skipped = skipped_attachments['unused' if attachment_file in unused_attachment_files else 'duplicate']
+                        skipped['files'] += 1
+                        skipped['bytes'] += os.path.getsize(root + '/' + file_name)
 
-                    # Remove sequence field and add auto_sequence = "1" in <odoo>
-                    content = self.process_sequence_field(content)
+                    # A file no longer unused or duplicate has no output yet
+                    elif refresh or not os.path.exists(destination_module_path + current_dir + file_name):
+                        attachment_copier.copy(root + '/' + file_name, destination_module_path + current_dir + file_name)
 
-                    xml_root = etree.fromstring(content.encode("utf-8"))
-                    
-                    # Collect reference names from the XML records
-                    ref_name_list = list(set([
-                        field.get('ref')
-                        for record in xml_root.xpath("//record")
-                        for field in record
-                        if field.get('ref') and '.' not in field.get('ref')
-                    ]))
-
-                    # Store metadata of demo files without records for later use
-                    if current_dir.endswith('/demo/') and not xml_root.xpath("//record"):
-                        manifest_demo_file_dict = {
-                            'file_name': file_name,
-                            'ref_name': ref_name_list
-                        }
-                        manifest_demo_file_list.append(manifest_demo_file_dict)
-
-                    for record in xml_root.xpath("//record"):
-                        
-                        # Store metadata of demo files with records for later use
-                        self.unorder_manifest_demo_files(manifest_demo_file_list, current_dir, file_name, ref_name_list, record)
-
-                        model_name = record.get('model')
-                        if not model_name:
-                            continue
+                # Extract relevant SCSS customization data
+                elif kind == 'scss':
+                    self.get_relevant_scss_data(scss_content_list, root, file_name)
+
+        stage_start = self.add_stage_time('walk', stage_start)
+
+        # Transform the XML files in the worker pool and merge the results in walk order
+        if xml_tasks:
+            self.run_xml_jobs(xml_tasks, xml_context, destination_module_path, manifest_demo_file_list, xml_results)
+            stage_start = self.add_stage_time('xml_jobs', stage_start)
+
+        # The passes delete unused binary files left by an earlier run, every copy has to be done first
+        copy_stats = attachment_copier.wait()
+        stage_start = self.add_stage_time('attachment_copy', stage_start)
+        if skipped_attachments['unused']['files']:
+            _logger.info(
+                f"Attachment reachability: {skipped_attachments['unused']['files']} unused files not copied, "
+                f"{skipped_attachments['unused']['bytes'] / 1024 / 1024:.1f} MB"
+            )
+        if skipped_attachments['duplicate']['files']:
+            _logger.info(
+                f"Attachment dedup: {skipped_attachments['duplicate']['files']} duplicate files not copied, "
+                f"{skipped_attachments['duplicate']['bytes'] / 1024 / 1024:.1f} MB saved"
+            )
+        if copy_stats['files']:
+            _logger.info(
+                f"Attachment copy: {copy_stats['files']} files ({copy_stats['reflinked']} reflinked, {copy_stats['hardlinked']} hard linked, "
+                f"{copy_stats['copied']} copied, {copy_stats['unchanged']} unchanged), {copy_stats['bytes'] / 1024 / 1024:.1f} MB in "
+                f"{copy_stats['time']:.2f}s, {copy_stats['files_per_second']:.0f} files/s, {copy_stats['mb_per_second']:.1f} MB/s"
+            )
+
+        # Drop the prefetched models no record needed
+        if metadata_prefetch:
+            metadata_prefetch.shutdown(wait=False, cancel_futures=True)
+            _logger.info(
+                f"Metadata prefetch: {self.metadata_wait_stats['waits']} waits, {self.metadata_wait_stats['wait_time']:.3f}s waited, "
+                f"{len(self.pending_metadata)} models unused"
+            )
+            self.pending_metadata.clear()
+
+        # Keep the fetched field metadata for the next runs
+        if metadata_cache and len(removable_fields_dict) != cached_models:
+            metadata_cache.save(removable_fields_dict)
+        if metadata_cache:
+            _logger.info(f"Metadata cache: {cached_models} models loaded, {len(removable_fields_dict) - cached_models} models fetched")
+
+        # Stage the transformed content of the outputs the passes are about to edit
+        for path in staged_paths & xml_results.keys():
+            if not journal or path not in reused_paths:
+                build_journal.stage(path, self.module_tree.read_text(destination_module_path + '/' + path))
+
+        # Run the global passes in order, an incremental run only reruns the ones depending on a changed file
+        stage_start = time.perf_counter()
+        for post_pass in post_passes:
+            if post_pass['name'] in rerun_names:
+                post_pass['run']()
+                stage_start = self.add_stage_time('pass:' + post_pass['name'], stage_start)
+
+        # Write the files the passes changed, each once
+        module_tree_stats = self.module_tree.flush()
+        self.add_stage_time('module_tree_flush', stage_start)
+        self.module_tree = None
+        _logger.info(
+            f"Module tree: {module_tree_stats['read']} files read, {module_tree_stats['parsed']} parsed, "
+            f"{module_tree_stats['written']} written, {module_tree_stats['deleted']} deleted"
+        )
+
+        # Write mandatory files such as templates or init scripts
+        for file, content in self.mandatory_files.items():
+            directory, _ = os.path.split(file)
+            os.makedirs(destination_module_path + directory, exist_ok=True)
+            Path(destination_module_path + file).write_text(content.format(ind_name=self.ind_name, Ind_name=Ind_name), encoding='UTF-8')
 
-                        # Remove fields based on model-specific rules
-                        content = self.remove_model_based_fields(model_name, content)
+        # Record what this run built for the next incremental run
+        if self.incremental:
+            build_journal.save({
+                'cleanup_version': CLEANUP_VERSION,
+                'fingerprints': fingerprints,
+                'sources': sources,
+                'dependency_chains': dependency_chains,
+                'xml_results': {path: {'record_ids': result['record_ids'], 'ref_name_list': result['ref_name_list']} for path, result in xml_results.items()},
+                'removable_fields': {model_name: sorted(field_names) for model_name, field_names in sorted(removable_fields_dict.items())},
+                'passes': {post_pass['name']: {'reads': post_pass['reads'], 'writes': post_pass['writes']} for post_pass in post_passes},
+            })
 
-                        # Clean computed fields without inverse methods
-                        content = self.remove_computed_fields(fields_info_dict, model_name, record, content)
+        # Report how many computed fields were dropped from the records of each model
+        _logger.info("Computed fields dropped per model: " + ", ".join(f"{model}={count}" for model, count in sorted(self.dropped_field_counts.items())))
 
-                    # Special case handling for certain XML files
-                    if file_name == 'ir_default.xml':
-                        content = re.sub(r"<odoo>", '<odoo noupdate="1">', content)
+        # Report what the server round-trips cost
+        if self.rpc_client.stats['calls']:
+            _logger.info("JSON-RPC: " + ", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in self.rpc_client.get_stats().items()))
 
-                    # Write the processed XML content to the destination
-                    Path(destination_module_path + current_dir + file_name).write_text(content, encoding='utf-8')
+        # Report how many times each edit_xml_content rule fired
+        _logger.info("edit_xml_content rules fired: " + ", ".join(f"{name}={count}" for name, count in self.xml_rule_counts.items()))
 
-                # Handle manifest file separately
-                elif ext in ['py', 'txt']:
-                    if file_name != '__manifest__.py':
-                        continue
-                    manifest = literal_eval(Path(root + '/' + file_name).read_text(encoding="utf-8"))
-                    with open(destination_module_path + '/__manifest__.py', 'w', encoding="utf-8") as f:
-                        f.write('{\n')
-                        for k, v in manifest.items():
-                            if k == 'name':
-                                f.write(f"    '{k}': '{Ind_name}',\n")
-                            elif k == 'description':
-                                continue
-                            elif k not in self.automated:
-                                if isinstance(v, list):
-                                    f.write(f"    '{k}': [\n")
-                                    for item in v:
-
-                                        # Skip unwanted dependencies
-                                        unwanted_depends = [
-                                            'base_module',
-                                            '__import__',
-                                            'account_invoice_extract',
-                                            'account_online_synchronization',
-                                            'account_peppol',
-                                            'auth_totp_mail',
-                                            'base_install_request',
-                                            'crm_iap_enrich',
-                                            'crm_iap_mine',
-                                            'partner_autocomplete',
-                                            'pos_epson_printer',
-                                            'sale_async_emails',
-                                            'snailmail_account',
-                                            'web_grid',
-                                            'web_studio',
-                                            'social_push_notifications',
-                                            'appointment_sms',
-                                            'website_knowledge',
-                                            'base_vat',
-                                            'product_barcodelookup',
-                                            'snailmail_account_followup',
-                                            'base_geolocalize',
-                                            'gamification',
-                                            'l10n_be_pos_sale',
-                                            'pos_sms',
-                                            'pos_settle_due',
-                                            'website_partner',
-                                            'website_project',
-                                            'project_sms',
-                                            ]
-                                        if k == 'depends' and (item in unwanted_depends or item.startswith('theme_')):
-                                            continue
-                                        f.write(f"        '{item}',\n")
-                                    if k == 'data':
-                                        f.write("        'data/mail_message.xml',\n")
-                                        f.write("        'data/knowledge_article_favorite.xml',\n")
-                                        f.write("        'data/knowledge_tour.xml',\n")
-                                    f.write("    ],\n")
-                                else:
-                                    f.write(f"    '{k}': '{v}',\n")
-                            else:
-                                f.write(f"    '{k}': '{self.automated[k]}',\n")
-                        f.write('}\n')
+        # Report where the time went
+        self.add_stage_time('total', clean_start)
+        _logger.info("Stage timings: " + ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in self.stage_timings.items()))
 
-                # Copy other files without an extension or as specific assets
-                elif not ext or (current_dir.endswith('/ir_attachment/') and ext != "scss"):
-                    shutil.copy(root + '/' + file_name, destination_module_path + current_dir + file_name)
+        print("clean up successful")
 
-                # Extract relevant SCSS customization data
-                elif current_dir.endswith('/ir_attachment/') and ext == "scss":
-                    self.get_relevant_scss_data(scss_content_list, root, file_name)
+    def get_etree_content(self, file_path):
+        try:
+            # Parse the xml file straight from disk, without a copy of its text
+            return etree.parse(str(file_path)).getroot()
+        except Exception as e:
+            raise Exception(f"Error while getting etree content of file ({file_path}): {e}")
 
-        # Generate SCSS function from collected theme data
-        self.write_scss_function(destination_module_path, scss_content_list)
+    def write_etree_content(self, file_path, etree_content):
+        try:
+            # Convert the ElementTree content to a pretty-printed XML string
+            content = etree.tostring(
+                        etree_content,
+                        pretty_print = True,
+                        encoding="UTF-8",
+                        xml_declaration = True
+                    ).decode("utf-8")
+            file_path.write_text(content, encoding="utf-8")
 
-        # Remove fields explicitly marked with ondelete=False
-        self.remove_ondelete_false_field(destination_module_path)
+        except Exception as e:
+            raise Exception(f"Error while writing etree content to file ({file_path}): {e}")
 
-        # Clean up specific non-user created records
-        remove_file_names = ['ir_attachment_pre.xml', 'knowledge_cover.xml', 'mail_template.xml']
-        for remove_file_name in remove_file_names:
-            self.remove_record_not_created_by_user(destination_module_path, remove_file_name)
+    def get_fields_info(self, model_name):
+        if self.metadata_provider:
+            return self.metadata_provider.get_fields_info(model_name)
 
-        # Clean up default pricelists from data files
-        self.remove_default_pricelist(destination_module_path)
+        # Retrieves metadata (model, name, store, readonly, depends) for all fields from the Odoo model using JSON-RPC.
+        result = self.rpc_client.execute_kw(
+            model_name,  # the model whose fields you're querying
+            "fields_get",
+            [],  # optional list of fields (empty means all)
+            {"attributes": ["model", "name", "store", "readonly", "depends"]},
+        )
+
+        if not result:
+            raise Exception("Error in getting model and field name")
 
-        # Organize records in a standard format
-        self.remove_unused_ir_attachment_post(destination_module_path)
-        self.order_ir_attachment_post(destination_module_path)
+        return result
+    
+    def get_xml_content_rules(self):
+        """
+        Builds the ordered substitution rules applied by `edit_xml_content`.
 
-        # Retain only welcome article in the knowledge article
-        self.clean_knowledge_article(destination_module_path)
+        Each rule is a dictionary with:
+        - 'name': name used in the rule counters.
+        - 'pattern', 'replacement': the substitution itself.
+        - 'tree_handler': for rules matching markup, the method doing the same edit on an element
+          in the tree pipeline. Rules without one only match inside a single text node or
+          attribute value, so the tree pipeline runs them on every text and attribute value.
 
-        # Add demo payment provider if relevant module is present
-        self.add_demo_payment_provider(destination_module_path, manifest_demo_file_list)
-        
-        # Add immediate install function for the theme module in demo XML files
-        self.add_theme_immediate_install_function(destination_module_path)
+        Returns:
+            list: Ordered list of rule dictionaries.
+        """
+        ind_name = self.ind_name
+        return [
+            # Replace references to the "studio_customization" module with the new industry module name
+            {'name': 'env_ref', 'pattern': re.compile(r"(env\.ref\('studio_customization\.)(.*)'"),
+             'replacement': lambda m: f"env.ref('{ind_name}.{m.group(2)}'", 'tree_handler': None},
 
-        self.clean_sale_order_line_record(destination_module_path)
-        # Update manifest file
-        self.arrange_manifest_files(destination_module_path,  manifest_demo_file_list, dependency_chains)
+            # Normalize custom field names by replacing "x_studio_" with "x_"
+            {'name': 'x_studio', 'pattern': re.compile("x_studio_"), 'replacement': 'x_', 'tree_handler': None},
 
-        # Write mandatory files such as templates or init scripts
-        for file, content in self.mandatory_files.items():
-            directory, _ = os.path.split(file)
-            os.makedirs(destination_module_path + directory, exist_ok=True)
-            Path(destination_module_path + file).write_text(content.format(ind_name=self.ind_name, Ind_name=Ind_name), encoding='UTF-8')
+            # Remove studio-specific context attribute
+            {'name': 'context_studio', 'pattern': re.compile(" context=\"{'studio': True}\""), 'replacement': '',
+             'tree_handler': self.edit_context_studio_element},
 
-        print("clean up successful")
+            # Remove the "studio_customization." prefix from field values or references
+            {'name': 'studio_mod', 'pattern': re.compile(r"studio_customization\."), 'replacement': '', 'tree_handler': None},
 
-    def get_etree_content(self, file_path):
-        try:
-            # Read the xml file and parse the XML string into an ElementTree object
-            content = file_path.read_text(encoding='utf-8')
-            etree_content = etree.fromstring(content.encode("utf-8"))
-            return etree_content
-        except Exception as e:
-            raise Exception(f"Error while getting etree content of file ({file_path}): {e}")
+            # Replace directory references from "studio_customization/" to the new module directory
+            {'name': 'studio_link', 'pattern': re.compile("studio_customization/"), 'replacement': ind_name + '/', 'tree_handler': None},
+
+            # Remove forcecreate="1" attribute from <record> tags where the id starts with "base_module."
+            {'name': 'base_module_forcecreate', 'pattern': re.compile(r'(<record\s+[^>]*id="base_module\.[^"]*"[^>]*?")\s+forcecreate="1"'),
+             'replacement': r"\1", 'tree_handler': self.edit_base_module_forcecreate_element},
+
+            # Remove "base_module." prefix from record IDs or references
+            {'name': 'base_module', 'pattern': re.compile(r"base_module."), 'replacement': "", 'tree_handler': None},
+
+            # Normalize user references by replacing "res_users_*" with "base.user_admin"
+            {'name': 'res_users', 'pattern': re.compile(r"res_users_\w+"), 'replacement': "base.user_admin", 'tree_handler': None},
+
+            # Add the industry module prefix to ir_ui_view references in Python-style expressions
+            {'name': 'ir_ui_view', 'pattern': re.compile(r"obj\(\)\.env\.ref\(\'ir_ui_view_"),
+             'replacement': f"obj().env.ref('{ind_name}.ir_ui_view_", 'tree_handler': None},
+
+            # Replace default homepage key with a namespaced one under the new module
+            {'name': 'ir_ui_view_key', 'pattern': re.compile(r'(<field name="key">)website.homepage(</field>)'),
+             'replacement': rf'\1{ind_name}.homepage\2', 'tree_handler': self.edit_homepage_key_element},
+
+            # Update subdomain links to match the industry subdomain (replace underscores with hyphens)
+            {'name': 'href_url', 'pattern': re.compile(r'https://(?!www\.)([^/]+)\.odoo\.com'),
+             'replacement': f'https://{ind_name.replace("_", "-")}.odoo.com', 'tree_handler': None},
+
+            # Remove full URLs in <field name="url"> when a hardcoded domain is present
+            {'name': 'url', 'pattern': re.compile(r'(<field name="url">)https://[^/]+(.*?</field>)'), 'replacement': r'\1\2',
+             'tree_handler': self.edit_url_element},
+
+            # Remove any field referencing UOM (unit of measure) records to avoid data coupling
+            {'name': 'product_uom_unit', 'pattern': re.compile(r'\s*<field[^>]*ref="uom.[^"]*"[^>]*\s*/>'), 'replacement': '',
+             'tree_handler': self.edit_product_uom_unit_element},
+
+            # Replace any version segment in a '/documentation/{version}/' URL with '/documentation/latest/'
+            {'name': 'documentation_version_link', 'pattern': re.compile(r'(/documentation/)[^/]+'), 'replacement': r'\1latest',
+             'tree_handler': None},
+
+            # Obfuscate all odoo.com emails by replacing with ****@example.com
+            {'name': 'email', 'pattern': re.compile(r'([a-zA-Z0-9._%+-]+)@odoo\.com'),
+             'replacement': lambda m: f'{"*" * len(m.group(1))}@example.com', 'tree_handler': None},
+        ]
+
+    def get_xml_element_steps(self):
+        """
+        Splits `xml_content_rules` for the tree pipeline: consecutive text rules are grouped in
+        one `XmlRewriteEngine`, markup rules keep their tree handler at their place in the order.
+
+        Returns:
+            list: Ordered list of `XmlRewriteEngine` instances and tree handlers.
+        """
+        steps = []
+        text_rules = []
+        for rule in self.xml_content_rules:
+            if rule['tree_handler']:
+                if text_rules:
+                    steps.append(XmlRewriteEngine(text_rules, self.xml_rule_counts))
+                    text_rules = []
+                steps.append(rule['tree_handler'])
+            else:
+                text_rules.append(rule)
+        if text_rules:
+            steps.append(XmlRewriteEngine(text_rules, self.xml_rule_counts))
+        return steps
+
+    def edit_xml_content(self, content):
+        # Apply every rule in order, the output of one rule feeds the next
+        return self.xml_content_rewriter.rewrite(content)
+
+    def edit_xml_element(self, element):
+        """
+        Applies `xml_content_rules` to a single element of a parsed XML file, in rule order.
+
+        Text rules rewrite the element text and its attribute values, markup rules call their
+        tree handler. The element tail is left untouched, it is rewritten by `rewrite_xml_text`
+        as part of the parent content.
+
+        Args:
+            element (etree.Element): Element to edit in place.
+
+        Returns:
+            bool: False if a markup rule removed the element from the tree, True otherwise.
+        """
+        is_element = isinstance(element.tag, str)
+        for step in self.xml_element_steps:
+            if not isinstance(step, XmlRewriteEngine):
+                if is_element and not step(element):
+                    return False
+                continue
+
+            if element.text:
+                self.set_xml_text(element, step.rewrite(element.text))
+            if is_element:
+                for key, value in element.attrib.items():
+                    new_value = step.rewrite(value)
+                    if new_value != value:
+                        element.set(key, new_value)
+
+        return True
+
+    def rewrite_xml_text(self, text, old_to_new_id_map):
+        """
+        Runs the string-based steps that can touch a plain text node (old to new id renaming and
+        the text rules of `edit_xml_content`) on one text of a parsed XML file.
+
+        Args:
+            text (str): Text or tail of an element.
+            old_to_new_id_map (dict): Mapping of old record ids to new ones.
+
+        Returns:
+            str: The rewritten text.
+        """
+        if 'id="' in text or 'ref="' in text:
+            text = self.replace_old_id_to_new_id(text, old_to_new_id_map)
+        return self.xml_text_rewriter.rewrite(text)
+
+    def edit_context_studio_element(self, element):
+        # Tree version of the 'context_studio' rule
+        if element.get('context') == "{'studio': True}":
+            del element.attrib['context']
+            self.xml_rule_counts['context_studio'] += 1
+        return True
+
+    def edit_base_module_forcecreate_element(self, element):
+        # Tree version of the 'base_module_forcecreate' rule, forcecreate has to come after the base_module id
+        if element.tag == 'record' and element.get('forcecreate') == '1':
+            for key, value in element.attrib.items():
+                if key == 'forcecreate':
+                    break
+                if key.endswith('id') and value.startswith('base_module.'):
+                    del element.attrib['forcecreate']
+                    self.xml_rule_counts['base_module_forcecreate'] += 1
+                    break
+        return True
+
+    def edit_homepage_key_element(self, element):
+        # Tree version of the 'ir_ui_view_key' rule
+        if (element.tag == 'field' and dict(element.attrib) == {'name': 'key'} and not len(element)
+                and element.text and re.fullmatch(r'website.homepage', element.text)):
+            self.set_xml_text(element, f'{self.ind_name}.homepage')
+            self.xml_rule_counts['ir_ui_view_key'] += 1
+        return True
+
+    def edit_url_element(self, element):
+        # Tree version of the 'url' rule, the remaining path must fit on one line like the regex requires
+        if element.tag == 'field' and dict(element.attrib) == {'name': 'url'} and not len(element) and element.text:
+            url_match = re.match(r'https://[^/]+', element.text)
+            if url_match and '\n' not in element.text[url_match.end():]:
+                self.set_xml_text(element, element.text[url_match.end():])
+                self.xml_rule_counts['url'] += 1
+        return True
+
+    def edit_product_uom_unit_element(self, element):
+        # Tree version of the 'product_uom_unit' rule, only self-closing fields are removed
+        if element.tag == 'field' and element.text is None and not len(element):
+            for key, value in element.attrib.items():
+                if key.endswith('ref') and re.match(r'uom.', value):
+                    self.remove_xml_element(element)
+                    self.xml_rule_counts['product_uom_unit'] += 1
+                    return False
+        return True
+
+    def set_xml_text(self, element, text):
+        """
+        Sets the text of an element, keeping it in a CDATA section if it was one.
+
+        Args:
+            element (etree.Element): Element whose text is replaced.
+            text (str): The new text.
+        """
+        if text == element.text:
+            return
+        if isinstance(element.tag, str) and not len(element) and etree.tostring(element, with_tail=False, encoding='unicode').endswith(']]></' + element.tag + '>'):
+            text = etree.CDATA(text)
+        element.text = text
+
+    def remove_xml_element(self, element):
+        """
+        Removes an element from its parent like the `\\s*<field .../>` regexes do: the whitespace
+        in front of the element is removed with it and its tail is kept in the document.
+
+        Args:
+            element (etree.Element): Element to remove.
+        """
+        parent = element.getparent()
+        previous = element.getprevious()
+        tail = element.tail or ''
+        if previous is not None:
+            previous.tail = (previous.tail or '').rstrip() + tail or None
+        else:
+            parent.text = (parent.text or '').rstrip() + tail or None
+        parent.remove(element)
+
+    def is_removable_field_element(self, element, field_names):
+        """
+        Checks whether `remove_unwanted_fields` would remove this element for the given names:
+        either <field name="x">...</field> without other attributes, or a self-closing
+        <field name="x" .../>. The name has to be the first attribute like in the regexes.
+
+        Args:
+            element (etree.Element): Element to check.
+            field_names (set): Names of the fields to remove.
+
+        Returns:
+            bool: True if the element has to be removed.
+        """
+        if element.tag != 'field' or not len(element.attrib) or element.attrib.keys()[0] != 'name':
+            return False
+        if element.get('name') not in field_names:
+            return False
+        if element.text is None and not len(element):
+            return True
+        return len(element.attrib) == 1
+
+    def split_xml_document(self, content):
+        """
+        Splits the raw text around the root element, so the XML declaration, leading comments
+        and trailing whitespace are written back untouched after serializing the tree.
+
+        Returns:
+            tuple: (prolog, epilog) strings.
+        """
+        root_start = re.search(r'<(?![?!])', content).start()
+        body_end = len(content.rstrip())
+        return content[:root_start], content[body_end:]
+
+    def get_ref_name_list(self, xml_root):
+        # Collect reference names from the XML records
+        return list(set([
+            field.get('ref')
+            for record in xml_root.xpath("//record")
+            for field in record
+            if field.get('ref') and '.' not in field.get('ref')
+        ]))
+
+    def clean_xml_tree(self, content, old_to_new_id_map, default_pricelist_id, unwanted_fields, removable_fields_dict):
+        """
+        Tree pipeline for one XML file: parses the content once, runs every cleanup step of the
+        string pipeline on the tree and serializes it once.
+
+        Steps:
+        1. Visits every node in document order: old to new id renaming, default pricelist
+           reference removal, `edit_xml_content` rules and unwanted field removal.
+        2. Removes the sequence fields and sets auto_sequence="1" like `process_sequence_field`.
+        3. Removes the computed fields of the records and the model based fields of each record like `clean()`.
+        4. Serializes the root element between the original prolog and epilog.
+
+        Removed elements take the whitespace in front of them and text rules run on text nodes
+        and attribute values. The prolog (XML declaration and leading comments) and the epilog are
+        copied as text, but the root element is serialized by lxml, which differs from the source
+        text on:
+        - attribute values in single quotes, written in double quotes;
+        - whitespace between the attributes of a tag or before its end, dropped;
+        - character references and '&apos;', '&quot;' outside attributes, written as the characters;
+        - empty elements written as '<a></a>', collapsed to '<a/>'.
+        Odoo exports none of these, so the output of an export matches the string pipeline byte
+        for byte (checked on a generated export in tests/test_pipelines.py).
+
+        Args:
+            content (str): Raw XML content of the file.
+            old_to_new_id_map (dict): Mapping of old record ids to new ones.
+            default_pricelist_id (str): Id of the default pricelist whose references are removed.
+            unwanted_fields (list): Field names removed from every file.
+            removable_fields_dict (dict): Cache of removable field names per model.
+
+        Returns:
+            tuple: (cleaned content, parsed root element, reference names of the records)
+        """
+        prolog, epilog = self.split_xml_document(content)
+        prolog = self.rewrite_xml_text(prolog, old_to_new_id_map)
+        xml_root = etree.fromstring(content.encode('utf-8'), etree.XMLParser(strip_cdata=False, huge_tree=True))
+
+        # Field elements by name with their record, so the later removals never walk the tree again
+        field_elements = {}
+        found_record, found_numeric_sequence = self.clean_xml_subtree(
+            xml_root, None, old_to_new_id_map, default_pricelist_id, set(unwanted_fields), field_elements
+        )
+
+        # Remove sequence field and add auto_sequence = "1" in <odoo>
+        if found_record:
+            self.remove_field_elements(field_elements, {'sequence'})
+        if found_numeric_sequence and xml_root.tag == 'odoo':
+            attributes = dict(xml_root.attrib)
+            xml_root.attrib.clear()
+            xml_root.set('auto_sequence', '1')
+            for key, value in attributes.items():
+                xml_root.set(key, value)
+
+        ref_name_list = self.get_ref_name_list(xml_root)
+
+        # Remove computed fields without inverse methods and the fields based on model-specific rules of each record
+        self.remove_field_elements(
+            field_elements,
+            record_field_names=lambda record: self.get_removable_field_names(removable_fields_dict, record.get('model')),
+            dropped_counts=self.dropped_field_counts,
+        )
+        self.remove_field_elements(field_elements, record_field_names=lambda record: self.get_model_based_field_names(record.get('model')))
+
+        content = prolog + etree.tostring(xml_root, encoding='unicode') + epilog
+        return content, xml_root, ref_name_list
+
+    def read_xml_prolog_epilog(self, source_path):
+        """
+        File version of `split_xml_document`: reads the text in front of the root element and the
+        trailing whitespace without loading the file.
+
+        Returns:
+            tuple: (prolog, epilog) strings.
+        """
+        with open(source_path, encoding='utf-8') as f:
+            head = ''
+            while True:
+                chunk = f.read(65536)
+                head += chunk
+                root_match = re.search(r'<(?![?!])', head)
+                if root_match or not chunk:
+                    break
+        prolog = head[:root_match.start()] if root_match else head
+
+        with open(source_path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            tail = b''
+            while len(tail) < size and not tail.rstrip():
+                f.seek(max(size - len(tail) - 4096, 0))
+                tail = f.read(size - len(tail) - f.tell()) + tail
+        epilog = tail[len(tail.rstrip()):].decode('utf-8')
+        return prolog, epilog
+
+    def scan_xml_sequences(self, source_path):
+        """
+        Streams a file once for what the sequence cleanup of the whole file depends on, before
+        its records are written one by one.
+
+        Returns:
+            tuple: (a <record> was found, a record has a numeric sequence field)
+        """
+        found_record = False
+        found_numeric_sequence = False
+        for event, element in etree.iterparse(source_path, events=('start', 'end'), huge_tree=True):
+            if event == 'start':
+                found_record = found_record or element.tag == 'record'
+                continue
+            if (element.tag == 'field' and element.get('name') == 'sequence' and element.text and element.text.strip().isdigit()
+                    and next(element.iterancestors('record'), None) is not None):
+                found_numeric_sequence = True
+
+            # Drop what was read, the ancestors of the current element are kept
+            parent = element.getparent()
+            if parent is not None:
+                element.clear(keep_tail=True)
+                while element.getprevious() is not None:
+                    del parent[0]
+        return found_record, found_numeric_sequence
+
+    def stream_xml_file(self, source_path, output_path, file_name, old_to_new_id_map, default_pricelist_id, unwanted_fields, removable_fields_dict):
+        """
+        Streaming pipeline for one XML file: runs the steps of `clean_xml_tree` on one top level
+        element at a time (the children of the root and of a <data> element under it) and writes
+        each one as soon as it is cleaned, so memory is bounded by the largest record instead of
+        the file. The writing is done by `XmlStreamWriter`.
+
+        Args:
+            source_path (str): Path of the XML file in the export.
+            output_path (str): Path of the cleaned file.
+            file_name (str): Name of the file.
+            old_to_new_id_map (dict): Mapping of old record ids to new ones.
+            default_pricelist_id (str): Id of the default pricelist whose references are removed.
+            unwanted_fields (list): Field names removed from every file.
+            removable_fields_dict (dict): Cache of removable field names per model.
+
+        Returns:
+            tuple: (ids of the records in document order, reference names of the records)
+        """
+        found_record, found_numeric_sequence = self.scan_xml_sequences(source_path)
+        prolog, epilog = self.read_xml_prolog_epilog(source_path)
+        with open(output_path, 'w', encoding='utf-8') as output:
+            writer = XmlStreamWriter(
+                self, output, file_name, old_to_new_id_map, default_pricelist_id, set(unwanted_fields), removable_fields_dict,
+                found_record, found_numeric_sequence,
+            )
+            writer.write(self.rewrite_xml_text(prolog, old_to_new_id_map))
+            for event, element in etree.iterparse(
+                source_path, events=('start', 'end', 'comment', 'pi'), strip_cdata=False, huge_tree=True, remove_blank_text=False
+            ):
+                writer.feed(event, element)
+            writer.write(epilog)
+        return writer.record_ids, list(writer.ref_names)
+
+    def clean_xml_subtree(self, element, record, old_to_new_id_map, default_pricelist_id, unwanted_fields, field_elements, descend=True):
+        """
+        Runs the node level steps of the tree pipeline on an element and its descendants in
+        document order: old to new id renaming, default pricelist reference removal,
+        `edit_xml_content` rules and unwanted field removal. The kept field elements are indexed
+        for the record level removals.
 
-    def write_etree_content(self, file_path, etree_content):
-        try:
-            # Convert the ElementTree content to a pretty-printed XML string
-            content = etree.tostring(
-                        etree_content,
-                        pretty_print = True,
-                        encoding="UTF-8",
-                        xml_declaration = True
-                    ).decode("utf-8")
-            file_path.write_text(content, encoding="utf-8")
+        Args:
+            element (etree.Element): Root of the subtree, its tail is rewritten as well.
+            record (etree.Element): Enclosing <record> of the element, or None.
+            old_to_new_id_map (dict): Mapping of old record ids to new ones.
+            default_pricelist_id (str): Id of the default pricelist whose references are removed.
+            unwanted_fields (set): Field names removed from every file.
+            field_elements (dict): Field name -> list of (element, enclosing <record> or None), filled in place.
+            descend (bool): False only visits the element itself.
 
-        except Exception as e:
-            raise Exception(f"Error while writing etree content to file ({file_path}): {e}")
+        Returns:
+            tuple: (a <record> was found, a record has a numeric sequence field)
+        """
+        found_record = False
+        found_numeric_sequence = False
 
-    def session_authentication(self):
-
-        session = requests.Session()
-        # Authenticates the user via Odoo's /web/session/authenticate endpoint and returns a session with an active login and the user ID.
-        auth_payload = {
-            "jsonrpc": "2.0",
-            "method": "call",
-            "params": {
-                "db": self.db_name,
-                "login": LOGIN,
-                "password": PASSWORD,
-            },
-            "id": 1
-        }
-        response = session.post(f"{BASE_URL}{self.port}/web/session/authenticate", json=auth_payload)
-        response.raise_for_status()
-        result = response.json().get("result")
-        if not result or not result.get("uid"):
-            raise Exception("Login failed in cleanup script.")
-        return session, result['uid']
+        stack = [(element, record)]
+        while stack:
+            element, record = stack.pop()
+
+            # The tail is part of the parent content, rewrite it before the element may be removed
+            if element.tail:
+                element.tail = self.rewrite_xml_text(element.tail, old_to_new_id_map)
+
+            # Comments and processing instructions only carry text
+            if not isinstance(element.tag, str):
+                if element.text:
+                    element.text = self.rewrite_xml_text(element.text, old_to_new_id_map)
+                continue
+
+            # replace old_id to new_id in the id, ref and model_id like attributes and in the text
+            for key, value in element.attrib.items():
+                if value in old_to_new_id_map and (key.endswith('id') or key.endswith('ref')):
+                    element.set(key, old_to_new_id_map[value])
+            if element.text and ('id="' in element.text or 'ref="' in element.text):
+                self.set_xml_text(element, self.replace_old_id_to_new_id(element.text, old_to_new_id_map))
+
+            # remove field with default pricelist reference
+            if (default_pricelist_id and element.tag == 'field' and element.get('ref') == default_pricelist_id
+                    and element.text is None and not len(element)):
+                self.remove_xml_element(element)
+                continue
+
+            # Apply module-specific modifications to the element
+            if not self.edit_xml_element(element):
+                continue
+
+            if element.tag == 'field':
+                # Remove predefined unwanted fields
+                if self.is_removable_field_element(element, unwanted_fields):
+                    self.remove_xml_element(element)
+                    continue
 
-    def get_fields_info(self, model_name):
-        session, uid = self.session_authentication()
+                field_elements.setdefault(element.get('name'), []).append((element, record))
+                if record is not None and element.get('name') == 'sequence' and element.text and element.text.strip().isdigit():
+                    found_numeric_sequence = True
 
-        # Retrieves metadata (model, name, store, readonly, depends) for all fields from the Odoo model using JSON-RPC.
-        payload = {
-            "jsonrpc": "2.0",
-            "method": "call",
-            "params": {
-                "service": "object",
-                "method": "execute_kw",
-                "args": [
-                    self.db_name,
-                    uid,
-                    PASSWORD,
-                    model_name,  # the model whose fields you're querying
-                    "fields_get",
-                    [],  # optional list of fields (empty means all)
-                    {
-                        "attributes": ["model", "name", "store", "readonly", "depends"]
-                    }
-                ]
-            },
-            "id": 1
-        }
-        
-        resp = session.post(f"{BASE_URL}{self.port}/jsonrpc", json=payload)
-        resp.raise_for_status()
+            elif element.tag == 'record':
+                found_record = True
+                record = element
 
-        if not resp.json()["result"]:
-            raise Exception("Error in getting model and field name")
+            if descend:
+                stack.extend((child, record) for child in reversed(element))
 
-        return resp.json()["result"]
-    
-    def edit_xml_content(self, content):
-        # Replace references to the "studio_customization" module with the new industry module name
-        env_ref = re.compile("(env\.ref\('studio_customization\.)(.*)'")
-        content = env_ref.sub(lambda m: f"env.ref('{self.ind_name}.{m.group(2)}'", content)
-        
-        # Normalize custom field names by replacing "x_studio_" with "x_"
-        x_studio = re.compile("x_studio_")
-        content = x_studio.sub('x_', content)
-        
-        # Remove studio-specific context attribute
-        context_studio = re.compile(" context=\"{'studio': True}\"")
-        content = context_studio.sub('', content)
-        
-        # Remove the "studio_customization." prefix from field values or references
-        studio_mod = re.compile("studio_customization\.")
-        content = studio_mod.sub('', content)
-        
-        # Replace directory references from "studio_customization/" to the new module directory
-        studio_link = re.compile("studio_customization/")
-        content = studio_link.sub(self.ind_name + '/', content)
-        
-        # Remove forcecreate="1" attribute from <record> tags where the id starts with "base_module."
-        pattern_base_module_forcecreate = re.compile(r'(<record\s+[^>]*id="base_module\.[^"]*"[^>]*?")\s+forcecreate="1"')
-        content = pattern_base_module_forcecreate.sub(r"\1", content)
-        
-        # Remove "base_module." prefix from record IDs or references
-        pattern_base_module = re.compile(r"base_module.")
-        content = pattern_base_module.sub("", content)
-        
-        # Normalize user references by replacing "res_users_*" with "base.user_admin"
-        pattern_res_users = re.compile("res_users_\w+")
-        content = pattern_res_users.sub("base.user_admin", content)
-        
-        # Add the industry module prefix to ir_ui_view references in Python-style expressions
-        pattern_ir_ui_view = re.compile(r"obj\(\)\.env\.ref\(\'ir_ui_view_")
-        content = pattern_ir_ui_view.sub(f"obj().env.ref('{self.ind_name}.ir_ui_view_", content)
-        
-        # Replace default homepage key with a namespaced one under the new module
-        pattern_ir_ui_view_key = re.compile(r'(<field name="key">)website.homepage(</field>)')
-        content = pattern_ir_ui_view_key.sub(rf'\1{self.ind_name}.homepage\2', content)
-        
-        # Update subdomain links to match the industry subdomain (replace underscores with hyphens)
-        pattern_href_url = re.compile(r'https://(?!www\.)([^/]+)\.odoo\.com')
-        content = pattern_href_url.sub(f'https://{self.ind_name.replace("_", "-")}.odoo.com', content)
-        
-        # Remove full URLs in <field name="url"> when a hardcoded domain is present
-        pattern_url = re.compile(r'(<field name="url">)https://[^/]+(.*?</field>)')
-        content = pattern_url.sub(r'\1\2', content)
-        
-        # Remove any field referencing UOM (unit of measure) records to avoid data coupling
-        pattern_product_uom_unit = re.compile(r'\s*<field[^>]*ref="uom.[^"]*"[^>]*\s*/>')
-        content = pattern_product_uom_unit.sub('', content)
-        
-        # Replace any version segment in a '/documentation/{version}/' URL with '/documentation/latest/'
-        pattern_documention_version_link= re.compile(r'(/documentation/)[^/]+')
-        content = pattern_documention_version_link.sub(r'\1latest', content)
+        return found_record, found_numeric_sequence
 
-        # Obfuscate all odoo.com emails by replacing with ****@example.com
-        pattern_email = re.compile(r'([a-zA-Z0-9._%+-]+)@odoo\.com')
-        content = pattern_email.sub(lambda m: f'{"*" * len(m.group(1))}@example.com', content)
+    def remove_field_elements(self, field_elements, field_names=frozenset(), record_field_names=None, dropped_counts=None):
+        """
+        Tree version of `remove_unwanted_fields`: removes the indexed <field> elements matching the
+        given names, looking at each field of the file once whatever the number of names.
 
-        return content
+        Args:
+            field_elements (dict): Field name -> list of (element, enclosing <record> or None), as indexed by `clean_xml_tree`.
+            field_names (set): Field names removed in the whole file.
+            record_field_names (callable): Optional, returns the field names removed only inside the given <record>.
+            dropped_counts (dict): Optional, counter of the fields removed by `record_field_names` per model.
 
-    def remove_unwanted_fields(self, content, unwanted_fields):
+        Returns:
+            int: Number of removed fields.
+        """
+        removed = 0
+        for field_name, entries in field_elements.items():
+            for element, record in entries:
+                in_record_names = field_name not in field_names
+                if in_record_names and (record is None or not record_field_names or field_name not in record_field_names(record)):
+                    continue
+                if element.getparent() is not None and self.is_removable_field_element(element, {field_name}):
+                    self.remove_xml_element(element)
+                    removed += 1
+                    if in_record_names and dropped_counts is not None:
+                        dropped_counts[record.get('model')] = dropped_counts.get(record.get('model'), 0) + 1
+        return removed
+
+    def remove_unwanted_fields(self, content, unwanted_fields, model_field_names=None, dropped_counts=None):
         """
         Removes XML field elements (both standard and self-closing) based on a list of unwanted field names.
 
+        The content is scanned once for `<field name="...` tokens whatever the number of names:
+        - standard fields `<field name="x">...</field>` end at the first closing tag,
+        - self-closing fields `<field name="x" .../>` end at the first `>`,
+        and each removed field takes the whitespace in front of it.
+
         Args:
             content (str): The XML content as a string.
             unwanted_fields (list): A list of field names to remove from the XML.
+            model_field_names (callable): Optional, returns for a model name the field names to remove
+                only inside the records of that model.
+            dropped_counts (dict): Optional, counter of the fields removed by `model_field_names` per model.
 
         Returns:
             str: The cleaned XML content with unwanted fields removed.
         """
-        for unwanted_field in unwanted_fields:
-            pattern_regular = rf'\s*<field name="{unwanted_field}">.*?</field>'
-            pattern_self_closing = rf'\s*<field name="{unwanted_field}"[^>]*\s*/>'
-
-            content = re.sub(pattern_regular, "", content, flags=re.DOTALL)
-            content = re.sub(pattern_self_closing, "", content)
+        unwanted_fields = set(unwanted_fields)
+        pieces = []
+        position = 0
+
+        # (model, field names removed) of the enclosing records, innermost last
+        record_field_names = []
+        for match in FIELD_NAME_TOKEN_RE.finditer(content):
+            field_start, name_end = match.span()
+            field_name, record_attributes = match.group(1, 2)
+
+            # Track the model of the current record
+            if field_name is None:
+                if not model_field_names or field_start < position:
+                    continue
+                if record_attributes is None:
+                    if record_field_names:
+                        record_field_names.pop()
+                elif not record_attributes.endswith('/'):
+                    model_match = RECORD_MODEL_RE.search(record_attributes)
+                    model_name = model_match.group(1) if model_match else None
+                    record_field_names.append((model_name, model_field_names(model_name) if model_name else frozenset()))
+                continue
+
+            # Skip the fields nested in a removed one and the fields to keep
+            if field_start < position:
+                continue
+            in_record_names = field_name not in unwanted_fields
+            if in_record_names and not (record_field_names and field_name in record_field_names[-1][1]):
+                continue
+
+            if content.startswith('>', name_end):
+                field_end = content.find('</field>', name_end)
+                if field_end == -1:
+                    continue
+                field_end += len('</field>')
+            else:
+                field_end = content.find('>', name_end) + 1
+                if not field_end or content[field_end - 2] != '/':
+                    continue
 
-        return content
+            while field_start > position and content[field_start - 1].isspace():
+                field_start -= 1
+            pieces.append(content[position:field_start])
+            position = field_end
+            if in_record_names and dropped_counts is not None:
+                model_name = record_field_names[-1][0]
+                dropped_counts[model_name] = dropped_counts.get(model_name, 0) + 1
+
+        if not pieces:
+            return content
+        pieces.append(content[position:])
+        return ''.join(pieces)
     
     def process_sequence_field(self, content):
         """
@@ -644,7 +3039,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
             Parses the given XML content to check for any <field name="sequence"> elements
             with numeric text values. If found, it adds the attribute `auto_sequence="1"` to
             the root <odoo> element. Also removes all 'sequence' fields from the content using
-            `remove_unwanted_fields`.
+            `remove_unwanted_fields` if the file has records.
 
             Args:
                 content (str): XML content as a UTF-8 encoded string.
@@ -654,12 +3049,16 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                     updated root <odoo> tag with `auto_sequence="1"`.
         """
         etree_content = etree.fromstring(content.encode('utf-8'))
+        records = etree_content.xpath("//record")
         found_numeric_sequence = False
-        for record in etree_content.xpath("//record"):
+        for record in records:
             for field in record.xpath(".//field[@name='sequence']"):
                 # Check if the field has a numeric value (not eval="False")
                 if field.text and field.text.strip().isdigit():
                     found_numeric_sequence = True
+
+        # The removal covers the whole file, one pass is enough for all the records
+        if records:
             content = self.remove_unwanted_fields(content, ['sequence'])
 
         # Add auto_sequence="1" if any numeric sequence was found
@@ -668,66 +3067,281 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
 
         return content
     
-    def unorder_manifest_demo_files(self, manifest_demo_file_list, current_dir, file_name, ref_name_list, record):
+    def transform_xml_file(self, source_path, file_name, xml_context, output_path):
         """
-        Inserts a demo file entry into the manifest_demo_file_list in an ordered manner.
-
-        Logic:
-        - If the record's ID appears in any ref_name of an existing entry, insert before that entry.
-        - If ref_name_list is empty, insert the entry at the beginning of the list.
-        - Otherwise, append the entry at the end.
+        Runs every cleanup step of `clean()` on one XML file of the export. Only reads the shared
+        state, so files can be transformed in any order or in worker processes.
 
         Args:
-            manifest_demo_file_list (list): The current list of demo file metadata dictionaries.
-            current_dir (str): The current directory being processed (used to check if in '/demo/').
-            file_name (str): The name of the XML file being processed.
-            ref_name_list (list): A list of references extracted from the file.
-            record (etree.Element): The current <record> element from the XML.
+            source_path (str): Path of the XML file in the export.
+            file_name (str): Name of the file.
+            xml_context (dict): Shared inputs built by `clean()` (old to new id map, default pricelist id,
+                unwanted fields and removable fields cache).
+            output_path (str): Path of the cleaned file, written directly by the 'stream' pipeline.
+
+        Returns:
+            dict: 'content' (cleaned content, left out when the file is already written), 'record_ids'
+                (ids of the records in document order) and 'ref_name_list' (reference names of the records).
+        """
+        old_to_new_id_map = xml_context['old_to_new_id_map']
+        default_pricelist_id = xml_context['default_pricelist_id']
+        unwanted_fields = xml_context['unwanted_fields']
+        removable_fields_dict = xml_context['removable_fields_dict']
+
+        # Write the file one record at a time without ever holding its content
+        start = time.perf_counter()
+        if self.pipeline == 'stream':
+            record_ids, ref_name_list = self.stream_xml_file(
+                source_path, output_path, file_name, old_to_new_id_map, default_pricelist_id, unwanted_fields, removable_fields_dict
+            )
+            self.add_stage_time('xml:stream_xml_file', start)
+            return {'record_ids': record_ids, 'ref_name_list': ref_name_list}
+
+        content = Path(source_path).read_text(encoding="utf-8")
+        start = self.add_stage_time('xml:read', start)
+        if self.pipeline == 'tree':
+            # Parse once, run every cleanup step on the tree and serialize once
+            content, xml_root, ref_name_list = self.clean_xml_tree(
+                content, old_to_new_id_map, default_pricelist_id, unwanted_fields, removable_fields_dict
+            )
+            start = self.add_stage_time('xml:clean_xml_tree', start)
+        else:
+            # replace old_id to new_id in xml file 
+            content = self.replace_old_id_to_new_id(content, old_to_new_id_map)
+            start = self.add_stage_time('xml:replace_old_id_to_new_id', start)
+
+            # remove field with default pricelist reference
+            content = self.remove_default_pricelist_ref(default_pricelist_id, content)
+            start = self.add_stage_time('xml:remove_default_pricelist_ref', start)
+            
+            # Apply module-specific modifications to XML content
+            content = self.edit_xml_content(content)
+            start = self.add_stage_time('xml:edit_xml_content', start)
+
+            # Remove predefined unwanted fields from the XML
+            content = self.remove_unwanted_fields(content, unwanted_fields)
+            start = self.add_stage_time('xml:remove_unwanted_fields', start)
+
+            # Remove sequence field and add auto_sequence = "1" in <odoo>
+            content = self.process_sequence_field(content)
+            start = self.add_stage_time('xml:process_sequence_field', start)
+
+            xml_root = etree.fromstring(content.encode("utf-8"))
+            
+            # Collect reference names from the XML records
+            ref_name_list = self.get_ref_name_list(xml_root)
+
+        record_ids = [record.get('id') for record in xml_root.xpath("//record")]
+        start = self.add_stage_time('xml:parse', start)
+
+        # The tree pipeline already applied the record level removals
+        if self.pipeline != 'tree':
+            # Clean computed fields without inverse methods
+            content = self.remove_computed_fields(removable_fields_dict, content)
+            start = self.add_stage_time('xml:remove_computed_fields', start)
+
+            # Remove fields based on model-specific rules
+            content = self.remove_model_based_fields(content)
+            start = self.add_stage_time('xml:remove_model_based_fields', start)
+
+        # Special case handling for certain XML files
+        if file_name == 'ir_default.xml':
+            content = re.sub(r"<odoo>", '<odoo noupdate="1">', content)
+
+        return {'content': content, 'record_ids': record_ids, 'ref_name_list': ref_name_list}
+
+    def merge_xml_result(self, result, current_dir, file_name, destination_module_path, manifest_demo_file_list):
         """
+        Writes a transformed XML file and records it in the demo file ordering. Called in walk
+        order, so the manifest does not depend on the order the files were transformed in.
 
-        # Only process files within the 'demo' directory
+        Args:
+            result (dict): Result of `transform_xml_file`. The result of a file left untouched by an
+                incremental run has no 'content', the output already holds it.
+            current_dir (str): Directory of the file relative to the export.
+            file_name (str): Name of the file.
+            destination_module_path (str): Path of the cleaned module.
+            manifest_demo_file_list (list): Demo file metadata for the manifest.
+        """
+        # Store metadata of demo files for later use, arrange_manifest_files orders them
         if current_dir.endswith('/demo/'):
-            # Prepare a dictionary for the current demo file and its references
             manifest_demo_file_dict = {
                 'file_name': file_name,
-                'ref_name': ref_name_list
+                'ref_name': result['ref_name_list'],
+                'record_ids': result['record_ids'],
             }
+            manifest_demo_file_list.append(manifest_demo_file_dict)
 
-            # Get the ID of the current record
-            file_record_id = record.get('id')
-            if manifest_demo_file_dict['ref_name']:
-                inserted = False
-
-                # Try to insert before any existing file that references this record ID
-                for idx, existing in enumerate(manifest_demo_file_list):
-                    if file_record_id in existing['ref_name']:
-                        manifest_demo_file_list.insert(idx, manifest_demo_file_dict)
-                        inserted = True
-                        break
-                
-                # If not inserted in loop, append to the end
-                if not inserted:
-                    manifest_demo_file_list.append(manifest_demo_file_dict)
-            
-            # If no references, insert at the beginning
+        # Write the processed XML content to the destination, only the records are kept for the build journal.
+        # The outputs the passes edit are written once they all ran
+        if 'content' in result:
+            output_path = destination_module_path + current_dir + file_name
+            if self.module_tree and self.module_tree.holds(output_path):
+                self.module_tree.write_text(output_path, result.pop('content'))
             else:
-                manifest_demo_file_list.insert(0, manifest_demo_file_dict)
-        return
+                Path(output_path).write_text(result.pop('content'), encoding='utf-8')
 
-    def remove_model_based_fields(self, model_name, content):
+    def resolve_export_models(self, removable_fields_dict, directory):
         """
-        Removes specific XML fields from the content based on the model name.
+        Fetches the removable fields of every model of the export before the files are sent to
+        the worker processes, so the workers do not each log in and ask the same questions.
 
         Args:
-            model_name (str): The technical name of the model (e.g., 'sale.order').
-            content (str): The XML content as a string.
+            removable_fields_dict (dict): Cache of removable field names per model, filled in place.
+            directory (str): Path of the exported module.
+        """
+        for model_name in self.iter_export_models(directory):
+            try:
+                self.get_removable_field_names(removable_fields_dict, model_name)
+            except Exception:
+                # The pre-scan can see records a transform never reaches, the worker raises if one does
+                continue
+
+    def get_worker_config(self):
+        # Constructor arguments of the CleanModule instances of the worker processes
+        return {
+            'ind_name': self.ind_name,
+            'ind_category': self.ind_category,
+            'db_name': self.db_name,
+            'module_path': self.module_path,
+            'destination_base_path': self.destination_base_path,
+            'port': self.port,
+            'pipeline': self.pipeline,
+            'rpc_timeout': self.rpc_client.timeout,
+            'rpc_retries': self.rpc_client.retries,
+        }
+
+    def run_xml_jobs(self, xml_tasks, xml_context, destination_module_path, manifest_demo_file_list, xml_results):
+        """
+        Transforms the XML files in `jobs` worker processes, the largest files first, then merges
+        the results in walk order so the output matches a serial run byte for byte.
+
+        Args:
+            xml_tasks (list): (source path, current dir, file name) of the XML files in walk order.
+            xml_context (dict): Shared inputs of `transform_xml_file`.
+            destination_module_path (str): Path of the cleaned module.
+            manifest_demo_file_list (list): Demo file metadata for the manifest.
+            xml_results (dict): Results per path relative to the export. Files with a result (reused
+                from the build journal) are only merged, the results of the others are added.
+        """
+        removable_fields_dict = xml_context['removable_fields_dict']
+        with ProcessPoolExecutor(
+            max_workers=self.jobs, initializer=init_xml_worker, initargs=(self.get_worker_config(), self.metadata_provider, xml_context)
+        ) as executor:
+            futures = {}
+            for source_path, current_dir, file_name in sorted(xml_tasks, key=lambda task: os.path.getsize(task[0]), reverse=True):
+                if current_dir[1:] + file_name not in xml_results:
+                    futures[source_path] = executor.submit(
+                        transform_xml_file_in_worker, source_path, file_name, destination_module_path + current_dir + file_name
+                    )
+
+            for source_path, current_dir, file_name in xml_tasks:
+                if source_path not in futures:
+                    self.merge_xml_result(xml_results[current_dir[1:] + file_name], current_dir, file_name, destination_module_path, manifest_demo_file_list)
+                    continue
+                result = xml_results[current_dir[1:] + file_name] = futures[source_path].result()
+                self.merge_xml_result(result, current_dir, file_name, destination_module_path, manifest_demo_file_list)
+
+                # Merge the counters and the metadata fetched by the worker
+                for name, count in result['rule_counts'].items():
+                    self.xml_rule_counts[name] += count
+                for model_name, count in result['dropped_field_counts'].items():
+                    self.dropped_field_counts[model_name] = self.dropped_field_counts.get(model_name, 0) + count
+                for model_name, field_names in result['removable_fields'].items():
+                    removable_fields_dict.setdefault(model_name, field_names)
+                for stage, seconds in result['stage_timings'].items():
+                    self.stage_timings[stage] = self.stage_timings.get(stage, 0) + seconds
+
+    def order_manifest_demo_files(self, manifest_demo_file_list, dependency_chains):
+        """
+        Orders the demo files so that each file loads after the files defining the records it
+        refers to. The sort is topological and stable: among the files ready to load, the first
+        one of the walk comes first. `process_dependencies` moves the references of each file of a
+        dependency chain to the next file of the chain into record_creation_post.xml, so these do
+        not count.
+
+        Other circular references are reported. The first file of the walk in the cycle is then
+        loaded first, the other files keep their order.
+
+        Args:
+            manifest_demo_file_list (list): Demo file entries in walk order, with 'file_name',
+                'ref_name' (ids the file refers to) and 'record_ids' (ids of its records).
+            dependency_chains (list): Circular dependency chains of `find_dependency_chains`.
 
         Returns:
-            str: The XML content with model-specific unwanted fields removed.
+            list: The entries in load order.
+        """
+        file_count = len(manifest_demo_file_list)
+
+        # File defining each record, the first one of the walk when several do
+        defining_files = {}
+        for idx, entry in enumerate(manifest_demo_file_list):
+            for record_id in entry['record_ids']:
+                defining_files.setdefault(record_id, idx)
+
+        # References removed by process_dependencies, (referring file, defining file)
+        broken_references = set()
+        for depend in dependency_chains or []:
+            if depend['type'] == 'demo':
+                files = [file.replace('.', '_') + '.xml' for file in depend['chain']]
+                broken_references.update(zip(files, files[1:]))
+
+        # A file depends on the files defining the records it refers to
+        dependents = [set() for _ in range(file_count)]
+        dependencies = [set() for _ in range(file_count)]
+        for idx, entry in enumerate(manifest_demo_file_list):
+            for ref_name in entry['ref_name']:
+                defining_file = defining_files.get(ref_name)
+                if (defining_file is not None and defining_file != idx and (
+                        entry['file_name'], manifest_demo_file_list[defining_file]['file_name']) not in broken_references):
+                    dependents[defining_file].add(idx)
+                    dependencies[idx].add(defining_file)
+
+        waiting = [len(dependencies[idx]) for idx in range(file_count)]
+        ready = [idx for idx in range(file_count) if not waiting[idx]]
+        loaded = [False] * file_count
+        ordered = []
+        first_unloaded = 0
+        while len(ordered) < file_count:
+            if not ready:
+                # Only files in or behind a cycle are left, follow unloaded dependencies until one repeats
+                while loaded[first_unloaded]:
+                    first_unloaded += 1
+                idx = first_unloaded
+                path = {}
+                while idx not in path:
+                    path[idx] = len(path)
+                    idx = min(dependency for dependency in dependencies[idx] if not loaded[dependency])
+                cycle = list(path)[path[idx]:]
+                _logger.warning(
+                    "Circular references between demo files: "
+                    + " -> ".join(manifest_demo_file_list[idx]['file_name'] for idx in cycle + cycle[:1])
+                    + f", loading {manifest_demo_file_list[min(cycle)]['file_name']} first"
+                )
+                heapq.heappush(ready, min(cycle))
+
+            idx = heapq.heappop(ready)
+            if loaded[idx]:
+                continue
+            loaded[idx] = True
+            ordered.append(manifest_demo_file_list[idx])
+            for dependent in dependents[idx]:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    heapq.heappush(ready, dependent)
+
+        return ordered
+
+    def get_model_field_map(self):
+        """
+        Returns the unwanted field names of each model.
+
+        Returns:
+            dict: Model technical name -> list of field names to remove from the records of this model.
         """
 
         # Define a dictionary mapping models to their corresponding unwanted field names
-        model_field_map = {
+        return {
             'calendar.event': ['start', 'stop'],
             'crm.lead': ['email_from', 'company_id', 'country_id', 'city', 'street', 'partner_name', 'contact_name', 'zip', 'reveal_id', 'medium_id', 'date_closed', 'email_state', 'date_open', 'email_domain_criterion', 'iap_enrich_done', 'won_status', 'street2', 'phone', 'state_id'],
             'event.event': ['kanban_state_label'],
@@ -748,52 +3362,232 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
             'sign.item': ['transaction_id'],
         }
 
-        # Retrieve the list of unwanted fields for the given model
-        unwanted_fields = model_field_map.get(model_name, [])
-        
-        # Remove those fields using the previously defined helper
-        content = self.remove_unwanted_fields(content, unwanted_fields)
+    def get_model_based_field_names(self, model_name):
+        """
+        Returns the unwanted field names of a model.
 
-        return content
+        Args:
+            model_name (str): The technical name of the model (e.g., 'sale.order').
+
+        Returns:
+            frozenset: Field names to remove from the records of this model.
+        """
+
+        # Retrieve the set of unwanted fields for the given model
+        return self.model_field_index.get(model_name, frozenset())
+
+    def remove_model_based_fields(self, content):
+        """
+        Removes specific XML fields from the records of the content based on their model.
+
+        Each record only loses the fields listed for its own model, all the records of the file
+        are handled in a single pass.
+
+        Args:
+            content (str): The XML content as a string.
+
+        Returns:
+            str: The XML content with model-specific unwanted fields removed.
+        """
+
+        # Remove the fields of each record using the model dispatch of the previously defined helper
+        return self.remove_unwanted_fields(content, (), self.get_model_based_field_names)
+
+    def get_removable_field_names(self, removable_fields_dict, model_name):
+        """
+        Returns the fields of a model that are computed (not stored) and readonly.
+
+        The `fields_get` result of each model is reduced once to a frozen set, records are then
+        cleaned by looking their field names up in it.
 
-    def remove_computed_fields(self, fields_info_dict, model_name, record, content):
-        # Retrieve and cache the fields information for the current model if not already done; otherwise, use the cached info
+        Args:
+            removable_fields_dict (dict): Cache of removable field names per model, filled on first use of a model.
+            model_name (str): The technical name of the model.
+
+        Returns:
+            frozenset: Names of the removable fields of the model.
+        """
+        # Retrieve and reduce the fields information for the current model if not already done; otherwise, use the cached set
+        if model_name not in removable_fields_dict:
+            future = self.pending_metadata.pop(model_name, None)
+            if future:
+                # Wait for the prefetched answer only if it has not arrived yet
+                if not future.done():
+                    start = time.perf_counter()
+                    wait_futures([future])
+                    self.metadata_wait_stats['waits'] += 1
+                    self.metadata_wait_stats['wait_time'] += time.perf_counter() - start
+                field_info = future.result()
+            else:
+                field_info = self.get_fields_info(model_name)
+
+            # The field is computed (not stored) and readonly
+            removable_fields_dict[model_name] = frozenset(
+                field_name
+                for field_name, field_obj in field_info.items()
+                if is_removable_field(field_obj)
+            )
+
+        return removable_fields_dict[model_name]
+
+    def open_metadata_cache(self):
+        """
+        Opens the persistent field metadata cache of the database, keyed by the server version and
+        a fingerprint of the installed modules and their versions.
 
-        if model_name not in fields_info_dict:
-            field_info = self.get_fields_info(model_name)
-            fields_info_dict[model_name] = field_info
+        Returns:
+            FieldMetadataCache: The cache, or None if no cache directory is configured.
+        """
+        if not self.metadata_cache_dir:
+            return None
+
+        return FieldMetadataCache(
+            self.metadata_cache_dir, self.db_name, self.rpc_client.get_server_version(), self.get_modules_fingerprint(),
+            max_bytes=self.metadata_cache_size_mb * 1024 * 1024,
+        )
+
+    def get_modules_fingerprint(self):
+        # Hash of the installed modules of the server and their versions
+        installed_modules = self.rpc_client.execute_kw(
+            "ir.module.module", "search_read",
+            [[["state", "=", "installed"]]],
+            {"fields": ["name", "latest_version"]},
+        )
+        return hashlib.sha1(
+            '\n'.join(sorted(f"{module['name']}:{module['latest_version']}" for module in installed_modules)).encode('utf-8')
+        ).hexdigest()
+
+    def get_metadata_fingerprint(self):
+        # Changes whenever the field metadata or the module states the cleanup reads may have changed,
+        # or the way it reads them: the sources do not see the same computed fields
+        if self.metadata_provider:
+            fingerprint = self.metadata_provider.get_fingerprint()
         else:
-            field_info = fields_info_dict[model_name]
+            fingerprint = f"{self.rpc_client.get_server_version()}|{self.get_modules_fingerprint()}"
+        return f"{self.metadata_source}|{self.metadata_fetch}|{fingerprint}"
 
-        # Extract all field names defined in the given XML <record> tag
-        fields_set_in_record = {
-            field.get('name') for field in record.xpath('.//field')
-        }
+    def iter_export_models(self, directory):
+        """
+        Pre-scans the XML files of the export for the models of their records.
 
-        # Iterate through each field name in the record
-        for field_name in fields_set_in_record:
-            field_obj = None
+        The model names are rewritten by the text rules of `edit_xml_content` like the records
+        themselves, so they are the names `get_removable_field_names` is called with.
 
-            field_obj = field_info.get(field_name)
+        Args:
+            directory (str): Path of the exported module.
 
-            # Remove the field from the XML content if it's computed (not stored) and readonly
-            if field_obj and (field_obj["depends"] and field_obj["readonly"] and not field_obj['store']):
-                # Match standard field tags (e.g., <field name="foo">bar</field>)
-                pattern_standard = re.compile(
-                    rf'\s*<field name="{field_name}">.*?</field>',
-                    re.DOTALL
-                    )
+        Yields:
+            str: Each model name once, in walk order.
+        """
+        # Own engine so the pre-scan is not counted in the rule counters
+        text_rewriter = XmlRewriteEngine([rule for rule in self.xml_content_rules if not rule['tree_handler']])
+        model_names = set()
+        for root, dirs, files in os.walk(directory):
+            for file_name in files:
+                ext = file_name.rsplit('.')[1] if '.' in file_name else ''
+                if ext != 'xml':
+                    continue
+                content = Path(root + '/' + file_name).read_text(encoding="utf-8")
+                for record_match in RECORD_TAG_RE.finditer(content):
+                    model_match = RECORD_MODEL_RE.search(record_match.group(1))
+                    if not model_match:
+                        continue
+                    model_name = text_rewriter.rewrite(model_match.group(1))
+                    if model_name not in model_names:
+                        model_names.add(model_name)
+                        yield model_name
 
-                # Match self-closing field tags (e.g., <field name="foo" />)
-                pattern_self_closing = re.compile(
-                        rf'\s*<field name="{field_name}"[^>]*\s*/>'
-                    )
+    def start_metadata_prefetch(self, removable_fields_dict, directory):
+        """
+        Starts fetching the fields of every model of the export in a thread pool, so the requests
+        run while the files are read and transformed. `get_removable_field_names` only waits for a
+        model whose answer has not arrived yet.
+
+        Args:
+            removable_fields_dict (dict): Cache of removable field names per model, cached models are skipped.
+            directory (str): Path of the exported module.
 
-                # Remove matched fields from the content
-                content = pattern_standard.sub('', content)
-                content = pattern_self_closing.sub('', content)
+        Returns:
+            ThreadPoolExecutor: The pool running the requests, to shut down after the walk.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.metadata_workers, thread_name_prefix='metadata')
 
-        return content
+        # The requests start while the pre-scan goes on
+        for model_name in self.iter_export_models(directory):
+            if model_name not in removable_fields_dict:
+                self.pending_metadata[model_name] = executor.submit(self.get_fields_info, model_name)
+        return executor
+
+    def prefetch_removable_fields(self, removable_fields_dict, model_names):
+        """
+        Fills the removable field names of many models with batched `search_read` calls on
+        ir.model.fields instead of one `fields_get` call per model.
+
+        The fields are removable on the same criterion as with `fields_get`. ir.model.fields does
+        not save the dependencies of the base fields computed by a method (see
+        `get_ir_model_fields_depends`): those of the fields the ORM adds to every model, like
+        display_name, are known by `get_base_computed_field_depends`. A model with another readonly
+        field of that kind is left out, like the models without any field in the result: they are
+        fetched with `fields_get` when a record needs them.
+
+        Args:
+            removable_fields_dict (dict): Cache of removable field names per model, filled in place.
+            model_names (list): Models to fetch.
+        """
+        model_names = [model_name for model_name in model_names if model_name not in removable_fields_dict]
+        model_rows = {}
+        for index in range(0, len(model_names), self.metadata_chunk_size):
+            rows = self.rpc_client.execute_kw(
+                "ir.model.fields", "search_read",
+                [[["model", "in", model_names[index:index + self.metadata_chunk_size]]]],
+                {"fields": ["model", "name", "store", "readonly", "depends", "related", "state"]},
+            )
+            for row in rows:
+                model_rows.setdefault(row['model'], []).append(row)
+
+        server_only_models = set()
+        for model_name, rows in model_rows.items():
+            model_field_names = {row['name'] for row in rows}
+            field_names = set()
+            for row in rows:
+                field_info = {'store': row['store'], 'readonly': row['readonly'], 'depends': get_ir_model_fields_depends(row)}
+                if field_info['depends'] is None:
+                    field_info['depends'] = get_base_computed_field_depends(row['name'], model_field_names)
+
+                # Only fields_get tells whether this field has dependencies
+                if field_info['depends'] is None:
+                    if field_info['readonly']:
+                        server_only_models.add(model_name)
+                        break
+                    continue
+
+                if is_removable_field(field_info):
+                    field_names.add(row['name'])
+            else:
+                removable_fields_dict[model_name] = frozenset(field_names)
+
+        _logger.info(
+            f"Fetched the fields of {len(model_rows) - len(server_only_models)}/{len(model_names)} models from ir.model.fields, "
+            f"{len(server_only_models)} models with computed base fields of unknown dependencies are left to fields_get"
+        )
+
+    def remove_computed_fields(self, removable_fields_dict, content):
+        """
+        Removes the computed (not stored) and readonly fields from the records of the content.
+
+        Each record only loses the removable fields of its own model, all the records of the file
+        are handled in a single pass and the dropped fields are counted per model.
+
+        Args:
+            removable_fields_dict (dict): Cache of removable field names per model.
+            content (str): The XML content as a string.
+
+        Returns:
+            str: The XML content without the computed fields.
+        """
+        return self.remove_unwanted_fields(
+            content, (), lambda model_name: self.get_removable_field_names(removable_fields_dict, model_name), self.dropped_field_counts
+        )
 
     def get_relevant_scss_data(self, scss_content_list, root, file_name):
         """
@@ -845,7 +3639,6 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         """
         if scss_content_list:
             target_path = Path(destination_module_path + '/demo/' + 'website_theme_apply.xml')
-            target_path.parent.mkdir(parents=True, exist_ok=True)
 
             # Build new <function> entries for each SCSS customization
             new_function = ""
@@ -866,8 +3659,8 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
     """
             
             # Update existing file or create new one
-            if target_path.exists():
-                content = target_path.read_text(encoding='utf-8')
+            if self.module_tree.exists(target_path):
+                content = self.module_tree.read_text(target_path)
                 if "</odoo>" in content:
                     updated_content = content.replace("</odoo>", f"{new_function}\n</odoo>")
                 else:
@@ -875,7 +3668,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
             else:
                 updated_content = base_xml
             try:
-                target_path.write_text(updated_content, encoding='utf-8')
+                self.module_tree.write_text(target_path, updated_content)
             except Exception as e:
                 raise Exception(f"Unable to write website_theme_apply.xml file: {e}")
 
@@ -888,8 +3681,8 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         Also wrap the 'compute' field text in CDATA.
         """    
         path_ir_model_fields = Path(destination_module_path + '/data/' + 'ir_model_fields.xml')
-        if path_ir_model_fields.exists():
-            root_ir_model_field = self.get_etree_content(path_ir_model_fields)
+        if self.module_tree.exists(path_ir_model_fields):
+            root_ir_model_field = self.module_tree.get_etree_content(path_ir_model_fields)
             records = root_ir_model_field.xpath("//record")
             for record in records:
                 field_type_elem = record.xpath(".//field[@name='ttype']")
@@ -909,7 +3702,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                     if original_text:
                         field.text = etree.CDATA(original_text)
 
-            self.write_etree_content(path_ir_model_fields, root_ir_model_field)
+            self.module_tree.write_etree_content(path_ir_model_fields, root_ir_model_field)
 
         return
 
@@ -926,14 +3719,14 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
             None
         """
         path_file = Path(destination_module_path + '/data/' + file_name)
-        if path_file.exists():
-            root_file = self.get_etree_content(path_file)
+        if self.module_tree.exists(path_file):
+            root_file = self.module_tree.get_etree_content(path_file)
             records = root_file.xpath("//record")
             for record in records:
                 record_id = record.get('id')
                 if '.' in record_id:
                     root_file.remove(record)
-            self.write_etree_content(path_file, root_file)
+            self.module_tree.write_etree_content(path_file, root_file)
         return
 
     def remove_default_pricelist(self, destination_module_path):
@@ -947,8 +3740,8 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
             None
         """
         path_product_pricelist = Path(destination_module_path + '/data/' + 'product_pricelist.xml')
-        if path_product_pricelist.exists():
-            root_product_pricelist = self.get_etree_content(path_product_pricelist)
+        if self.module_tree.exists(path_product_pricelist):
+            root_product_pricelist = self.module_tree.get_etree_content(path_product_pricelist)
             records = root_product_pricelist.xpath("//record")
             default_id = None
             for record in records:
@@ -957,24 +3750,167 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                     default_id = record.get('id')
                     root_product_pricelist.remove(record)
 
-            self.write_etree_content(path_product_pricelist, root_product_pricelist)
+            self.module_tree.write_etree_content(path_product_pricelist, root_product_pricelist)
             return default_id
         
-    def get_default_pricelist_id(self, extrsct_module_path):
+    def get_default_pricelist_id(self, xmlid_index):
 
-        path_product_pricelist = Path(extrsct_module_path + '/data/' + 'product_pricelist.xml')
-        if path_product_pricelist.exists():
-            root_product_pricelist = self.get_etree_content(path_product_pricelist)
-            records = root_product_pricelist.xpath("//record")
-            for record in records:
-                name_key = record.xpath(".//field[@name='name']")
-                if name_key and (name_key[0].text == 'Default' or name_key[0].text == 'default'):
-                    return record.get('id')
+        # Name of the pricelists, from the symbol index of the export
+        for record in xmlid_index.get_file_records('data/product_pricelist.xml'):
+            name_key = record['fields'].get('name')
+            if name_key and (name_key['text'] == 'Default' or name_key['text'] == 'default'):
+                return record['id']
+
+    def find_used_names(self, names, content):
+        """
+        Finds which names occur in the content. The names are merged into a single regex shaped
+        like their prefix tree and matched at every position of the content, so the content is
+        scanned once instead of once per name. A name starting where a longer one matched is only
+        seen by the next scan, run on the names not found yet.
+
+        Args:
+            names (set): Strings to look for.
+            content (str): Text searched for the names.
+
+        Returns:
+            set: The names occurring in the content.
+        """
+        used_names = set()
+        remaining_names = set(names)
+        while remaining_names:
+            pattern = re.compile('(?=(' + self.build_prefix_tree_pattern(remaining_names) + '))')
+            found_names = {match.group(1) for match in pattern.finditer(content)}
+            if not found_names:
+                break
+            used_names |= found_names
+            remaining_names -= found_names
+        return used_names
+
+    def build_prefix_tree_pattern(self, names):
+        """
+        Builds a regex matching any of the names, longest first, with the common prefixes
+        factored out so the regex engine only follows the branches of the current character.
+
+        Args:
+            names (set): Non-empty strings.
+
+        Returns:
+            str: The regex.
+        """
+        tree = {}
+        for name in names:
+            node = tree
+            for char in name:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        def node_pattern(node):
+            branches = [re.escape(char) + node_pattern(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            if len(branches) == 1 and '' not in node:
+                return branches[0]
+            return '(?:' + '|'.join(branches) + ')' + ('?' if '' in node else '')
+
+        return node_pattern(tree)
+
+    def get_unused_ir_attachment_post_records(self, root_ir_attachment_post, content_ir_ui_view):
+        """
+        Finds the <record> elements of 'ir_attachment_post.xml' whose 'key' and 'name' fields are
+        not referenced in 'ir_ui_view.xml', along with the records having neither field.
+
+        Args:
+            root_ir_attachment_post (etree._Element): Root of 'ir_attachment_post.xml'.
+            content_ir_ui_view (str): Content of 'ir_ui_view.xml'.
+
+        Returns:
+            list: (record, 'file' attribute of its 'datas' field or None) of the unused records.
+        """
+        attachments = []
+        for record in root_ir_attachment_post.xpath("//record"):
+            key_field = record.xpath(".//field[@name='key']")
+            name_field = record.xpath(".//field[@name='name']")
+            datas_field = record.xpath(".//field[@name='datas']")
+            attachments.append((
+                record,
+                bool(key_field or name_field),
+                key_field[0].text if key_field else None,
+                name_field[0].text if name_field else None,
+                datas_field[0].get('file') if datas_field else None,
+            ))
+
+        # Look for every key and name in a single scan of the views
+        used_names = self.find_used_names(
+            {name for _, _, key, record_name, _ in attachments for name in (key, record_name) if name}, content_ir_ui_view
+        )
+
+        unused_records = []
+        for record, has_reference, key, name, file_name in attachments:
+            if not has_reference:
+                unused_records.append((record, None))
+            elif not ((key and key in used_names) or (name and name in used_names)):
+                unused_records.append((record, file_name))
+        return unused_records
+
+    def get_ir_attachment_post_files(self, root_ir_attachment_post, unused_records):
+        """
+        Splits the files of the 'datas' fields of 'ir_attachment_post.xml' between the kept records
+        and the unused ones. A file also used by a kept record is not unused.
+
+        Args:
+            root_ir_attachment_post (etree._Element): Root of 'ir_attachment_post.xml'.
+            unused_records (list): Result of `get_unused_ir_attachment_post_records`.
+
+        Returns:
+            tuple: (files of the kept records, files only the unused records use), relative to the
+                destination base path.
+        """
+        unused_record_set = {record for record, _ in unused_records}
+        used_files = set()
+        for record in root_ir_attachment_post.xpath("//record"):
+            datas_field = record.xpath(".//field[@name='datas']")
+            if record not in unused_record_set and datas_field and datas_field[0].get('file'):
+                used_files.add(datas_field[0].get('file'))
+        unused_files = {file_name for _, file_name in unused_records if file_name and file_name not in used_files}
+        return used_files, unused_files
+
+    def get_duplicate_attachment_files(self, directory, attachment_files, attachment_copier):
+        """
+        Finds the attachment files with the same content as another one. Only the files sharing
+        their size with another file are hashed, in the copying threads.
+
+        Args:
+            directory (str): Path of the export.
+            attachment_files (set): Files of the 'datas' fields, relative to the destination base path.
+            attachment_copier (AttachmentCopier): Copier whose threads hash the files.
+
+        Returns:
+            dict: Path of each duplicate file to the path of the file kept for its content, the first
+                one in name order.
+        """
+        files_by_size = {}
+        for file_name in sorted(attachment_files):
+            module_name, _, relative_path = file_name.partition('/')
+            source_path = directory + '/' + relative_path
+            if module_name == self.ind_name and os.path.isfile(source_path):
+                files_by_size.setdefault(os.path.getsize(source_path), []).append((file_name, source_path))
+
+        candidates = [file for files in files_by_size.values() if len(files) > 1 for file in files]
+        digests = attachment_copier.hash_files([source_path for _, source_path in candidates])
+
+        kept_files = {}
+        duplicate_files = {}
+        for (file_name, _), digest in zip(candidates, digests):
+            kept_file = kept_files.setdefault(digest, file_name)
+            if kept_file != file_name:
+                duplicate_files[file_name] = kept_file
+        return duplicate_files
 
     def remove_unused_ir_attachment_post(self, destination_module_path):
         """
         Remove unused <record> elements from 'ir_attachment_post.xml' whose 'key' or 'name' fields
-        are not referenced in 'ir_ui_view.xml'. Also deletes corresponding files from disk.
+        are not referenced in 'ir_ui_view.xml'. Also deletes corresponding files from disk, left
+        by an earlier run since `clean()` does not copy them.
 
         Args:
             destination_module_path (str): Module directory path.
@@ -984,16 +3920,11 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         path_ir_ui_view = Path(destination_module_path + '/demo/' + 'ir_ui_view.xml')
         
         # Only proceed if both files exist
-        if path_ir_attachment_post.exists() and path_ir_ui_view.exists():
-            root_ir_attachment_post = self.get_etree_content(path_ir_attachment_post)
-            content_ir_ui_view = path_ir_ui_view.read_text(encoding="utf-8")
+        if self.module_tree.exists(path_ir_attachment_post) and self.module_tree.exists(path_ir_ui_view):
+            root_ir_attachment_post = self.module_tree.get_etree_content(path_ir_attachment_post)
+            content_ir_ui_view = self.module_tree.read_text(path_ir_ui_view)
             records = root_ir_attachment_post.xpath("//record")
-            unused_ir_attachment_post_ids = []
-            unused_files = []
             for record in records:
-                key_field = record.xpath(".//field[@name='key']")
-                name_field = record.xpath(".//field[@name='name']")
-                datas_field = record.xpath(".//field[@name='datas']")
                 url_field = record.xpath(".//field[@name='url']")
                 res_model = record.xpath(".//field[@name='res_model']")
                 website_id = record.xpath(".//field[@name='website_id']")
@@ -1003,35 +3934,47 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                     record.remove(website_id[0])
                 if url_field:
                     record.remove(url_field[0])
-                if key_field or name_field:
-                    # check key or name in ir_ui_view.xml file if not found store in list
-                    key = key_field[0].text if key_field else None
-                    name = name_field[0].text if name_field else None
-                    file_name = datas_field[0].get('file') if datas_field else None
-                    if not ((key and key in content_ir_ui_view) or (name and name in content_ir_ui_view)):
-                        unused_ir_attachment_post_ids.append(record)
-                        if file_name:
-                            unused_files.append(file_name)
-                else:
-                    unused_ir_attachment_post_ids.append(record)
 
             # Remove record from ir_attachment_post file
-            for unused_ir_attachment_post_id in unused_ir_attachment_post_ids:
-                root_ir_attachment_post.remove(unused_ir_attachment_post_id)
+            unused_records = self.get_unused_ir_attachment_post_records(root_ir_attachment_post, content_ir_ui_view)
+            _, unused_files = self.get_ir_attachment_post_files(root_ir_attachment_post, unused_records)
+            for record, _ in unused_records:
+                root_ir_attachment_post.remove(record)
             
             # Delete unused files
-            for unused_file in unused_files:
-                file_path = Path(self.destination_base_path + unused_file)
-                if file_path.exists():
-                    try:
-                        os.remove(file_path)
-                    except Exception as e:
-                        print(f"Warning: Failed to remove file {file_path}: {e}")
+            for unused_file in sorted(unused_files):
+                file_path = Path(self.destination_base_path + '/' + unused_file)
+                if self.module_tree.exists(file_path):
+                    self.module_tree.remove(file_path)
 
-            self.write_etree_content(path_ir_attachment_post, root_ir_attachment_post)
+            self.module_tree.write_etree_content(path_ir_attachment_post, root_ir_attachment_post)
 
         return
 
+    def dedupe_ir_attachment_post(self, destination_module_path, duplicate_attachment_files):
+        """
+        Points the 'datas' fields of 'ir_attachment_post.xml' at the kept file of their content.
+        Also deletes the duplicate files left by an earlier run, `clean()` does not copy them.
+
+        Args:
+            destination_module_path (str): Module directory path.
+            duplicate_attachment_files (dict): Result of `get_duplicate_attachment_files`.
+        """
+        if not duplicate_attachment_files:
+            return
+
+        path_ir_attachment_post = Path(destination_module_path + '/demo/' + 'ir_attachment_post.xml')
+        if self.module_tree.exists(path_ir_attachment_post):
+            root_ir_attachment_post = self.module_tree.get_etree_content(path_ir_attachment_post)
+            for datas_field in root_ir_attachment_post.xpath("//record/field[@name='datas']"):
+                kept_file = duplicate_attachment_files.get(datas_field.get('file'))
+                if kept_file:
+                    datas_field.set('file', kept_file)
+            self.module_tree.write_etree_content(path_ir_attachment_post, root_ir_attachment_post)
+
+        for duplicate_file in duplicate_attachment_files:
+            self.module_tree.remove(self.destination_base_path + '/' + duplicate_file)
+
     def order_ir_attachment_post(self, destination_module_path):
         """
         Orders <record> elements in 'ir_attachment_post.xml' based on numeric suffix in their IDs.
@@ -1045,8 +3988,8 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         """
 
         path_ir_attachment_post = Path(destination_module_path + '/demo/' + 'ir_attachment_post.xml')
-        if path_ir_attachment_post.exists():
-            root_ir_attachment_post = self.get_etree_content(path_ir_attachment_post)
+        if self.module_tree.exists(path_ir_attachment_post):
+            root_ir_attachment_post = self.module_tree.get_etree_content(path_ir_attachment_post)
             all_records = root_ir_attachment_post.xpath("//record")
             records = list(filter(lambda x: re.fullmatch(r'ir_attachment_\d+', x.get('id', '')), all_records))
             sorted_records = sorted(records, key = lambda x: int(x.get('id').split("_")[-1]))
@@ -1056,7 +3999,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
             for record in reversed(sorted_records):
                 root_ir_attachment_post.insert(0, record)
 
-            self.write_etree_content(path_ir_attachment_post, root_ir_attachment_post)
+            self.module_tree.write_etree_content(path_ir_attachment_post, root_ir_attachment_post)
         
         return
 
@@ -1067,8 +4010,8 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
             wrap certain field texts in CDATA.
         """    
         path_knowledge_article = Path(destination_module_path + '/data/' + 'knowledge_article.xml')
-        if path_knowledge_article.exists():
-            root_knowledge_article = self.get_etree_content(path_knowledge_article)
+        if self.module_tree.exists(path_knowledge_article):
+            root_knowledge_article = self.module_tree.get_etree_content(path_knowledge_article)
             if 'noupdate' in root_knowledge_article.attrib and root_knowledge_article.attrib['noupdate'] == '1':
                 del root_knowledge_article.attrib['noupdate']
 
@@ -1097,36 +4040,23 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                     record.append(new_field)
                 
 
-            self.write_etree_content(path_knowledge_article, root_knowledge_article)
+            self.module_tree.write_etree_content(path_knowledge_article, root_knowledge_article)
         return
 
     def check_website_sale_installed(self):
-        # Prepare the JSON-RPC payload to search for the 'website_sale' module
-        
-        session, uid = self.session_authentication()
-        
-        payload = {
-            "jsonrpc": "2.0",
-            "method": "call",
-            "params": {
-                "service": "object",
-                "method": "execute_kw",
-                "args": [
-                    self.db_name, uid, PASSWORD,
-                    "ir.module.module", "search_read",
-                    [[["name", "=", "website_sale"]]],
-                    {"fields": ["state"], "limit": 1}
-                ]
-            },
-            "id": 2
-        }
-
-        # Send the request to the server and parse the JSON response
-        response = session.post(f"{BASE_URL}{self.port}/jsonrpc", json=payload).json()
+        if self.metadata_provider:
+            return self.metadata_provider.get_module_state('website_sale') == 'installed'
+
+        # Search for the 'website_sale' module through the shared JSON-RPC client
+        result = self.rpc_client.execute_kw(
+            "ir.module.module", "search_read",
+            [[["name", "=", "website_sale"]]],
+            {"fields": ["state"], "limit": 1},
+        )
         
         # Return the list of matched module(s) with their state
-        if response["result"]:
-            return response["result"][0]['state'] == 'installed'
+        if result:
+            return result[0]['state'] == 'installed'
 
     def add_demo_payment_provider(self, destination_module_path, manifest_demo_file_list):
         """
@@ -1150,15 +4080,15 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
             # Prepare dictionary for manifest demo file entry
             manifest_demo_file_dict = {
                 'file_name': file_name,
-                'ref_name': []  # No references for this file
+                'ref_name': [],  # No references for this file
+                'record_ids': []
             }
             # Append new demo file to manifest list
             manifest_demo_file_list.append(manifest_demo_file_dict)
 
-            # Ensure demo directory exists and write XML content to file
+            # Write XML content to file, the demo directory is created on flush
             demo_file_path = Path(destination_module_path) / 'demo' / file_name
-            demo_file_path.parent.mkdir(parents=True, exist_ok=True)
-            demo_file_path.write_text(xml_content, encoding='utf-8')
+            self.module_tree.write_text(demo_file_path, xml_content)
 
         return
 
@@ -1182,7 +4112,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
 
         Steps:
         1. Renames ir_ui_view.xml to website_view.xml if it exists.
-        2. Deduplicates demo file references and prefixes with 'demo/'.
+        2. Orders the demo files by their references, deduplicates them and prefixes with 'demo/'.
         3. Removes specific unused data files if they contain no <record> tags.
         4. Ensures required dependencies are included.
         5. Rewrites the manifest file with the updated 'demo' section and additional metadata.
@@ -1195,15 +4125,16 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         # Rename ir_ui_view.xml to website_view.xml for consistency
         try:
             old_file = Path(destination_module_path + "/demo/ir_ui_view.xml")
-            if old_file.exists():
+            if self.module_tree.exists(old_file):
                 new_file = Path(destination_module_path + "/demo/website_view.xml")
-                os.rename(old_file, new_file)
+                self.module_tree.rename(old_file, new_file)
         except Exception as e:
             raise Exception(f"Error while renaming file: {e}")
         
-        # Remove duplicate demo files; keep only first occurrence
+        # Load each demo file after the files defining the records it refers to, then remove
+        # duplicate demo files; keep only first occurrence
         new_manifest_demo_file_list = []
-        for file_list in manifest_demo_file_list:
+        for file_list in self.order_manifest_demo_files(manifest_demo_file_list, dependency_chains):
             if file_list['file_name'] == "ir_ui_view.xml":
                 file_list['file_name'] = "website_view.xml"
             if file_list['file_name'] not in new_manifest_demo_file_list:
@@ -1215,7 +4146,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         # Read and evaluate the manifest file
         manifest_path = Path(destination_module_path + '/__manifest__.py')
         try:
-            manifest = literal_eval(manifest_path.read_text(encoding="utf-8"))
+            manifest = literal_eval(self.module_tree.read_text(manifest_path))
         except Exception as e:
             raise Exception(f"Unable to read manifest file: {e}")
         
@@ -1223,11 +4154,11 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         check_files = ['ir_attachment_pre.xml', 'knowledge_cover.xml', 'mail_template.xml', 'product_pricelist.xml']
         for check_file in check_files:
             file_path = Path(destination_module_path + '/data/' + check_file)
-            if file_path.exists():
-                etree_content = self.get_etree_content(file_path)
+            if self.module_tree.exists(file_path):
+                etree_content = self.module_tree.get_etree_content(file_path)
                 records = etree_content.xpath("//record")
                 if len(records) == 0:
-                    os.remove(file_path)
+                    self.module_tree.remove(file_path)
                     manifest['data'].remove('data/' + check_file)
         
         # Adding some required dependencies like knowledge
@@ -1240,6 +4171,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         dependencies_collection = []
         if dependency_chains:
             dependencies_collection = self.process_dependencies(destination_module_path, dependency_chains, dependencies_collection)
+            _logger.info(f"Circular dependencies: {len(dependencies_collection)} fields deferred to record_creation_post.xml")
         
         # Create and map new dependency files if any circular dependencies are detected
         if dependencies_collection:
@@ -1282,7 +4214,7 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         # Write the updated manifest back to disk
         formatted_manifest = "\n".join(lines)
         try:
-            manifest_path.write_text(formatted_manifest, encoding="utf-8")
+            self.module_tree.write_text(manifest_path, formatted_manifest)
         except Exception as e:
             raise Exception(f"Unable to write manifest file: {e}")
 
@@ -1301,8 +4233,8 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                 destination_module_path (str): The module directory name containing the demo folder with website.xml.
         """
         website_path = Path(destination_module_path + '/demo/' + 'website.xml')
-        if website_path.exists():
-            etree_content = self.get_etree_content(website_path)
+        if self.module_tree.exists(website_path):
+            etree_content = self.module_tree.get_etree_content(website_path)
             theme_id = etree_content.xpath("//field[@name='theme_id']")[0].get('ref')
             if theme_id:
         
@@ -1317,15 +4249,15 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                 target_path = Path(destination_module_path + '/demo/' + 'website_theme_apply.xml')
 
                 # Update existing file or create new one
-                if target_path.exists():
-                    content = target_path.read_text(encoding='utf-8')
+                if self.module_tree.exists(target_path):
+                    content = self.module_tree.read_text(target_path)
                     updated_content = content.replace("<odoo>", f"<odoo>\n\t{new_function}\n")
                 else:
                     updated_content = base_xml
 
                 # Write back to file
                 try:
-                    target_path.write_text(updated_content, encoding='utf-8')
+                    self.module_tree.write_text(target_path, updated_content)
                 except Exception as e:
                     raise Exception(f"Unable to write website_theme_apply.xml file: {e}")
 
@@ -1344,8 +4276,8 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                 None: Modifies the XML file in place without returning a value.
         """
         target_path = Path(destination_module_path + '/demo/' + 'sale_order_line.xml')
-        if target_path.exists():
-            etree_content = self.get_etree_content(target_path)
+        if self.module_tree.exists(target_path):
+            etree_content = self.module_tree.get_etree_content(target_path)
             records = etree_content.xpath("//record")
             for record in records:
                 display_type_elem = record.xpath(".//field[@name='display_type']")
@@ -1358,11 +4290,11 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
                     for field in record.xpath(".//field[@name='name']"):
                         record.remove(field)
             
-            self.write_etree_content(target_path, etree_content)
+            self.module_tree.write_etree_content(target_path, etree_content)
 
         return
     
-    def prepare_old_to_new_id_map(self):
+    def prepare_old_to_new_id_map(self, xmlid_index):
         files_name = [
             'ir_model.xml',
             'ir_model_fields.xml',
@@ -1373,85 +4305,98 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
         old_new_id_map = {}
 
         for file_name in files_name:
-            file_path = Path(self.module_path + '/data/' + file_name)
-            if file_path.exists():
-                etree_content = self.get_etree_content(file_path)
-                records = etree_content.xpath("//record")
-
-                for record in records:
-                    model_field = record.xpath("./field[@name='model']")
-                    model_id_field = record.xpath("./field[@name='model_id']")
-                    name_field = record.xpath("./field[@name='name']")
-                    group_id_field = record.xpath("./field[@name='group_id']")
-                    field_id_field = record.xpath("./field[@name='field_id']")
-                    type_field = record.xpath("./field[@name='type']")
-                    inherit_id_field = record.xpath("./field[@name='inherit_id']")
+            # Key fields of the records, from the symbol index of the export
+            for record in xmlid_index.get_file_records('data/' + file_name):
+                fields = record['fields']
+                model_field = fields.get('model')
+                model_id_field = fields.get('model_id')
+                name_field = fields.get('name')
+                group_id_field = fields.get('group_id')
+                field_id_field = fields.get('field_id')
+                type_field = fields.get('type')
+                inherit_id_field = fields.get('inherit_id')
+
+                allow_change = False
+                
+                match file_name:
+                    case 'ir_model.xml':
+                        if model_field:
+                            model = model_field['text'].replace('.', '_')
 
-                    allow_change = False
+                            new_id = f"{model}_model"
+                            allow_change = True
                     
-                    match file_name:
-                        case 'ir_model.xml':
-                            if model_field:
-                                model = model_field[0].text.replace('.', '_')
-
-                                new_id = f"{model}_model"
-                                allow_change = True
-                        
-                        case 'ir_model_fields.xml':
-                            if model_id_field and name_field:
-                                model_id = model_id_field[0].get('ref').replace('.', '_')
-                                name = name_field[0].text.replace('.', '_')
-
-                                model_id = old_new_id_map.get(model_id, model_id)
-                                new_id = f"{model_id}_{name}_field"
-                                allow_change = True
-
-                        case 'ir_ui_view.xml':
-                            inherited_records = []
-                            if inherit_id_field:
-                                inherited_records.append(record)
-                                continue
+                    case 'ir_model_fields.xml':
+                        if model_id_field and name_field:
+                            model_id = model_id_field['ref'].replace('.', '_')
+                            name = name_field['text'].replace('.', '_')
+
+                            model_id = old_new_id_map.get(model_id, model_id)
+                            new_id = f"{model_id}_{name}_field"
+                            allow_change = True
+
+                    case 'ir_ui_view.xml':
+                        inherited_records = []
+                        if inherit_id_field:
+                            inherited_records.append(record)
+                            continue
+
+                        if model_field and type_field and type_field['text'] != 'qweb':
+                            model = model_field['text'].replace('.', '_')
+                            type = type_field['text'].replace('.', '_')
+
+                            new_id = f"{model}_{type}_view"
+                            allow_change = True
+                            # todo ; handle inherit view
+
+                    case 'ir_default.xml':
+                        if field_id_field:
+                            field_id = field_id_field['ref'].replace('.', '_')
+
+                            field_id = old_new_id_map.get(field_id, field_id)
+                            new_id = f"{field_id}_default_value"
+                            allow_change = True
+
+                    case 'ir_model_access.xml':
+                        if model_id_field and group_id_field:
+                            model_id = model_id_field['ref'].replace('.', '_')
+                            group_id = group_id_field['ref'].replace('.', '_')
 
-                            if model_field and type_field and type_field[0].text != 'qweb':
-                                model = model_field[0].text.replace('.', '_')
-                                type = type_field[0].text.replace('.', '_')
-
-                                new_id = f"{model}_{type}_view"
-                                allow_change = True
-                                # todo ; handle inherit view
-
-                        case 'ir_default.xml':
-                            if field_id_field:
-                                field_id = field_id_field[0].get('ref').replace('.', '_')
-
-                                field_id = old_new_id_map.get(field_id, field_id)
-                                new_id = f"{field_id}_default_value"
-                                allow_change = True
-
-                        case 'ir_model_access.xml':
-                            if model_id_field and group_id_field:
-                                model_id = model_id_field[0].get('ref').replace('.', '_')
-                                group_id = group_id_field[0].get('ref').replace('.', '_')
-
-                                model_id = old_new_id_map.get(model_id, model_id)
-                                new_id = f"{model_id}_{group_id}_model_access"
-                                allow_change = True
-                        
-                        case _:
-                            pass
+                            model_id = old_new_id_map.get(model_id, model_id)
+                            new_id = f"{model_id}_{group_id}_model_access"
+                            allow_change = True
                     
-                    old_id = record.get("id")
-                    if allow_change and old_id != new_id and '.' not in old_id:
-                        old_new_id_map[old_id] = new_id
+                    case _:
+                        pass
+                
+                old_id = record['id']
+                if allow_change and old_id != new_id and '.' not in old_id:
+                    old_new_id_map[old_id] = new_id
         
         return old_new_id_map
 
     def replace_old_id_to_new_id(self, content, old_new_id_map):
-        for old_id, new_id in old_new_id_map.items():
-            content = content.replace(f'model_id="{old_id}"', f'model_id="{new_id}"')
-            content = content.replace(f'ref="{old_id}"', f'ref="{new_id}"')
-            content = content.replace(f'id="{old_id}"', f'id="{new_id}"')
-        return content
+        # Rename the whole values of the id, ref and model_id like attributes in a single scan
+        if not old_new_id_map:
+            return content
+        return self.get_id_rewrite_pattern(old_new_id_map).sub(lambda match: match[1] + old_new_id_map[match[2]] + '"', content)
+
+    def get_id_rewrite_pattern(self, old_new_id_map):
+        """
+        Builds the regex of `replace_old_id_to_new_id` once per map: an attribute name ending with
+        'id' or 'ref' and a quoted value that is exactly one of the old ids, the ids sharing their
+        prefixes in the regex.
+
+        Args:
+            old_new_id_map (dict): Mapping of old record ids to new ones.
+
+        Returns:
+            re.Pattern: Regex capturing the attribute up to the opening quote and the old id.
+        """
+        if self.id_rewrite_pattern is None or self.id_rewrite_pattern[0] is not old_new_id_map:
+            pattern = re.compile('((?:id|ref)=")(' + self.build_prefix_tree_pattern(old_new_id_map) + ')"')
+            self.id_rewrite_pattern = (old_new_id_map, pattern)
+        return self.id_rewrite_pattern[1]
 
     def remove_default_pricelist_ref(self, default_pricelist_id, content):
         pattern_ref_field = rf'\s*<field[^>]*\sref="{default_pricelist_id}"[^>]*/?>.*?(</field>)?'
@@ -1466,19 +4411,70 @@ registry.category("web_tour.tours").add("{ind_name}_knowledge_tour", {{
 #              Main Function         
 # ====================================================
 
+def dump_metadata_main(argv):
+    # Subcommand writing the metadata snapshot used by --metadata-snapshot
+    parser = argparse.ArgumentParser(prog="only_cleanup_script.py dump-metadata", description="Dump the metadata needed by the cleanup to a snapshot file")
+
+    parser.add_argument('--db_name', required=True, help="restore db name")
+    parser.add_argument('--port', required=True, help="port of the running Odoo server")
+    parser.add_argument('--output', required=True, help="Path of the snapshot file (gzip compressed JSON)")
+    parser.add_argument('--rpc_timeout', type=float, default=60, help="Seconds to wait for the Odoo server on each JSON-RPC call")
+    parser.add_argument('--rpc_retries', type=int, default=3, help="Retries of a JSON-RPC call failing on a connection error or a timeout")
+    parser.add_argument('--metadata_workers', type=int, default=4, help="Number of concurrent fields_get calls")
+
+    args = parser.parse_args(argv)
+
+    rpc_client = OdooJsonRpcClient(
+        f"{BASE_URL}{args.port}", args.db_name, LOGIN, PASSWORD, timeout=args.rpc_timeout, retries=args.rpc_retries, pool_size=max(args.metadata_workers, 4)
+    )
+    MetadataSnapshot.dump(rpc_client, args.output, workers=args.metadata_workers)
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'dump-metadata':
+        return dump_metadata_main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(description="Industry Automation Script")
 
     parser.add_argument('--module_name', required=True, help="Name of the module")
     parser.add_argument('--category', required=True, help="Module category")
     parser.add_argument('--studio_path', required=True, help="Path to the dump zip file")
     parser.add_argument('--db_name', required=True, help="restore db name")
-    parser.add_argument('--port', required=True, help="port to get compute field")
+    parser.add_argument('--port', help="port to get compute field, not needed with --metadata-snapshot or --metadata_source=postgres")
     parser.add_argument('--destination_path', default="/home/odoo/Downloads", help="Path to save the cleaned module")
+    parser.add_argument('--rpc_timeout', type=float, default=60, help="Seconds to wait for the Odoo server on each JSON-RPC call")
+    parser.add_argument('--rpc_retries', type=int, default=3, help="Retries of a JSON-RPC call failing on a connection error or a timeout")
+    parser.add_argument('--metadata_fetch', choices=['lazy', 'bulk', 'prefetch'], default='lazy',
+                        help="'bulk' reads the fields of every model of the export from ir.model.fields before the walk, 'prefetch' fetches them in background threads during the walk")
+    parser.add_argument('--metadata_workers', type=int, default=4, help="Number of threads fetching the field metadata in prefetch mode")
+    parser.add_argument('--metadata_chunk_size', type=int, default=50, help="Number of models per ir.model.fields call in bulk mode")
+    parser.add_argument('--metadata_cache_dir', help="Directory of a persistent field metadata cache reused by the runs on the same database")
+    parser.add_argument('--metadata_cache_size_mb', type=int, default=64, help="Size cap of the metadata cache directory, least recently used entries are evicted")
+    parser.add_argument('--metadata_snapshot', '--metadata-snapshot', help="Snapshot file written by the dump-metadata subcommand, used instead of the Odoo server")
+    parser.add_argument('--metadata_source', choices=['server', 'postgres'], default='server',
+                        help="'postgres' reads the fields and module states straight from the restored database with psql instead of the Odoo server")
+    parser.add_argument('--pipeline', choices=['string', 'tree', 'stream'], default='string',
+                        help="'tree' parses every XML file once and runs all cleanup steps on the parsed tree, "
+                             "'stream' does the same one record at a time for exports too large for memory")
+    parser.add_argument('--jobs', type=int, default=1, help="Number of worker processes transforming the XML files, the output is the same as with 1")
+    parser.add_argument('--copy_workers', type=int, default=8, help="Number of threads copying the attachment files")
+    parser.add_argument('--hardlink_attachments', action='store_true',
+                        help="Hard link the attachment files to the export when they cannot be reflinked, the module then shares them with the export")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Keep a build journal next to the cleaned module and only redo the files and passes affected by what changed since the last run")
+    parser.add_argument('--skip_admin_reset', action='store_true',
+                        help="Do not reset the login and password of the admin user in the restored database with psql")
 
     args = parser.parse_args()
-
-    cleanModuleObj = CleanModule(args.module_name, args.category, args.db_name, args.studio_path, args.destination_path, args.port)
+    if not args.port and not args.metadata_snapshot and args.metadata_source == 'server':
+        parser.error("--port is required without --metadata-snapshot or --metadata_source=postgres")
+
+    cleanModuleObj = CleanModule(args.module_name, args.category, args.db_name, args.studio_path, args.destination_path, args.port, pipeline=args.pipeline, rpc_timeout=args.rpc_timeout, rpc_retries=args.rpc_retries,
+                                  metadata_fetch=args.metadata_fetch, metadata_chunk_size=args.metadata_chunk_size,
+                                  metadata_cache_dir=args.metadata_cache_dir, metadata_cache_size_mb=args.metadata_cache_size_mb,
+                                  metadata_workers=args.metadata_workers, metadata_snapshot=args.metadata_snapshot,
+                                  metadata_source=args.metadata_source, jobs=args.jobs, incremental=args.incremental,
+                                  copy_workers=args.copy_workers, hardlink_attachments=args.hardlink_attachments,
+                                  reset_admin=not args.skip_admin_reset)
     cleanModuleObj.clean()
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+import io
+import logging
+import os
+import sys
+
+import pytest
+
+# The cleanup is a single script at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from only_cleanup_script import CleanModule, _logger, handler  # noqa: E402
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "scaling: timing checks of the growth of the stages, run apart from the other tests")
+
+
+@pytest.fixture
+def quiet_logs():
+    # The runs report their stages, only the warnings are shown
+    level = handler.level
+    handler.setLevel(logging.WARNING)
+    yield
+    handler.setLevel(level)
+
+
+@pytest.fixture
+def log_output():
+    # Everything the cleanup logs during the test, its logger does not propagate to caplog
+    output = io.StringIO()
+    log_handler = logging.StreamHandler(output)
+    _logger.addHandler(log_handler)
+    yield output
+    _logger.removeHandler(log_handler)
+
+
+def clean_export(export, destination_path, **options):
+    """
+    Cleans an export against its metadata snapshot.
+
+    Args:
+        export (tuple): Path of the export, path of its metadata snapshot.
+        destination_path (str): Directory receiving the cleaned module.
+        options: Other arguments of CleanModule.
+
+    Returns:
+        str: Path of the cleaned module.
+    """
+    module_path, snapshot_path = export
+    os.makedirs(destination_path, exist_ok=True)
+    CleanModule('industry', 'services', 'db', module_path, destination_path, None,
+                metadata_snapshot=snapshot_path, reset_admin=False, **options).clean()
+    return os.path.join(destination_path, 'industry')
+
+
+def read_module(module_path):
+    # Content of every file of a cleaned module per relative path
+    contents = {}
+    for root, dirs, files in os.walk(module_path):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            with open(path, 'rb') as f:
+                contents[os.path.relpath(path, module_path)] = f.read()
+    return contents
@@ -0,0 +1,212 @@
+import os
+import random
+import re
+import shutil
+import types
+from pathlib import Path
+
+import pytest
+
+import only_cleanup_script
+from benchmarks.studio_export import StudioExportGenerator
+from conftest import clean_export
+from only_cleanup_script import AttachmentCopier, CleanModule, ModuleTree
+
+# Names prefixes of one another, with regex metacharacters, and missing from the content
+NAMES = {
+    'image', 'image_1', 'image_10', 'image_1.png', 'website.image_1', 'website.image_10', 'a.b', 'a+b', 'a*b', '(x)', '[y]',
+    'c|d', 'e?', '^f$', 'g\\h', '{1}', 'missing', 'image_2_missing',
+}
+
+
+@pytest.fixture(scope='module')
+def clean_module():
+    return CleanModule('industry', 'services', 'db', '', '', None, reset_admin=False)
+
+
+@pytest.mark.parametrize('content', [
+    '<img src="/web/image/website.image_10"/><img src="/unsplash/image_1.png"/>',
+    'aXb a+b (x) [y] c|d e? ^f$ g\\h {1}',
+    'image_10',
+    '',
+])
+def test_find_used_names_matches_substring_search(clean_module, content):
+    assert clean_module.find_used_names(NAMES, content) == {name for name in NAMES if name in content}
+
+
+def test_find_used_names_on_random_content(clean_module):
+    rnd = random.Random(7)
+    pieces = sorted(NAMES) + ['<img src="', '"/>', '/web/image/', ' ', '.', '_', '1', '0']
+    for _ in range(500):
+        names = set(rnd.sample(sorted(NAMES), rnd.randint(1, len(NAMES))))
+        content = ''.join(rnd.choice(pieces) for _ in range(rnd.randint(0, 20)))
+        assert clean_module.find_used_names(names, content) == {name for name in names if name in content}, content
+
+
+def test_prefix_tree_pattern_matches_every_name(clean_module):
+    pattern = clean_module.build_prefix_tree_pattern(NAMES)
+    for name in NAMES:
+        assert re.fullmatch(pattern, name), name
+
+
+def test_get_duplicate_attachment_files(clean_module, tmp_path):
+    # Two copies of a content, a file of the same size with another content, a file of its own size
+    contents = {'1-a.png': b'abcd', '2-b.png': b'abcd', '3-c.png': b'abce', '4-d.png': b'abcdef', '5-e.png': b'abcd'}
+    (tmp_path / 'ir_attachment').mkdir()
+    for file_name, content in contents.items():
+        (tmp_path / 'ir_attachment' / file_name).write_bytes(content)
+
+    attachment_files = {'industry/ir_attachment/' + file_name for file_name in contents} | {'other/ir_attachment/2-b.png'}
+    attachment_copier = AttachmentCopier(workers=2)
+    try:
+        duplicate_files = clean_module.get_duplicate_attachment_files(str(tmp_path), attachment_files, attachment_copier)
+    finally:
+        attachment_copier.wait()
+    assert duplicate_files == {
+        'industry/ir_attachment/2-b.png': 'industry/ir_attachment/1-a.png',
+        'industry/ir_attachment/5-e.png': 'industry/ir_attachment/1-a.png',
+    }
+
+
+BINARIES = {'1-a.png': b'abcd', '2-b.png': b'efgh' * 1000, '3-c.png': b''}
+
+
+@pytest.fixture
+def binaries(tmp_path):
+    # Source binaries and an empty destination directory
+    (tmp_path / 'source').mkdir()
+    (tmp_path / 'destination').mkdir()
+    for file_name, content in BINARIES.items():
+        (tmp_path / 'source' / file_name).write_bytes(content)
+    return tmp_path
+
+
+def copy_binaries(directory, **options):
+    attachment_copier = AttachmentCopier(workers=1, **options)
+    for file_name in BINARIES:
+        attachment_copier.copy(str(directory / 'source' / file_name), str(directory / 'destination' / file_name))
+    stats = attachment_copier.wait()
+    for file_name, content in BINARIES.items():
+        assert (directory / 'destination' / file_name).read_bytes() == content
+    return {key: stats[key] for key in ['files', 'bytes', 'reflinked', 'hardlinked', 'copied', 'unchanged']}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    # Reflinks and hard links tried, each fails when its entry of `fails` is set
+    calls = {'ioctl': 0, 'link': 0, 'fails': {'ioctl': False, 'link': False}}
+
+    def ioctl(destination_fd, request, source_fd):
+        calls['ioctl'] += 1
+        if calls['fails']['ioctl']:
+            raise OSError(95, 'Operation not supported')
+        assert request == only_cleanup_script.FICLONE
+        with os.fdopen(os.dup(source_fd), 'rb') as source, os.fdopen(os.dup(destination_fd), 'wb') as destination:
+            shutil.copyfileobj(source, destination)
+
+    os_link = os.link
+
+    def link(source_path, destination_path):
+        calls['link'] += 1
+        if calls['fails']['link']:
+            raise OSError(1, 'Operation not permitted')
+        os_link(source_path, destination_path)
+
+    monkeypatch.setattr(only_cleanup_script, 'fcntl', types.SimpleNamespace(ioctl=ioctl))
+    monkeypatch.setattr(only_cleanup_script.os, 'link', link)
+    return calls
+
+
+def test_copier_reflinks(binaries, calls):
+    assert copy_binaries(binaries, hardlink=True) == {'files': 3, 'bytes': 4004, 'reflinked': 3, 'hardlinked': 0, 'copied': 0, 'unchanged': 0}
+    assert (calls['ioctl'], calls['link']) == (3, 0)
+    for file_name in BINARIES:
+        assert os.stat(binaries / 'destination' / file_name).st_mtime_ns == os.stat(binaries / 'source' / file_name).st_mtime_ns
+
+
+def test_copier_falls_back_to_hard_links(binaries, calls):
+    # The first refused reflink stops the next ones
+    calls['fails']['ioctl'] = True
+    assert copy_binaries(binaries, hardlink=True) == {'files': 3, 'bytes': 4004, 'reflinked': 0, 'hardlinked': 3, 'copied': 0, 'unchanged': 0}
+    assert (calls['ioctl'], calls['link']) == (1, 3)
+    assert all(os.path.samefile(binaries / 'destination' / file_name, binaries / 'source' / file_name) for file_name in BINARIES)
+
+
+def test_copier_falls_back_to_copies(binaries, calls):
+    calls['fails'] = {'ioctl': True, 'link': True}
+    assert copy_binaries(binaries, hardlink=True) == {'files': 3, 'bytes': 4004, 'reflinked': 0, 'hardlinked': 0, 'copied': 3, 'unchanged': 0}
+    assert (calls['ioctl'], calls['link']) == (1, 1)
+    for file_name in BINARIES:
+        assert not os.path.samefile(binaries / 'destination' / file_name, binaries / 'source' / file_name)
+        assert os.stat(binaries / 'destination' / file_name).st_mtime_ns == os.stat(binaries / 'source' / file_name).st_mtime_ns
+
+
+def test_copier_hard_links_only_on_request(binaries, calls):
+    calls['fails']['ioctl'] = True
+    assert copy_binaries(binaries)['copied'] == 3
+    assert calls['link'] == 0
+
+
+def test_copier_skips_unchanged_files(binaries, calls):
+    calls['fails']['ioctl'] = True
+    copy_binaries(binaries)
+
+    # Same content with another modification time is unchanged, another content of the same size is not
+    os.utime(binaries / 'destination' / '1-a.png', (0, 0))
+    (binaries / 'destination' / '2-b.png').write_bytes(b'ijkl' * 1000)
+    assert copy_binaries(binaries) == {'files': 3, 'bytes': 4004, 'reflinked': 0, 'hardlinked': 0, 'copied': 1, 'unchanged': 2}
+    assert copy_binaries(binaries) == {'files': 3, 'bytes': 4004, 'reflinked': 0, 'hardlinked': 0, 'copied': 0, 'unchanged': 3}
+
+
+def test_copier_reports_errors(binaries, calls):
+    calls['fails']['ioctl'] = True
+    attachment_copier = AttachmentCopier(workers=1)
+    attachment_copier.copy(str(binaries / 'source' / '1-a.png'), str(binaries / 'missing' / '1-a.png'))
+    with pytest.raises(Exception, match="Unable to copy .*1-a.png"):
+        attachment_copier.wait()
+
+
+def test_dedupe_ir_attachment_post(clean_module, tmp_path):
+    clean_module.destination_base_path = str(tmp_path)
+    module_path = str(tmp_path / 'industry')
+    os.makedirs(module_path + '/demo')
+    os.makedirs(module_path + '/ir_attachment')
+    Path(module_path + '/ir_attachment/2-b.png').write_bytes(b'abcd')
+    Path(module_path + '/demo/ir_attachment_post.xml').write_text(
+        "<?xml version='1.0' encoding='UTF-8'?>\n<odoo>\n" + "".join(
+            f'  <record id="ir_attachment_{index}" model="ir.attachment">\n'
+            f'    <field name="datas" type="base64" file="industry/ir_attachment/{file_name}"/>\n  </record>\n'
+            for index, file_name in enumerate(['1-a.png', '2-b.png', '3-c.png'])
+        ) + "</odoo>\n", encoding='utf-8'
+    )
+
+    clean_module.module_tree = ModuleTree()
+    try:
+        clean_module.dedupe_ir_attachment_post(module_path, {'industry/ir_attachment/2-b.png': 'industry/ir_attachment/1-a.png'})
+        clean_module.module_tree.flush()
+    finally:
+        clean_module.module_tree = None
+
+    content = Path(module_path + '/demo/ir_attachment_post.xml').read_text(encoding='utf-8')
+    assert re.findall(r'file="([^"]*)"', content) == [
+        'industry/ir_attachment/1-a.png', 'industry/ir_attachment/1-a.png', 'industry/ir_attachment/3-c.png',
+    ]
+    assert not os.path.exists(module_path + '/ir_attachment/2-b.png')
+
+
+@pytest.mark.parametrize('with_views', [True, False])
+def test_duplicate_binaries_are_not_copied(tmp_path, quiet_logs, with_views):
+    # Two of the ten binaries of the generated export repeat the previous one, two no view uses
+    export = StudioExportGenerator(models=2, records=8, attachments=10).generate(str(tmp_path / 'export'))
+    if not with_views:
+        os.remove(export[0] + '/demo/ir_ui_view.xml')
+    module_path = clean_export(export, str(tmp_path / 'cleaned'))
+
+    binaries = {
+        file_name: Path(module_path + '/ir_attachment/' + file_name).read_bytes()
+        for file_name in os.listdir(module_path + '/ir_attachment') if file_name.endswith('.png')
+    }
+    files = re.findall(r'file="industry/ir_attachment/([^"]*)"', Path(module_path + '/demo/ir_attachment_post.xml').read_text(encoding='utf-8'))
+    assert set(files) == set(binaries)
+    assert len(set(binaries.values())) == len(binaries)
+    assert (len(files), len(binaries)) == ((8, 7) if with_views else (10, 8))
@@ -0,0 +1,314 @@
+import itertools
+import random
+import re
+
+from pathlib import Path
+
+import pytest
+
+import only_cleanup_script
+from benchmarks.studio_export import StudioExportGenerator
+from only_cleanup_script import CleanModule, ModuleTree, XmlIdIndex
+
+
+@pytest.fixture(scope='module')
+def clean_module():
+    return CleanModule('industry', 'services', 'db', '', '', None, reset_admin=False)
+
+
+def write_module(module_path, files):
+    for relative_path, content in files.items():
+        path = Path(module_path) / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+
+
+def record(xmlid, model, fields=''):
+    return f'  <record id="{xmlid}" model="{model}">\n    <field name="name">{xmlid}</field>\n{fields}  </record>\n'
+
+
+def xml_file(*records):
+    return "<?xml version='1.0' encoding='UTF-8'?>\n<odoo>\n" + ''.join(records) + "</odoo>\n"
+
+
+def demo_file(file_name, ref_name=(), record_ids=None):
+    # Entry of a demo file in the walk, its records named after the file by default
+    return {'file_name': file_name, 'ref_name': list(ref_name), 'record_ids': record_ids or [file_name[:-len('.xml')] + '_1']}
+
+
+def file_names(entries):
+    return [entry['file_name'] for entry in entries]
+
+
+def deferred_fields(order, references):
+    # Fields referring to a file loaded after theirs
+    return sum(references[file_name].get(target, 0) for position, file_name in enumerate(order) for target in order[position + 1:])
+
+
+def random_references(rnd, file_names, density=0.5):
+    return {
+        file_name: {target: rnd.randint(1, 5) for target in file_names if target != file_name and rnd.random() < density}
+        for file_name in file_names
+    }
+
+
+def test_order_keeps_the_walk_order_of_independent_files(clean_module):
+    entries = [demo_file('c.xml'), demo_file('a.xml'), demo_file('b.xml')]
+    assert file_names(clean_module.order_manifest_demo_files(entries, [])) == ['c.xml', 'a.xml', 'b.xml']
+
+
+def test_order_loads_the_defining_files_first(clean_module, log_output):
+    entries = [
+        demo_file('sale_order_line.xml', ['sale_order_1', 'product_template_1']),
+        demo_file('sale_order.xml', ['res_partner_1']),
+        demo_file('x_model_0.xml'),
+        demo_file('product_template.xml', ['unknown.record', 'product_template_1']),
+        demo_file('res_partner.xml'),
+    ]
+    assert file_names(clean_module.order_manifest_demo_files(entries, [])) == [
+        'x_model_0.xml', 'product_template.xml', 'res_partner.xml', 'sale_order.xml', 'sale_order_line.xml',
+    ]
+    assert "Circular references" not in log_output.getvalue()
+
+
+def test_order_is_the_first_topological_order_of_the_walk(clean_module):
+    # On random acyclic references, the file loaded next is the first ready one of the walk
+    rnd = random.Random(5)
+    for _ in range(200):
+        count = rnd.randint(1, 10)
+        ranks = rnd.sample(range(count), count)
+        entries = [demo_file(f"f{idx}.xml") for idx in range(count)]
+        for idx, entry in enumerate(entries):
+            entry['ref_name'] = [f"f{other}_1" for other in range(count) if ranks[other] < ranks[idx] and rnd.random() < 0.3]
+
+        expected = []
+        while len(expected) < count:
+            loaded = set(expected)
+            expected.append(next(
+                entry['file_name'] for entry in entries
+                if entry['file_name'] not in loaded and all(ref[:-len('_1')] + '.xml' in loaded for ref in entry['ref_name'])
+            ))
+        assert file_names(clean_module.order_manifest_demo_files(entries, [])) == expected
+
+
+def test_cycle_is_reported_and_broken_at_its_first_file(clean_module, log_output):
+    entries = [
+        demo_file('product_template.xml'),
+        demo_file('sale_order.xml', ['res_partner_1']),
+        demo_file('x_model_0.xml', ['sale_order_1']),
+        demo_file('res_partner.xml', ['sale_order_1']),
+    ]
+    assert file_names(clean_module.order_manifest_demo_files(entries, [])) == [
+        'product_template.xml', 'sale_order.xml', 'x_model_0.xml', 'res_partner.xml',
+    ]
+    assert re.findall(r"Circular references between demo files: .*", log_output.getvalue()) == [
+        "Circular references between demo files: sale_order.xml -> res_partner.xml -> sale_order.xml, loading sale_order.xml first",
+    ]
+
+
+def test_dependency_chains_break_the_cycle(clean_module, log_output):
+    entries = [demo_file('sale_order.xml', ['res_partner_1']), demo_file('res_partner.xml', ['sale_order_1'])]
+    chains = [{'type': 'demo', 'chain': ['res.partner', 'sale.order']}, {'type': 'data', 'chain': ['sale.order', 'res.partner']}]
+    # The references of res_partner.xml to sale_order.xml move to record_creation_post.xml, the data chain does not count
+    assert file_names(clean_module.order_manifest_demo_files(entries, chains)) == ['res_partner.xml', 'sale_order.xml']
+    assert "Circular references" not in log_output.getvalue()
+
+
+def test_cycle_breaking_order_of_a_known_cycle(clean_module):
+    # sale_order refers 5 times to res_partner, which refers once to sale_order and twice to
+    # product_template, which refers once to sale_order: loading sale_order last defers 2 fields
+    references = {
+        'sale_order': {'res_partner': 5},
+        'res_partner': {'sale_order': 1, 'product_template': 2},
+        'product_template': {'sale_order': 1},
+    }
+    order = clean_module.get_cycle_breaking_order(['sale_order', 'res_partner', 'product_template'], references)
+    assert order == ['product_template', 'res_partner', 'sale_order']
+    assert deferred_fields(order, references) == 2
+
+
+def test_cycle_breaking_order_defers_the_fewest_fields(clean_module):
+    # Against every permutation, the first one of the file order among the best ones
+    rnd = random.Random(11)
+    for _ in range(100):
+        file_names = [f"f{idx}" for idx in range(rnd.randint(1, 6))]
+        references = random_references(rnd, file_names)
+        expected = min(
+            itertools.permutations(file_names),
+            key=lambda order: (deferred_fields(order, references), [file_names.index(file_name) for file_name in order]),
+        )
+        assert clean_module.get_cycle_breaking_order(file_names, references) == list(expected), references
+
+
+def test_cycle_breaking_order_above_the_exact_limit(clean_module):
+    # The greedy order is a permutation of the files
+    rnd = random.Random(13)
+    file_names = [f"f{idx}" for idx in range(only_cleanup_script.CYCLE_ORDER_EXACT_LIMIT + 8)]
+    for _ in range(20):
+        references = random_references(rnd, file_names, density=rnd.random())
+        order = clean_module.get_cycle_breaking_order(file_names, references)
+        assert sorted(order) == sorted(file_names)
+
+    # and defers nothing when the files can load one after the other
+    references = {file_name: {file_names[idx + 1]: 1} if idx + 1 < len(file_names) else {} for idx, file_name in enumerate(file_names)}
+    order = clean_module.get_cycle_breaking_order(file_names, references)
+    assert order == file_names[::-1]
+    assert deferred_fields(order, references) == 0
+
+
+def test_cycle_breaking_greedy_order_on_small_cycles(clean_module, monkeypatch):
+    # Below the limit the greedy order is a permutation too, never better than the exact one
+    rnd = random.Random(17)
+    cycles = []
+    for _ in range(50):
+        file_names = [f"f{idx}" for idx in range(rnd.randint(1, 7))]
+        references = random_references(rnd, file_names)
+        cycles.append((file_names, references, clean_module.get_cycle_breaking_order(file_names, references)))
+
+    monkeypatch.setattr(only_cleanup_script, 'CYCLE_ORDER_EXACT_LIMIT', 0)
+    for file_names, references, exact_order in cycles:
+        order = clean_module.get_cycle_breaking_order(file_names, references)
+        assert sorted(order) == sorted(file_names)
+        assert deferred_fields(order, references) >= deferred_fields(exact_order, references)
+
+
+def reachable(node, successors):
+    seen = {node}
+    pending = [node]
+    while pending:
+        for child in successors.get(pending.pop(), ()):
+            if child not in seen:
+                seen.add(child)
+                pending.append(child)
+    return seen
+
+
+def test_strongly_connected_components_of_a_known_graph(clean_module):
+    successors = {'a': ['b'], 'b': ['c', 'd'], 'c': ['a'], 'd': ['e'], 'e': ['d', 'f'], 'g': ['g']}
+    components = clean_module.find_strongly_connected_components(['a', 'b', 'c', 'd', 'e', 'f', 'g'], successors)
+    assert [sorted(component) for component in components] == [['f'], ['d', 'e'], ['a', 'b', 'c'], ['g']]
+
+
+def test_strongly_connected_components_of_random_graphs(clean_module):
+    # Two nodes share a component when each reaches the other, a component comes after the ones it points to
+    rnd = random.Random(19)
+    for _ in range(200):
+        nodes = list(range(rnd.randint(1, 12)))
+        successors = {node: [child for child in nodes if rnd.random() < 0.15] for node in nodes}
+        components = clean_module.find_strongly_connected_components(nodes, successors)
+        assert sorted(node for component in components for node in component) == nodes
+
+        positions = {node: position for position, component in enumerate(components) for node in component}
+        reaches = {node: reachable(node, successors) for node in nodes}
+        for node in nodes:
+            for other in nodes:
+                assert (positions[node] == positions[other]) == (other in reaches[node] and node in reaches[other])
+                if other in successors[node]:
+                    assert positions[other] <= positions[node]
+
+
+def test_strongly_connected_components_of_a_long_cycle(clean_module):
+    nodes = list(range(20000))
+    successors = {node: [(node + 1) % len(nodes)] for node in nodes}
+    assert [len(component) for component in clean_module.find_strongly_connected_components(nodes, successors)] == [len(nodes)]
+
+
+@pytest.fixture
+def export(tmp_path):
+    # Demo files referring to each other through the studio_customization. prefix and renamed ids, and
+    # data files in a cycle against the order of their manifest
+    module_path = str(tmp_path / 'export')
+    write_module(module_path, {
+        '__manifest__.py': str({
+            'data': ['data/ir_model.xml', 'data/ir_model_fields.xml'],
+            'demo': ['demo/res_partner.xml', 'demo/sale_order.xml', 'demo/product_template.xml', 'demo/x_model_0.xml'],
+        }),
+        'data/ir_model_fields.xml': xml_file(record('field_1a2b', 'ir.model.fields', '    <field name="model_id" ref="studio_customization.model_x"/>\n')),
+        'data/ir_model.xml': xml_file(record('model_x', 'ir.model', '    <field name="field_id" eval="[(4, ref(\'field_1a2b\'))]"/>\n')),
+        'demo/res_partner.xml': xml_file(
+            record('res_partner_1', 'res.partner', '    <field name="x_studio_order_id" ref="studio_customization.sale_order_1"/>\n'),
+            record('res_partner_2', 'res.partner'),
+        ),
+        'demo/sale_order.xml': xml_file(
+            record('sale_order_1', 'sale.order', '    <field name="partner_id" ref="res_partner_1"/>\n'
+                                                 '    <field name="x_studio_partner_ids" eval="[(6, 0, [ref(\'base_module.res_partner_2\')])]"/>\n'),
+        ),
+        'demo/product_template.xml': xml_file(record('product_template_1', 'product.template')),
+        'demo/x_model_0.xml': xml_file(record('x_model_0_1', 'x_model_0')),
+        'warnings.txt': "Found 2 circular dependencies\n(demo) sale.order -> res.partner\n(demo) product.template -> x_model_0\n",
+    })
+    return module_path
+
+
+def test_find_dependency_chains(clean_module, export, log_output):
+    chains = clean_module.find_dependency_chains(export, XmlIdIndex(export), {'field_1a2b': 'x_model_x_name_field'})
+    assert chains == [
+        # The data files keep the order of the manifest
+        {'type': 'data', 'chain': ['ir_model', 'ir_model_fields']},
+        # The prefixed references of res_partner.xml are in the cycle, already broken for warnings.txt
+        {'type': 'demo', 'chain': ['res_partner', 'sale_order']},
+        # The cycle of warnings.txt the records do not show
+        {'type': 'demo', 'chain': ['product_template', 'x_model_0']},
+    ]
+    assert "Circular dependency from warnings.txt: (demo) product_template.xml -> x_model_0.xml" in log_output.getvalue()
+
+
+def test_find_dependency_chains_without_warnings(clean_module, export):
+    Path(export + '/warnings.txt').write_text("No circular dependency\n(demo) product.template -> x_model_0\n", encoding='utf-8')
+    assert clean_module.get_warning_dependency_chains(export) == []
+    chains = clean_module.find_dependency_chains(export, XmlIdIndex(export), {})
+    assert [chain['chain'] for chain in chains] == [['ir_model', 'ir_model_fields'], ['res_partner', 'sale_order']]
+
+
+def test_generated_warnings_match_the_detected_cycles(clean_module, tmp_path, log_output):
+    # The benchmark export reports the cycles its records have, none comes from warnings.txt alone
+    module_path, _ = StudioExportGenerator(models=5, records=6, attachments=2).generate(str(tmp_path / 'export'))
+    xmlid_index = XmlIdIndex(module_path)
+    chains = clean_module.find_dependency_chains(module_path, xmlid_index, clean_module.prepare_old_to_new_id_map(xmlid_index))
+    warning_chains = clean_module.get_warning_dependency_chains(module_path)
+
+    assert len(warning_chains) == 3
+    assert {(chain['type'], frozenset(chain['chain'])) for chain in chains} == {
+        (chain['type'], frozenset(file.replace('.', '_') for file in chain['chain'])) for chain in warning_chains
+    }
+    assert "from warnings.txt" not in log_output.getvalue()
+
+
+def test_process_dependencies(clean_module, tmp_path):
+    # The cleaned module, without the prefixes
+    module_path = str(tmp_path / 'industry')
+    write_module(module_path, {
+        'demo/res_partner.xml': xml_file(
+            record('res_partner_1', 'res.partner', '    <field name="x_order_id" ref="sale_order_1"/>\n'
+                                                   '    <field name="x_order_ids" eval="[(6, 0, [ref(\'sale_order_1\')])]"/>\n'
+                                                   '    <field name="parent_id" ref="res_partner_2"/>\n'),
+            record('res_partner_2', 'res.partner', '    <field name="x_template_id" ref="product_template_1"/>\n'),
+        ),
+        'demo/sale_order.xml': xml_file(record('sale_order_1', 'sale.order', '    <field name="partner_id" ref="res_partner_1"/>\n')),
+        'demo/product_template.xml': xml_file(record('product_template_1', 'product.template')),
+    })
+    chains = [{'type': 'demo', 'chain': ['res_partner', 'sale_order']}, {'type': 'demo', 'chain': ['missing', 'sale_order']}]
+
+    clean_module.module_tree = ModuleTree()
+    try:
+        dependencies_collection = clean_module.process_dependencies(module_path, chains, [])
+        assert clean_module.map_dependencies_files(module_path, dependencies_collection) == (False, True)
+        clean_module.module_tree.flush()
+    finally:
+        clean_module.module_tree = None
+
+    # Only the fields of res_partner.xml referring to sale_order.xml move
+    assert dependencies_collection == [
+        {'dir': 'demo', 'id': 'res_partner_1', 'model': 'res.partner', 'ref': 'sale_order_1', 'eval': None, 'field_name': 'x_order_id'},
+        {'dir': 'demo', 'id': 'res_partner_1', 'model': 'res.partner', 'ref': None, 'eval': "[(6, 0, [ref('sale_order_1')])]", 'field_name': 'x_order_ids'},
+    ]
+    post_content = Path(module_path + '/demo/record_creation_post.xml').read_text(encoding='utf-8')
+    assert re.findall(r'<record id="([^"]*)" model="([^"]*)">\s*(<field [^>]*/>)', post_content) == [
+        ('res_partner_1', 'res.partner', '<field name="x_order_id" ref="sale_order_1"/>'),
+        ('res_partner_1', 'res.partner', '<field name="x_order_ids" eval="[(6, 0, [ref(\'sale_order_1\')])]"/>'),
+    ]
+    partner_content = Path(module_path + '/demo/res_partner.xml').read_text(encoding='utf-8')
+    assert 'sale_order_1' not in partner_content
+    assert 'ref="res_partner_2"' in partner_content and 'ref="product_template_1"' in partner_content
+    assert 'ref="res_partner_1"' in Path(module_path + '/demo/sale_order.xml').read_text(encoding='utf-8')
+    assert not Path(module_path + '/data/record_creation_post.xml').exists()
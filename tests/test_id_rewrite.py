@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from only_cleanup_script import CleanModule
+
+OLD_TO_NEW_ID_MAP = {
+    'field_1': 'x_model_0_x_name_field',
+    'field_10': 'x_model_0_x_total_field',
+    'model_x_1': 'model_x_model_1',
+    'a.b': 'a_b',
+}
+
+
+@pytest.fixture
+def clean_module():
+    return CleanModule('industry', 'services', 'db', '', '', None, reset_admin=False)
+
+
+@pytest.mark.parametrize('content, expected', [
+    # An id prefix of another one
+    ('<field name="field_id" ref="field_10"/>', '<field name="field_id" ref="x_model_0_x_total_field"/>'),
+    ('<field name="field_id" ref="field_1"/>', '<field name="field_id" ref="x_model_0_x_name_field"/>'),
+    ('<field name="field_id" ref="field_100"/>', '<field name="field_id" ref="field_100"/>'),
+    ('<record id="field_1" model="ir.model.fields"/>', '<record id="x_model_0_x_name_field" model="ir.model.fields"/>'),
+    ('<record id="x_field_1" model="x_model_1" model_id="model_x_1"/>', '<record id="x_field_1" model="x_model_1" model_id="model_x_model_1"/>'),
+    # The regex metacharacters of an id are literal
+    ('<field name="x" ref="a.b"/><field name="y" ref="aXb"/>', '<field name="x" ref="a_b"/><field name="y" ref="aXb"/>'),
+    # A ref() call in an eval is not an attribute
+    ('<field name="field_ids" eval="[(4, ref(\'field_1\'))]"/>', '<field name="field_ids" eval="[(4, ref(\'field_1\'))]"/>'),
+    ('<field name="field_id" eval="ref(&quot;field_1&quot;)"/>', '<field name="field_id" eval="ref(&quot;field_1&quot;)"/>'),
+    # Ids out of the map
+    ('<field name="partner_id" ref="res_partner_1"/>', '<field name="partner_id" ref="res_partner_1"/>'),
+    ('<field name="name">field_1</field>', '<field name="name">field_1</field>'),
+])
+def test_replace_old_id_to_new_id(clean_module, content, expected):
+    assert clean_module.replace_old_id_to_new_id(content, OLD_TO_NEW_ID_MAP) == expected
+
+
+def test_pattern_is_rebuilt_for_another_map(clean_module):
+    content = '<field name="field_id" ref="field_1"/>'
+    assert clean_module.replace_old_id_to_new_id(content, OLD_TO_NEW_ID_MAP) == '<field name="field_id" ref="x_model_0_x_name_field"/>'
+    assert clean_module.replace_old_id_to_new_id(content, {'field_1': 'other'}) == '<field name="field_id" ref="other"/>'
+    assert clean_module.replace_old_id_to_new_id(content, {}) == content
+
+
+def test_matches_replacement_per_id(clean_module):
+    # The per id str.replace of the loop the regex replaced, on maps whose new ids are no old ids
+    rnd = random.Random(3)
+    ids = ['field_1', 'field_10', 'field_11', 'field_2', 'model_x', 'model_x_1', 'x.y']
+    for _ in range(200):
+        old_new_id_map = {old_id: 'new_' + old_id.replace('.', '_') for old_id in rnd.sample(ids, rnd.randint(1, len(ids)))}
+        content = ''.join(
+            f'<field name="f" {rnd.choice(["ref", "id", "model_id", "eval"])}="{rnd.choice(ids + ["field_3"])}"/>' for _ in range(5)
+        )
+        expected = content
+        for old_id, new_id in old_new_id_map.items():
+            expected = expected.replace(f'ref="{old_id}"', f'ref="{new_id}"').replace(f'id="{old_id}"', f'id="{new_id}"')
+        assert clean_module.replace_old_id_to_new_id(content, old_new_id_map) == expected, content
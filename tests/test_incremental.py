@@ -0,0 +1,78 @@
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+import only_cleanup_script
+from benchmarks.studio_export import StudioExportGenerator
+from conftest import clean_export, read_module
+
+pytestmark = pytest.mark.usefixtures('quiet_logs')
+
+
+@pytest.fixture
+def export(tmp_path):
+    # Each test edits its own export
+    return StudioExportGenerator(models=4, records=20, attachments=10).generate(str(tmp_path / 'export'))
+
+
+def edit_content(module_path):
+    # A partner renamed, the file is rewritten with another size
+    path = Path(module_path + '/demo/res_partner.xml')
+    path.write_text(path.read_text(encoding='utf-8').replace('Partner 3<', 'Partner three<'), encoding='utf-8')
+
+
+def add_file(module_path):
+    Path(module_path + '/demo/x_extra.xml').write_text(
+        "<?xml version='1.0' encoding='UTF-8'?>\n<odoo>\n  <record id=\"x_extra_0\" model=\"x_model_0\">\n"
+        "    <field name=\"x_name\">Extra</field>\n    <field name=\"x_studio_partner_id\" ref=\"res_partner_0\"/>\n"
+        "  </record>\n</odoo>\n", encoding='utf-8'
+    )
+
+
+def delete_file(module_path):
+    os.remove(module_path + '/demo/product_template.xml')
+
+
+def edit_manifest(module_path):
+    path = Path(module_path + '/__manifest__.py')
+    path.write_text(path.read_text(encoding='utf-8').replace("'depends': [", "'depends': ['crm', "), encoding='utf-8')
+
+
+def remove_binary(module_path):
+    # A binary used by a view
+    os.remove(module_path + '/ir_attachment/1-image_0.png')
+
+
+@pytest.mark.parametrize('edit', [edit_content, add_file, delete_file, edit_manifest, remove_binary])
+def test_incremental_run_matches_full_build(export, tmp_path, log_output, edit):
+    incremental_path = str(tmp_path / 'incremental')
+    clean_export(export, incremental_path, incremental=True)
+    edit(export[0])
+
+    incremental_module = read_module(clean_export(export, incremental_path, incremental=True))
+    assert re.search(r"Build journal: \d+ files changed", log_output.getvalue())
+    full_module = read_module(clean_export(export, str(tmp_path / 'full')))
+
+    assert sorted(incremental_module) == sorted(full_module)
+    for path, content in full_module.items():
+        assert incremental_module[path] == content, path
+
+
+def test_unchanged_export_is_not_rebuilt(export, tmp_path, log_output):
+    incremental_path = str(tmp_path / 'incremental')
+    clean_export(export, incremental_path, incremental=True)
+    clean_export(export, incremental_path, incremental=True)
+    assert "nothing changed since the last run" in log_output.getvalue()
+
+
+def test_cleanup_version_forces_a_full_rebuild(export, tmp_path, monkeypatch, log_output):
+    incremental_path = str(tmp_path / 'incremental')
+    clean_export(export, incremental_path, incremental=True)
+
+    monkeypatch.setattr(only_cleanup_script, 'CLEANUP_VERSION', only_cleanup_script.CLEANUP_VERSION + 1)
+    clean_export(export, incremental_path, incremental=True)
+    logs = log_output.getvalue()
+    assert "rules changed, rebuilding everything" in logs
+    assert re.search(r"full rebuild, deleting the cleaned module .*incremental/industry", logs)
@@ -0,0 +1,311 @@
+import gzip
+import os
+import subprocess
+import threading
+
+import pytest
+
+import only_cleanup_script
+from only_cleanup_script import CleanModule, FieldMetadataCache, PostgresMetadataProvider, get_base_computed_field_depends
+
+# ir.model.fields rows of the fake server, with the dependencies fields_get reports for each field:
+# (name, store, readonly, depends, related, state, fields_get depends)
+FIELDS = {
+    'res.partner': [
+        ('name', True, False, False, False, 'base', []),
+        ('display_name', False, True, False, False, 'base', ['name']),
+        ('context_today', False, True, False, False, 'base', []),
+        ('partner_share', False, True, False, False, 'base', ['user_ids']),
+        ('commercial_company_name', False, True, False, 'commercial_partner_id.name', 'base', ['commercial_partner_id.name']),
+        ('x_studio_total', False, True, 'x_studio_price,x_studio_quantity', False, 'manual', ['x_studio_price', 'x_studio_quantity']),
+        ('x_studio_note', False, False, 'x_studio_price', False, 'manual', ['x_studio_price']),
+    ],
+    'x_model_0': [
+        ('create_date', True, True, False, False, 'base', []),
+        ('display_name', False, True, False, False, 'base', ['x_name']),
+        ('x_name', True, False, False, False, 'manual', []),
+        ('x_studio_total', False, True, 'x_studio_price', False, 'manual', ['x_studio_price']),
+        ('x_studio_partner_name', False, True, False, 'x_studio_partner_id.name', 'manual', ['x_studio_partner_id.name']),
+    ],
+}
+
+
+class FakeRpcClient:
+    # Answers the ir.model.fields search_read and fields_get calls of the cleanup from FIELDS
+
+    def __init__(self):
+        self.fields_get_models = []
+
+    def get_server_version(self):
+        return '17.0'
+
+    def execute_kw(self, model_name, method, args, kwargs=None):
+        if model_name == 'ir.module.module':
+            return [{'name': 'base', 'latest_version': '17.0.1.3'}, {'name': 'web_studio', 'latest_version': '17.0.1.0'}]
+        if method == 'search_read':
+            model_names = args[0][0][2]
+            return [
+                {'model': model, 'name': name, 'store': store, 'readonly': readonly, 'depends': depends, 'related': related, 'state': state}
+                for model in model_names for name, store, readonly, depends, related, state, _ in FIELDS.get(model, [])
+            ]
+        self.fields_get_models.append(model_name)
+        return {
+            name: {'store': store, 'readonly': readonly, 'depends': fields_get_depends}
+            for name, store, readonly, _, _, _, fields_get_depends in FIELDS[model_name]
+        }
+
+
+class BlockingRpcClient(FakeRpcClient):
+    # fields_get answers once `release` is set, and fails for the models of `failing_models`
+
+    def __init__(self, failing_models=()):
+        super().__init__()
+        self.release = threading.Event()
+        self.failing_models = failing_models
+
+    def execute_kw(self, model_name, method, args, kwargs=None):
+        if method == 'fields_get':
+            assert self.release.wait(10)
+            if model_name in self.failing_models:
+                raise Exception(f"fields_get failed for {model_name}")
+        return super().execute_kw(model_name, method, args, kwargs)
+
+
+def get_ir_model_fields_rows(query):
+    # COPY rows of ir_model_fields as psql prints them: 't'/'f' booleans, empty NULLs
+    if 'ir_module_module' in query:
+        return [['web_studio', 'installed']]
+    return [
+        [model, name, 't' if store else 'f', 't' if readonly else 'f', depends or '', related or '', state]
+        for model, fields in FIELDS.items() for name, store, readonly, depends, related, state, _ in fields
+    ]
+
+
+@pytest.fixture
+def clean_module():
+    clean_module = CleanModule('demo_ind', 'services', 'db', '', '', 8069, reset_admin=False)
+    clean_module.rpc_client = FakeRpcClient()
+    return clean_module
+
+
+@pytest.fixture
+def postgres_clean_module(monkeypatch):
+    monkeypatch.setattr(PostgresMetadataProvider, 'copy_rows', lambda self, query: get_ir_model_fields_rows(query))
+    return CleanModule('demo_ind', 'services', 'db', '', '', None, metadata_source='postgres', reset_admin=False)
+
+
+def test_lazy_removable_fields(clean_module):
+    removable_fields_dict = {}
+    assert clean_module.get_removable_field_names(removable_fields_dict, 'res.partner') == {
+        'display_name', 'commercial_company_name', 'partner_share', 'x_studio_total',
+    }
+    assert clean_module.get_removable_field_names(removable_fields_dict, 'x_model_0') == {
+        'display_name', 'x_studio_total', 'x_studio_partner_name',
+    }
+
+
+def test_bulk_removable_fields_match_lazy(clean_module):
+    lazy_removable_fields_dict = {}
+    for model_name in FIELDS:
+        clean_module.get_removable_field_names(lazy_removable_fields_dict, model_name)
+    clean_module.rpc_client.fields_get_models.clear()
+
+    # The dependencies of display_name are known, those of partner_share only to fields_get
+    bulk_removable_fields_dict = {}
+    clean_module.prefetch_removable_fields(bulk_removable_fields_dict, sorted(FIELDS))
+    assert set(bulk_removable_fields_dict) == {'x_model_0'}
+    assert clean_module.rpc_client.fields_get_models == []
+
+    for model_name in FIELDS:
+        clean_module.get_removable_field_names(bulk_removable_fields_dict, model_name)
+    assert bulk_removable_fields_dict == lazy_removable_fields_dict
+    assert clean_module.rpc_client.fields_get_models == ['res.partner']
+
+
+def test_bulk_resolves_the_models_with_known_base_fields(clean_module, monkeypatch, log_output):
+    # Without partner_share, every computed base field of the models has known dependencies
+    monkeypatch.setitem(FIELDS, 'res.partner', [field for field in FIELDS['res.partner'] if field[0] != 'partner_share'])
+    bulk_removable_fields_dict = {}
+    clean_module.prefetch_removable_fields(bulk_removable_fields_dict, sorted(FIELDS) + ['unknown.model'])
+    assert bulk_removable_fields_dict == {
+        'res.partner': {'display_name', 'commercial_company_name', 'x_studio_total'},
+        'x_model_0': {'display_name', 'x_studio_total', 'x_studio_partner_name'},
+    }
+    assert clean_module.rpc_client.fields_get_models == []
+    assert "Fetched the fields of 2/3 models from ir.model.fields, 0 models" in log_output.getvalue()
+
+
+@pytest.mark.parametrize('field_name, model_field_names, depends', [
+    ('display_name', {'name', 'x_name'}, ['name']),
+    ('display_name', {'x_name'}, ['x_name']),
+    ('display_name', {'code'}, None),
+    ('__last_update', {'create_date', 'write_date'}, ['create_date', 'write_date']),
+    ('__last_update', {'name'}, None),
+    ('context_today', set(), []),
+    ('partner_share', {'partner_share', 'user_ids'}, None),
+])
+def test_base_computed_field_depends(field_name, model_field_names, depends):
+    assert get_base_computed_field_depends(field_name, model_field_names) == depends
+
+
+def test_postgres_removable_fields(postgres_clean_module):
+    # Same fields as with fields_get, but the base fields computed by a method: their dependencies are not in the database
+    removable_fields_dict = {}
+    assert postgres_clean_module.get_removable_field_names(removable_fields_dict, 'res.partner') == {
+        'commercial_company_name', 'x_studio_total',
+    }
+    assert postgres_clean_module.get_removable_field_names(removable_fields_dict, 'x_model_0') == {'x_studio_total', 'x_studio_partner_name'}
+
+
+def test_postgres_rows_with_line_breaks(monkeypatch):
+    # psql quotes the values with line breaks, a row spans several lines
+    outputs = {
+        'ir_model_fields': 'x_model_0,x_studio_total,f,t,"x_studio_price,\nx_studio_quantity",,manual\n'
+                           'x_model_0,x_studio_note,f,f,,,manual\n'
+                           'x_model_0,x_studio_label,f,t,,"x_studio_partner_id\n.name",manual\n',
+        'ir_module_module': 'web_studio,installed\n"multi\nline",uninstalled\n',
+    }
+
+    def run(args, **kwargs):
+        table = next(table for table in outputs if table in args[-1])
+        return subprocess.CompletedProcess(args, 0, stdout=outputs[table], stderr='')
+
+    monkeypatch.setattr(only_cleanup_script.subprocess, 'run', run)
+    provider = PostgresMetadataProvider('db')
+    assert provider.copy_rows("SELECT name, state FROM ir_module_module") == [['web_studio', 'installed'], ['multi\nline', 'uninstalled']]
+    assert provider.get_fields_info('x_model_0') == {
+        'x_studio_total': {'store': False, 'readonly': True, 'depends': ['x_studio_price', '\nx_studio_quantity']},
+        'x_studio_note': {'store': False, 'readonly': False, 'depends': []},
+        'x_studio_label': {'store': False, 'readonly': True, 'depends': ['x_studio_partner_id\n.name']},
+    }
+    assert provider.get_module_state('web_studio') == 'installed'
+
+
+def test_metadata_fingerprint_depends_on_the_mode(clean_module, postgres_clean_module):
+    fingerprints = {postgres_clean_module.get_metadata_fingerprint()}
+    for metadata_fetch in ['lazy', 'bulk', 'prefetch']:
+        clean_module.metadata_fetch = metadata_fetch
+        fingerprints.add(clean_module.get_metadata_fingerprint())
+    assert len(fingerprints) == 4
+
+
+REMOVABLE_FIELDS = {'res.partner': frozenset(['display_name', 'x_studio_total']), 'x_model_0': frozenset()}
+
+
+def test_metadata_cache_round_trip(tmp_path):
+    cache = FieldMetadataCache(tmp_path, 'db', '17.0', 'modules')
+    assert cache.load() == {}
+    cache.save(REMOVABLE_FIELDS)
+    assert FieldMetadataCache(tmp_path, 'db', '17.0', 'modules').load() == REMOVABLE_FIELDS
+    assert FieldMetadataCache(tmp_path, 'other_db', '17.0', 'modules').load() == {}
+
+
+@pytest.mark.parametrize('server_version, modules_fingerprint', [('17.0', 'other modules'), ('18.0', 'modules')])
+def test_metadata_cache_is_invalidated(tmp_path, server_version, modules_fingerprint):
+    FieldMetadataCache(tmp_path, 'db', '17.0', 'modules').save(REMOVABLE_FIELDS)
+    FieldMetadataCache(tmp_path, 'other_db', '17.0', 'modules').save(REMOVABLE_FIELDS)
+
+    # The entry of the database for the old server or modules is removed, the one of another database is kept
+    assert FieldMetadataCache(tmp_path, 'db', server_version, modules_fingerprint).load() == {}
+    assert len(list(tmp_path.glob('*.json.gz'))) == 1
+    assert FieldMetadataCache(tmp_path, 'db', '17.0', 'modules').load() == {}
+    assert FieldMetadataCache(tmp_path, 'other_db', '17.0', 'modules').load() == REMOVABLE_FIELDS
+
+
+@pytest.mark.parametrize('content', [b'not gzip', gzip.compress(b'{"res.partner": ["display_name"'), gzip.compress(b'{"res.partner": [')[:-6]])
+def test_metadata_cache_ignores_a_corrupt_entry(tmp_path, log_output, content):
+    cache = FieldMetadataCache(tmp_path, 'db', '17.0', 'modules')
+    cache.path.write_bytes(content)
+    assert cache.load() == {}
+    assert "Ignoring unreadable metadata cache" in log_output.getvalue()
+
+    # The next save replaces it
+    cache.save(REMOVABLE_FIELDS)
+    assert cache.load() == REMOVABLE_FIELDS
+
+
+def test_metadata_cache_evicts_the_least_recently_used_entries(tmp_path):
+    caches = [FieldMetadataCache(tmp_path, f"db_{index}", '17.0', 'modules') for index in range(4)]
+    for mtime, cache in zip([100, 200, 300], caches):
+        cache.save(REMOVABLE_FIELDS)
+        os.utime(cache.path, (mtime, mtime))
+
+    # db_0 is the oldest entry but the latest used, the entries have the same size and three fit
+    assert caches[0].load() == REMOVABLE_FIELDS
+    caches[3].max_bytes = 3 * caches[0].path.stat().st_size
+    caches[3].save(REMOVABLE_FIELDS)
+    assert [cache.path.exists() for cache in caches] == [True, False, True, True]
+
+    # An entry above the cap on its own is kept
+    caches[3].max_bytes = 1
+    caches[3].save(REMOVABLE_FIELDS)
+    assert [cache.path.exists() for cache in caches] == [False, False, False, True]
+
+
+@pytest.fixture
+def export_path(tmp_path):
+    # Records of res.partner and x_model_0, the models the prefetch starts with
+    (tmp_path / 'demo').mkdir()
+    (tmp_path / 'demo/records.xml').write_text(
+        '<odoo>\n  <record id="res_partner_1" model="res.partner"/>\n  <record id="x_model_0_1" model="x_model_0"/>\n'
+        '  <record id="res_partner_2" model="res.partner"/>\n</odoo>\n', encoding='utf-8'
+    )
+    return str(tmp_path)
+
+
+def test_prefetch_waits_for_a_pending_model(clean_module, export_path):
+    clean_module.rpc_client = BlockingRpcClient()
+    executor = clean_module.start_metadata_prefetch({}, export_path)
+    try:
+        assert sorted(clean_module.pending_metadata) == ['res.partner', 'x_model_0']
+        assert not clean_module.pending_metadata['res.partner'].done()
+
+        threading.Timer(0.05, clean_module.rpc_client.release.set).start()
+        removable_fields_dict = {}
+        assert clean_module.get_removable_field_names(removable_fields_dict, 'res.partner') == {
+            'display_name', 'commercial_company_name', 'partner_share', 'x_studio_total',
+        }
+        assert clean_module.metadata_wait_stats['waits'] == 1
+        assert clean_module.metadata_wait_stats['wait_time'] > 0
+
+        # An answer already arrived is not waited for
+        clean_module.pending_metadata['x_model_0'].result()
+        assert clean_module.get_removable_field_names(removable_fields_dict, 'x_model_0') == {
+            'display_name', 'x_studio_total', 'x_studio_partner_name',
+        }
+        assert clean_module.metadata_wait_stats['waits'] == 1
+        assert clean_module.pending_metadata == {}
+    finally:
+        executor.shutdown()
+    assert sorted(clean_module.rpc_client.fields_get_models) == ['res.partner', 'x_model_0']
+
+
+def test_prefetch_error_reaches_the_caller(clean_module, export_path):
+    clean_module.rpc_client = BlockingRpcClient(failing_models=['x_model_0'])
+    clean_module.rpc_client.release.set()
+    executor = clean_module.start_metadata_prefetch({}, export_path)
+    try:
+        removable_fields_dict = {}
+        with pytest.raises(Exception, match="fields_get failed for x_model_0"):
+            clean_module.get_removable_field_names(removable_fields_dict, 'x_model_0')
+        assert 'x_model_0' not in removable_fields_dict
+        assert clean_module.get_removable_field_names(removable_fields_dict, 'res.partner')
+    finally:
+        executor.shutdown()
+
+
+def test_model_missing_from_the_prefetch_is_fetched_directly(clean_module, export_path, monkeypatch):
+    # x_model_0 is known already, sale.order has no record in the export
+    monkeypatch.setitem(FIELDS, 'sale.order', [('amount_total', False, True, False, False, 'base', ['order_line'])])
+    clean_module.rpc_client = BlockingRpcClient()
+    clean_module.rpc_client.release.set()
+    removable_fields_dict = {'x_model_0': frozenset(['x_studio_total'])}
+    executor = clean_module.start_metadata_prefetch(removable_fields_dict, export_path)
+    try:
+        assert list(clean_module.pending_metadata) == ['res.partner']
+        assert clean_module.get_removable_field_names(removable_fields_dict, 'sale.order') == {'amount_total'}
+        assert clean_module.get_removable_field_names(removable_fields_dict, 'x_model_0') == {'x_studio_total'}
+    finally:
+        executor.shutdown()
+    assert sorted(clean_module.rpc_client.fields_get_models) == ['res.partner', 'sale.order']
+    assert list(clean_module.pending_metadata) == ['res.partner']
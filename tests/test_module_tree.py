@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+
+from lxml import etree
+
+from only_cleanup_script import ModuleTree
+
+
+def write_files(directory, files):
+    for relative_path, content in files.items():
+        path = Path(directory) / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+
+
+def test_flush_writes_only_changed_files(tmp_path):
+    write_files(tmp_path, {'data/a.xml': '<odoo><record id="a"/></odoo>', 'data/b.xml': '<odoo/>'})
+    os.utime(tmp_path / 'data/b.xml', (0, 0))
+    module_tree = ModuleTree()
+
+    module_tree.get_etree_content(tmp_path / 'data/a.xml').set('noupdate', '1')
+    module_tree.write_etree_content(tmp_path / 'data/a.xml', module_tree.get_etree_content(tmp_path / 'data/a.xml'))
+    assert module_tree.read_text(tmp_path / 'data/b.xml') == '<odoo/>'
+
+    # Nothing is written before the flush
+    assert (tmp_path / 'data/a.xml').read_text(encoding='utf-8') == '<odoo><record id="a"/></odoo>'
+    stats = module_tree.flush()
+    assert (stats['read'], stats['parsed'], stats['written'], stats['deleted']) == (2, 1, 1, 0)
+    assert (tmp_path / 'data/a.xml').read_text(encoding='utf-8') == (
+        "<?xml version='1.0' encoding='UTF-8'?>\n<odoo noupdate=\"1\">\n  <record id=\"a\"/>\n</odoo>\n"
+    )
+    assert os.stat(tmp_path / 'data/b.xml').st_mtime == 0
+
+
+def test_last_write_wins(tmp_path):
+    module_tree = ModuleTree()
+    path = tmp_path / 'demo/new.xml'
+    assert not module_tree.exists(path)
+
+    module_tree.write_text(path, '<odoo/>')
+    root = module_tree.get_etree_content(path)
+    root.append(etree.Element('record', id='b'))
+    module_tree.write_etree_content(path, root)
+    assert module_tree.read_text(path) == "<?xml version='1.0' encoding='UTF-8'?>\n<odoo>\n  <record id=\"b\"/>\n</odoo>\n"
+
+    module_tree.write_text(path, '<odoo noupdate="1"/>')
+    module_tree.flush()
+    assert path.read_text(encoding='utf-8') == '<odoo noupdate="1"/>'
+
+
+def test_remove_and_rename(tmp_path):
+    write_files(tmp_path, {'demo/ir_ui_view.xml': '<odoo/>', 'demo/unused.png': 'png', 'demo/kept.png': 'png'})
+    module_tree = ModuleTree()
+
+    module_tree.rename(tmp_path / 'demo/ir_ui_view.xml', tmp_path / 'demo/website_view.xml')
+    module_tree.remove(tmp_path / 'demo/unused.png')
+    module_tree.remove(tmp_path / 'demo/missing.png')
+    assert not module_tree.exists(tmp_path / 'demo/ir_ui_view.xml')
+    assert not module_tree.exists(tmp_path / 'demo/unused.png')
+    assert module_tree.exists(tmp_path / 'demo/website_view.xml')
+
+    stats = module_tree.flush()
+    assert (stats['written'], stats['deleted']) == (1, 2)
+    assert sorted(os.listdir(tmp_path / 'demo')) == ['kept.png', 'website_view.xml']
+    assert (tmp_path / 'demo/website_view.xml').read_text(encoding='utf-8') == '<odoo/>'
+
+    # The flushed files are read from disk again
+    assert module_tree.read_text(tmp_path / 'demo/website_view.xml') == '<odoo/>'
+
+
+def test_held_paths(tmp_path):
+    module_tree = ModuleTree([str(tmp_path) + '/demo/../demo/ir_ui_view.xml'])
+    assert module_tree.holds(tmp_path / 'demo/ir_ui_view.xml')
+    assert not module_tree.holds(tmp_path / 'demo/website_view.xml')
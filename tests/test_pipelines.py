@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.studio_export import StudioExportGenerator
+from conftest import clean_export, read_module
+
+pytestmark = pytest.mark.usefixtures('quiet_logs')
+
+
+@pytest.fixture(scope='module')
+def export(tmp_path_factory):
+    # Small generated export with its metadata snapshot, shared by the runs of the module
+    return StudioExportGenerator(models=4, records=20, attachments=10).generate(str(tmp_path_factory.mktemp('export')))
+
+
+def test_tree_pipeline_matches_string_pipeline(export, tmp_path):
+    string_module = read_module(clean_export(export, str(tmp_path / 'string')))
+    tree_module = read_module(clean_export(export, str(tmp_path / 'tree'), pipeline='tree'))
+
+    assert sorted(tree_module) == sorted(string_module)
+    for path, content in string_module.items():
+        assert tree_module[path] == content, path
+
+
+@pytest.mark.parametrize('pipeline', ['string', 'stream'])
+def test_jobs_match_serial_run(export, tmp_path, pipeline):
+    serial_module = read_module(clean_export(export, str(tmp_path / 'serial'), pipeline=pipeline))
+    parallel_module = read_module(clean_export(export, str(tmp_path / 'parallel'), pipeline=pipeline, jobs=3))
+
+    assert sorted(parallel_module) == sorted(serial_module)
+    for path, content in serial_module.items():
+        assert parallel_module[path] == content, path
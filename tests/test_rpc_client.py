@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from only_cleanup_script import OdooJsonRpcClient
+
+
+class FakeResponse:
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    # Odoo server answering every object call with `error_name` until the next login
+
+    def __init__(self, error_name=None):
+        self.error_name = error_name
+        self.expired = bool(error_name)
+        self.logins = 0
+        self.request_ids = []
+        self.lock = threading.Lock()
+
+    def post(self, url, json, timeout):
+        with self.lock:
+            self.request_ids.append(json['id'])
+        if url.endswith('/web/session/authenticate'):
+            # Slow enough for the other threads to find the session expired meanwhile
+            time.sleep(0.05)
+            with self.lock:
+                self.logins += 1
+                if self.error_name == 'odoo.http.SessionExpiredException':
+                    self.expired = False
+            return FakeResponse({'result': {'uid': 2}})
+        if self.expired:
+            return FakeResponse({'error': {'message': 'Odoo Server Error', 'data': {'name': self.error_name, 'message': 'Denied'}}})
+        return FakeResponse({'result': [{'id': 1}]})
+
+
+def get_client(session):
+    client = OdooJsonRpcClient('http://localhost:8069', 'db', 'admin', 'admin', retries=2)
+    client.session = session
+    return client
+
+
+def test_access_denied_is_not_retried():
+    client = get_client(FakeSession('odoo.exceptions.AccessDenied'))
+    with pytest.raises(Exception, match='Denied'):
+        client.execute_kw('res.partner', 'search_read', [[]])
+    assert client.session.logins == 1
+
+
+def test_expired_session_logs_in_once_for_all_threads():
+    client = get_client(FakeSession('odoo.http.SessionExpiredException'))
+    client.uid = 2
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.execute_kw('res.partner', 'search_read', [[]]))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [[{'id': 1}]] * 8
+    assert client.session.logins == 1
+    assert client.get_stats()['logins'] == 1
+
+
+def test_request_ids_are_unique_across_threads():
+    client = get_client(FakeSession())
+    threads = [
+        threading.Thread(target=lambda: [client.execute_kw('res.partner', 'search_read', [[]]) for _ in range(50)])
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    request_ids = client.session.request_ids
+    assert len(request_ids) == len(set(request_ids)) == 8 * 50 + 1
@@ -0,0 +1,174 @@
+import gc
+import logging
+import math
+import statistics
+import time
+import tracemalloc
+
+import pytest
+from lxml import etree
+
+from only_cleanup_script import CleanModule, handler
+
+# Input sizes of each stage, a 16x range so that the fixed costs and the caches filling up weigh little in the fit
+SIZES = [500, 1000, 2000, 4000, 8000]
+# Timed calls per size after a warm-up call, the median one counts: a few slow calls on a shared runner do not move it
+REPEAT = 7
+# Highest growth exponents accepted, 1 is linear and 2 quadratic. Linear stages fit between 1.0 and 1.1
+MAX_TIME_EXPONENT = 1.4
+MAX_MEMORY_EXPONENT = 1.2
+
+MODELS = ['res.partner', 'sale.order', 'product.template', 'x_model_0']
+
+# Timing checks, CI runs them in a step of their own
+pytestmark = pytest.mark.scaling
+
+
+# The stages prone to quadratic behaviour, each builds its input of a size the way the input grows with the
+# export (records per file, demo files, renamed ids, attachments) and returns the call to measure
+
+def remove_model_based_fields(clean_module, size):
+    # Records of several models, each with a field removed for its model and fields kept
+    content = "<odoo>\n" + "".join(
+        f'  <record id="record_{index}" model="{MODELS[index % len(MODELS)]}">\n'
+        f'    <field name="name">Record {index}</field>\n    <field name="supplier_rank">1</field>\n'
+        f'    <field name="date_order">2024-01-01</field>\n    <field name="base_unit_count">1</field>\n'
+        f'    <field name="x_studio_value">{index}</field>\n  </record>\n'
+        for index in range(size)
+    ) + "</odoo>\n"
+    return lambda: clean_module.remove_model_based_fields(content)
+
+
+def edit_xml_content(clean_module, size):
+    content = "<odoo>\n" + "".join(
+        f'  <record id="x_model_0_{index}" model="x_model_0" context="{{\'studio\': True}}">\n'
+        f'    <field name="x_studio_name">Thing {index}</field>\n'
+        f'    <field name="arch" type="xml"><a href="https://mycompany.odoo.com/web">x</a></field>\n  </record>\n'
+        for index in range(size)
+    ) + "</odoo>\n"
+    return lambda: clean_module.edit_xml_content(content)
+
+
+def replace_old_id_to_new_id(clean_module, size):
+    # One renamed id per record, referred to by the next record
+    old_to_new_id_map = {f"studio_customization.field_{index:08x}": f"x_model_0_x_field_{index}_field" for index in range(size)}
+    content = "<odoo>\n" + "".join(
+        f'  <record id="studio_customization.field_{index:08x}" model="ir.model.fields">\n'
+        f'    <field name="related_field_id" ref="studio_customization.field_{(index + 1) % size:08x}"/>\n  </record>\n'
+        for index in range(size)
+    ) + "</odoo>\n"
+
+    def run():
+        # The regex is built once per map, it is part of the stage
+        clean_module.id_rewrite_pattern = None
+        return clean_module.replace_old_id_to_new_id(content, old_to_new_id_map)
+    return run
+
+
+def get_unused_ir_attachment_post_records(clean_module, size):
+    # Every other attachment is used by the views, by key or by name
+    root = etree.fromstring(("<odoo>" + "".join(
+        f'<record id="ir_attachment_{index}" model="ir.attachment"><field name="name">image_{index}.png</field>'
+        f'<field name="key">website.image_{index}</field>'
+        f'<field name="datas" type="base64" file="studio_customization/ir_attachment/{index}-image_{index}.png"/></record>'
+        for index in range(size)
+    ) + "</odoo>").encode('utf-8'))
+    content = "<odoo>" + "".join(
+        f'<div><img src="/web/image/website.image_{index}"/><img src="/unsplash/image_{index + 1}.png"/></div>'
+        for index in range(0, size, 4)
+    ) + "</odoo>"
+    return lambda: clean_module.get_unused_ir_attachment_post_records(root, content)
+
+
+def order_manifest_demo_files(clean_module, size):
+    # Each file refers to the previous one, some to a later one (short cycles) and the first to the
+    # last one, so every file is in a cycle
+    manifest_demo_file_list = [{
+        'file_name': f"x_model_{index}.xml",
+        'record_ids': [f"x_model_{index}_{record}" for record in range(3)],
+        'ref_name': [f"x_model_{(index - 1) % size}_0"] + ([f"x_model_{(index + 3) % size}_1"] if index % 10 == 0 else []),
+    } for index in range(size)]
+    return lambda: clean_module.order_manifest_demo_files(manifest_demo_file_list, [])
+
+
+def find_strongly_connected_components(clean_module, size):
+    nodes = list(range(size))
+    successors = {node: [(node + 1) % size, node * 7 % size] for node in nodes}
+    return lambda: clean_module.find_strongly_connected_components(nodes, successors)
+
+
+STAGES = [
+    remove_model_based_fields,
+    edit_xml_content,
+    replace_old_id_to_new_id,
+    get_unused_ir_attachment_post_records,
+    order_manifest_demo_files,
+    find_strongly_connected_components,
+]
+
+
+@pytest.fixture(scope='module')
+def clean_module():
+    # The stages report the circular references of their inputs, only the errors are shown
+    level = handler.level
+    handler.setLevel(logging.ERROR)
+    yield CleanModule('benchmark', 'benchmark', 'benchmark', None, '', None, reset_admin=False)
+    handler.setLevel(level)
+
+
+def measure(calls):
+    """
+    Measures the calls of a stage on inputs of growing sizes.
+
+    Args:
+        calls (list): Call of the stage for each size.
+
+    Returns:
+        tuple: Median CPU seconds of each call, peak bytes allocated by each call.
+    """
+    # CPU time, like timeit without the garbage collector: the time the process spends waiting for the other
+    # processes of the machine does not count. The sizes take turns, a slow spell of the machine hits them all
+    timings = [[] for _ in calls]
+    gc.collect()
+    gc.disable()
+    try:
+        # The first call fills the caches of the stage (compiled patterns, parsed files)
+        for call in calls:
+            call()
+        for _ in range(REPEAT):
+            for call, call_timings in zip(calls, timings):
+                start = time.process_time()
+                call()
+                call_timings.append(time.process_time() - start)
+    finally:
+        gc.enable()
+
+    peak_bytes = []
+    for call in calls:
+        tracemalloc.start()
+        try:
+            call()
+            peak_bytes.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    return [statistics.median(call_timings) for call_timings in timings], peak_bytes
+
+
+def get_growth_exponent(sizes, values):
+    # Least squares slope of log(value) over log(size), every size counts instead of the last two only
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(value) for value in values]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    return sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / sum((x - x_mean) ** 2 for x in xs)
+
+
+@pytest.mark.parametrize('build', STAGES, ids=[build.__name__ for build in STAGES])
+def test_stage_scales_linearly(clean_module, build):
+    seconds, peak_bytes = measure([build(clean_module, size) for size in SIZES])
+
+    time_exponent = get_growth_exponent(SIZES, seconds)
+    memory_exponent = get_growth_exponent(SIZES, peak_bytes)
+    timings = ", ".join(f"{size}={value:.4f}s" for size, value in zip(SIZES, seconds))
+    assert time_exponent <= MAX_TIME_EXPONENT, f"time grows with exponent {time_exponent:.2f}: {timings}"
+    assert memory_exponent <= MAX_MEMORY_EXPONENT, f"peak memory grows with exponent {memory_exponent:.2f}: {peak_bytes}"
@@ -0,0 +1,133 @@
+import pytest
+
+from only_cleanup_script import CleanModule
+
+HEADER = "<?xml version='1.0' encoding='UTF-8'?>\n"
+
+# Small files covering what the streaming pipeline tracks: containers, comments, CDATA, removed
+# first and last children, the files with a special handling and the sequence fields
+FILES = {
+    'data_noupdate': ('res_partner.xml', HEADER + """<odoo>
+  <data noupdate="1">
+    <record id="res_partner_1" model="res.partner" context="{'studio': True}">
+      <field name="name">Partner</field>
+      <field name="display_name">Partner</field>
+      <field name="x_studio_note">Note</field>
+    </record>
+    <record id="res_partner_2" model="res.partner">
+      <field name="name">Other</field>
+    </record>
+  </data>
+</odoo>
+"""),
+    'data_empty': ('res_partner.xml', HEADER + '<odoo>\n  <data noupdate="1"/>\n</odoo>\n'),
+    'comments_cdata': ('x_model_0.xml', HEADER + """<!-- Exported from studio_customization -->
+<odoo>
+  <!-- studio_customization.x_model_0_1 first -->
+  <record id="x_model_0_1" model="x_model_0">
+    <field name="x_studio_html"><![CDATA[<p>Write to john@odoo.com</p>]]></field>
+    <!-- inside the record -->
+    <field name="x_name">One</field>
+  </record>
+  <!-- last -->
+</odoo>
+"""),
+    'removed_first_and_last_fields': ('x_model_0.xml', HEADER + """<odoo>
+  <record id="x_model_0_1" model="x_model_0">
+    <field name="color">3</field>
+    <field name="x_name">One</field>
+    <field name="x_studio_total">4</field>
+  </record>
+  <record id="x_model_0_2" model="x_model_0">
+    <field name="uuid">abc</field>
+  </record>
+</odoo>
+"""),
+    'removed_first_and_last_children': ('x_model_0.xml', HEADER + """<odoo>
+  <field name="uom_id" ref="uom.product_uom_unit"/>
+  <record id="x_model_0_1" model="x_model_0">
+    <field name="x_name">One</field>
+  </record>
+  <record id="x_model_0_2" model="x_model_0">
+    <field name="x_name">Two</field>
+  </record>
+  <field name="pricelist_id" ref="product_pricelist_1"/>
+</odoo>
+"""),
+    'ir_default': ('ir_default.xml', HEADER + """<odoo>
+  <record id="default_1" model="ir.default">
+    <field name="field_id" ref="field_1"/>
+    <field name="json_value">"Default"</field>
+  </record>
+</odoo>
+"""),
+    'ir_ui_view': ('ir_ui_view.xml', HEADER + """<odoo>
+  <record id="view_1" model="ir.ui.view" context="{'studio': True}">
+    <field name="key">website.homepage</field>
+    <field name="url">https://mycompany.odoo.com/page</field>
+    <field name="arch" type="xml">
+      <t t-call="website.layout">
+        <a href="https://mycompany.odoo.com/web">Web</a>
+        <field name="x_studio_partner_id" ref="uom.product_uom_unit"/>
+        <img src="/studio_customization/static/img.png"/>
+      </t>
+    </field>
+  </record>
+</odoo>
+"""),
+    'numeric_sequence': ('sale_order_line.xml', HEADER + """<odoo>
+  <record id="sale_order_line_1" model="sale.order.line">
+    <field name="sequence">10</field>
+    <field name="name">Line</field>
+  </record>
+  <record id="sale_order_line_2" model="sale.order.line">
+    <field name="name">Other</field>
+    <field name="sequence">20</field>
+  </record>
+</odoo>
+"""),
+    'non_numeric_sequence': ('sale_order_line.xml', HEADER + """<odoo noupdate="1">
+  <data>
+    <record id="sale_order_line_1" model="sale.order.line">
+      <field name="sequence" eval="False"/>
+      <field name="name">Line</field>
+    </record>
+  </data>
+</odoo>
+"""),
+}
+
+
+@pytest.fixture(scope='module')
+def clean_module():
+    return CleanModule('industry', 'services', 'db', '', '', None, reset_admin=False)
+
+
+def transform(clean_module, pipeline, tmp_path, file_name, content):
+    # Output and records of a file in a pipeline, the removable fields are known up front
+    source_path = tmp_path / ('source_' + file_name)
+    source_path.write_text(content, encoding='utf-8')
+    output_path = tmp_path / f"{pipeline}_{file_name}"
+    xml_context = {
+        'old_to_new_id_map': {'field_1': 'x_model_0_x_name_field'},
+        'default_pricelist_id': 'product_pricelist_1',
+        'unwanted_fields': ['color', 'uuid'],
+        'removable_fields_dict': {
+            'res.partner': frozenset(['display_name']), 'x_model_0': frozenset(['x_total']),
+            'ir.default': frozenset(), 'ir.ui.view': frozenset(), 'sale.order.line': frozenset(),
+        },
+    }
+    clean_module.pipeline = pipeline
+    try:
+        result = clean_module.transform_xml_file(str(source_path), file_name, xml_context, str(output_path))
+    finally:
+        clean_module.pipeline = 'string'
+    output = result['content'] if 'content' in result else output_path.read_text(encoding='utf-8')
+    return output, result['record_ids'], sorted(result['ref_name_list'])
+
+
+@pytest.mark.parametrize('name', FILES)
+@pytest.mark.parametrize('pipeline', ['tree', 'stream'])
+def test_pipeline_matches_string_pipeline(clean_module, tmp_path, name, pipeline):
+    file_name, content = FILES[name]
+    assert transform(clean_module, pipeline, tmp_path, file_name, content) == transform(clean_module, 'string', tmp_path, file_name, content)
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from only_cleanup_script import CleanModule, XmlRewriteEngine
+
+# Pieces of the texts the rules look for, whole and cut, mixed into random inputs
+TOKENS = [
+    "env.ref('studio_customization.foo')", "env.ref('studio_customization.", "'", '"', "x_studio_", "x_studio_a",
+    " context=\"{'studio': True}\"", "studio_customization.", "studio_customization/", "studio_", "customization/",
+    "base_module.", "base_module", "res_users_", "res_users_7", "obj().env.ref('ir_ui_view_", '<field name="key">',
+    "website.homepage", "</field>", "https://", "https://www.", "foo.odoo.com", ".odoo.com", '<field name="url">',
+    '<field name="u" ref="uom.product_uom_unit"/>', 'ref="uom.', "/documentation/", "17.0/", "john.doe", "@odoo.com",
+    " ", "\n", "a", "_", ".", "/", '<record id="base_module.x" forcecreate="1">',
+    '<record id="studio_customization.x_studio_a" model="x_studio_m"', ">", "<", 'id="', "=", "(", ")",
+]
+
+
+@pytest.fixture(scope='module')
+def clean_module():
+    return CleanModule('demo_ind', 'services', 'db', '', '', 8069)
+
+
+def rewrite_sequentially(rules, text):
+    # Reference semantics: each rule runs over the output of the previous one
+    for rule in rules:
+        text = rule['pattern'].sub(rule['replacement'], text)
+    return text
+
+
+def get_token_soup(rnd):
+    return ''.join(rnd.choice(TOKENS) for _ in range(rnd.randint(1, 12)))
+
+
+def get_record_snippet(rnd):
+    fields = ''
+    for _ in range(rnd.randint(1, 3)):
+        name = rnd.choice(['name', 'x_studio_a', 'url', 'key', 'arch'])
+        attribute = rnd.choice(['', ' ref="uom.product_uom_unit"', ' eval="' + get_token_soup(rnd).replace('"', "'") + '"'])
+        text = get_token_soup(rnd).replace('<', '').replace('>', '')
+        fields += f'\n    <field name="{name}"{attribute}>{text}</field>'
+    record_id = rnd.choice(['studio_customization.x_studio_a', 'base_module.b', 'res_users_2'])
+    context = rnd.choice(['', " context=\"{'studio': True}\""])
+    return f'<record id="{record_id}" model="x_studio_m"{context}>{fields}\n</record>'
+
+
+@pytest.mark.parametrize('text', [
+    # A later rule matching across the greedy env_ref fragment
+    "<field name=\"x\" eval=\"env.ref('studio_customization.foo').id\"/> "
+    "<record id=\"studio_customization.x_studio_a\" model=\"x_studio_m\" context=\"{'studio': True}\">",
+    # base_module. removed before res_users_ reads the rest of the word
+    '<field name="user_id" ref="res_users_2base_module.x"/>',
+    # A removal joining the text around it into a match of a later rule
+    'studio_studio_customization.customization/',
+])
+def test_edit_xml_content_chained_rules(clean_module, text):
+    assert clean_module.edit_xml_content(text) == rewrite_sequentially(clean_module.xml_content_rules, text)
+
+
+@pytest.mark.parametrize('get_text', [get_record_snippet, get_token_soup])
+def test_engines_match_sequential_rules(clean_module, get_text):
+    rnd = random.Random(42)
+    text_rules = [rule for rule in clean_module.xml_content_rules if not rule['tree_handler']]
+    for _ in range(3000):
+        text = get_text(rnd)
+        assert clean_module.xml_content_rewriter.rewrite(text) == rewrite_sequentially(clean_module.xml_content_rules, text), text
+        assert clean_module.xml_text_rewriter.rewrite(text) == rewrite_sequentially(text_rules, text), text
+
+
+def test_rule_counts(clean_module):
+    counts = {}
+    engine = XmlRewriteEngine(clean_module.xml_content_rules, counts)
+    text = "<record id=\"x\" model=\"x_studio_m\" context=\"{'studio': True}\"><field name=\"x_studio_a\">a@odoo.com</field></record>"
+    engine.rewrite(text)
+    engine.rewrite(text)
+    assert counts['x_studio'] == 4
+    assert counts['context_studio'] == 2
+    assert counts['email'] == 2
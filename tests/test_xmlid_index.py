@@ -0,0 +1,104 @@
+import pytest
+from lxml import etree
+
+from only_cleanup_script import XmlIdIndex
+
+VIEWS = """<odoo>
+  <record id="view_1" model="ir.ui.view">
+    <field name="name">Partner form</field>
+    <field name="model">res.partner</field>
+    <field name="inherit_id" ref="base.view_partner_form"/>
+    <field name="arch" type="xml">
+      <form><field name="name" ref="not_a_key_field"/></form>
+    </field>
+  </record>
+  <data>
+    <record id="view_2" model="ir.ui.view">
+      <field name="name">Other</field>
+      <field name="name">Second name</field>
+    </record>
+  </data>
+</odoo>
+"""
+
+FIELDS = """<odoo>
+  <record id="field_1" model="ir.model.fields">
+    <field name="name">x_studio_partner_id</field>
+    <field name="model_id" ref="model_x_1"/>
+    <field name="groups" eval="[(6, 0, [ref('base.group_user'), ref(&quot;base.group_system&quot;)])]"/>
+  </record>
+  <record id="view_1" model="ir.model.fields">
+    <field name="name">duplicate id</field>
+  </record>
+  <record model="ir.model.fields">
+    <field name="model_id" ref="model_x_1"/>
+  </record>
+</odoo>
+"""
+
+
+@pytest.fixture
+def xmlid_index(tmp_path):
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data/ir_ui_view.xml').write_text(VIEWS, encoding='utf-8')
+    (tmp_path / 'data/ir_model_fields.xml').write_text(FIELDS, encoding='utf-8')
+    return XmlIdIndex(str(tmp_path))
+
+
+def test_get_file_records(xmlid_index):
+    records = xmlid_index.get_file_records('data/ir_ui_view.xml')
+    assert [(record['id'], record['file'], record['model']) for record in records] == [
+        ('view_1', 'data/ir_ui_view.xml', 'ir.ui.view'), ('view_2', 'data/ir_ui_view.xml', 'ir.ui.view'),
+    ]
+    # Key fields are the first direct <field> children of the record
+    assert records[0]['fields'] == {
+        'name': {'text': 'Partner form', 'ref': None},
+        'model': {'text': 'res.partner', 'ref': None},
+        'inherit_id': {'text': None, 'ref': 'base.view_partner_form'},
+    }
+    assert records[1]['fields'] == {'name': {'text': 'Other', 'ref': None}}
+    assert records[0]['refs'] == ['base.view_partner_form', 'not_a_key_field']
+    assert xmlid_index.stats == {'files': 1, 'records': 2}
+
+    # The file is scanned once
+    assert xmlid_index.get_file_records('data/ir_ui_view.xml') is records
+    assert xmlid_index.stats == {'files': 1, 'records': 2}
+
+
+def test_eval_refs_and_incoming(xmlid_index):
+    records = xmlid_index.get_file_records('data/ir_model_fields.xml')
+    assert records[0]['ref_fields'] == [('model_x_1',), ('base.group_user', 'base.group_system')]
+    assert records[0]['refs'] == ['model_x_1', 'base.group_user', 'base.group_system']
+    assert xmlid_index.get_incoming('model_x_1') == ['field_1']
+    assert xmlid_index.get_incoming('base.group_system') == ['field_1']
+    assert xmlid_index.get_incoming('unknown') == ()
+
+    # A record without id is listed in its file only
+    assert records[2]['id'] is None
+    assert None not in xmlid_index.records
+
+
+def test_get_keeps_the_first_record_of_an_id(xmlid_index):
+    assert xmlid_index.get('view_1') is None
+    xmlid_index.get_file_records('data/ir_ui_view.xml')
+    xmlid_index.get_file_records('data/ir_model_fields.xml')
+    assert xmlid_index.get('view_1')['file'] == 'data/ir_ui_view.xml'
+    assert xmlid_index.get('field_1')['fields']['model_id'] == {'text': None, 'ref': 'model_x_1'}
+
+
+def test_missing_file_has_no_records(xmlid_index):
+    assert xmlid_index.get_file_records('demo/missing.xml') == []
+    assert xmlid_index.stats == {'files': 0, 'records': 0}
+
+
+def test_add_tree_matches_scan(xmlid_index):
+    tree_index = XmlIdIndex()
+    tree_index.add_tree('data/ir_ui_view.xml', etree.fromstring(VIEWS))
+    tree_index.add_tree('data/ir_ui_view.xml', etree.fromstring('<odoo/>'))
+    assert tree_index.get_file_records('data/ir_ui_view.xml') == xmlid_index.get_file_records('data/ir_ui_view.xml')
+
+
+def test_invalid_file_raises(xmlid_index, tmp_path):
+    (tmp_path / 'data/broken.xml').write_text('<odoo><record id="a">', encoding='utf-8')
+    with pytest.raises(Exception, match="Error while indexing the records of file"):
+        xmlid_index.get_file_records('data/broken.xml')